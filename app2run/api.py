@@ -0,0 +1,115 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""api module is the Python API of app2run, for using app2run in-process (e.g. from a
+migration service) rather than through the CLI. The results are returned as data: the
+messages the CLI would print are collected as diagnostics of the result, and the files
+the translation would create (Procfile, requirements.txt) are only planned unless
+write_files is set.
+
+    from app2run import api
+
+    result = api.translate({'runtime': 'python39', 'instance_class': 'F2'}, project='my-app')
+    result.flags  # ['--cpu=1', '--memory=0.5Gi', ...]
+
+Nothing is printed or redirected, calls from multiple threads of a process are isolated
+from each other."""
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Union
+import yaml
+from app2run.config.feature_config_loader import InputType, UnsupportedFeature
+from app2run.commands.analysis import get_incompatible_features
+from app2run.commands.translate import get_service_name, get_service_spec
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.service_spec import ServiceSpec
+from app2run.common.includes import resolve_includes
+from app2run.common.diagnostics import Diagnostic, Diagnostics
+from app2run.common.result_cache import ResultCache
+from app2run.common.util import read_project_id_from_gcloud
+from app2run.common.write_plan import PlannedWrite
+
+@dataclass
+class Result:
+    """Result of the translation or the incompatibility check of an input:
+        - spec: the translated Cloud Run service, None for a check.
+        - incompatible_features: the features incompatible with Cloud Run.
+        - diagnostics: the diagnostics (errors, warnings, info) of the analysis, including
+          the invalid includes of an app.yaml.
+        - planned_writes: the files the translation creates in the source directory.
+    """
+    input_type: InputType
+    spec: ServiceSpec = None
+    incompatible_features: List[UnsupportedFeature] = field(default_factory=list)
+    diagnostics: List[Diagnostic] = field(default_factory=list)
+    planned_writes: List[PlannedWrite] = field(default_factory=list)
+
+    @property
+    def flags(self) -> List[str]:
+        """The `gcloud run deploy` flags of the translated service."""
+        return self.spec.to_gcloud_flags() if self.spec is not None else []
+
+def translate(input_data: Union[Dict, str], input_type: InputType = InputType.APP_YAML, \
+    project: str = None, command: str = None, # pylint: disable=too-many-arguments
+    target_service: str = None, source_dir: str = None, write_files: bool = False, \
+    cache: ResultCache = None) -> Result:
+    """Translate an input to a Cloud Run service and check it for incompatible features.
+    The input is either the parsed input (app.yaml or deployed version) or the path of an
+    app.yaml, whose directory is then the default source directory. Without project, the
+    project of `gcloud config list` is used for the default service account, it is read
+    once per process."""
+    diagnostics = Diagnostics()
+    input_data, source_dir = _load_input(input_data, input_type, source_dir, diagnostics)
+    project = project if project is not None else get_default_project()
+    context = TranslationContext(input_data, input_type, project, command, source_dir, \
+        write_files, diagnostics=diagnostics)
+    service_name = target_service if target_service is not None else \
+        get_service_name(input_data)
+    spec = get_service_spec(service_name, context, cache)
+    incompatible_features = get_incompatible_features(context, cache)
+    return Result(input_type, spec, incompatible_features, context.diagnostics.records, \
+        context.planned_writes)
+
+def check(input_data: Union[Dict, str], input_type: InputType = InputType.APP_YAML, \
+    cache: ResultCache = None) -> Result:
+    """Check an input (the parsed input or the path of an app.yaml) for features
+    incompatible with Cloud Run."""
+    diagnostics = Diagnostics()
+    input_data, _ = _load_input(input_data, input_type, None, diagnostics)
+    context = TranslationContext(input_data, input_type, diagnostics=diagnostics)
+    incompatible_features = get_incompatible_features(context, cache)
+    return Result(input_type, incompatible_features=incompatible_features, \
+        diagnostics=context.diagnostics.records)
+
+@lru_cache(maxsize=None)
+def get_default_project() -> str:
+    """Get the project of `gcloud config list`, the command runs once per process."""
+    project = read_project_id_from_gcloud()
+    if project is None:
+        raise ValueError('Unable to determine the project id from `gcloud config list`, \
+pass the project.')
+    return project
+
+def _load_input(input_data: Union[Dict, str], input_type: InputType, source_dir: str, \
+    diagnostics: Diagnostics):
+    if not isinstance(input_data, str):
+        return input_data or {}, source_dir
+    if input_type != InputType.APP_YAML:
+        raise ValueError('Only an app.yaml could be read from a path.')
+    app_dir = os.path.dirname(os.path.abspath(input_data))
+    with open(input_data, 'r', encoding='utf8') as file:
+        appyaml_data = yaml.safe_load(file.read()) or {}
+    return resolve_includes(appyaml_data, app_dir, diagnostics=diagnostics), \
+        source_dir if source_dir is not None else app_dir
@@ -0,0 +1,175 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""analysis module computes the results of an input: the output flags of the translation
+rules and the incompatible features, optionally through a ResultCache. Results are keyed
+by the canonical form of the input, so inputs which only differ in keys that no rule or
+feature consumes share their results."""
+from dataclasses import replace
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Mapping
+from app2run.config.feature_config_loader import InputType, UnsupportedFeature, \
+    get_feature_config_hash
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.context import TranslationContext, \
+    get_app_yaml_features, get_features_by_input_type
+from app2run.commands.translation_rules.registry import RuleRegistry
+from app2run.common.diagnostics import Diagnostic
+from app2run.common.range_check import check_ranges
+from app2run.common.result_cache import ResultCache, compute_cache_key
+from app2run.common.util import FlattenedView
+
+_INCOMPATIBLE_FEATURE_TYPES = ['unsupported', 'range_limited', 'value_limited']
+_FEATURE_TYPES = _INCOMPATIBLE_FEATURE_TYPES + ['supported']
+
+def get_rule_flags(context: TranslationContext, registry: RuleRegistry, \
+    cache: ResultCache = None) -> Dict[str, List[CloudRunFlag]]:
+    """Run the rules relevant to the input and return their output flags keyed by rule name.
+    With a cache, the output flags (and diagnostics) of the cacheable rules are looked up by
+    the hash of the canonical input, the project, the command, the feature config, the
+    registered rules and the app2run version; the other rules always run. The diagnostics
+    of the cached rules are added to the context on a cache hit."""
+    if cache is None:
+        return registry.run(context)
+    rules = registry.get_rules_for_keys(context.input_flatten_as_appyaml, include_always=True)
+    key = compute_cache_key('cloud_run_flags', get_feature_config_hash(), \
+        [[rule.name, rule.version] for rule in registry.rules], context.input_type.value, \
+        get_canonical_input(context, registry), context.project, context.command)
+    result = cache.get(key)
+    if result is None:
+        diagnostics_count = len(context.diagnostics.records)
+        rule_flags = registry.run(context, [rule for rule in rules if rule.cacheable])
+        cache.put(key, {'rule_flags': {rule_name: [flag.to_record() for flag in flags] \
+            for rule_name, flags in rule_flags.items()}, 'diagnostics': \
+            [diagnostic.to_record() for diagnostic \
+                in context.diagnostics.records[diagnostics_count:]]})
+    else:
+        context.diagnostics.records.extend(Diagnostic.from_record(record) \
+            for record in result['diagnostics'])
+        rule_flags = {rule_name: [CloudRunFlag.from_record(record) for record in records] \
+            for rule_name, records in result['rule_flags'].items()}
+    rule_flags.update(registry.run(context, [rule for rule in rules if not rule.cacheable]))
+    return rule_flags
+
+def get_incompatible_features(context: TranslationContext, cache: ResultCache = None) \
+    -> List[UnsupportedFeature]:
+    """Check the input of the context for incompatible features. With a cache, the result
+    is looked up by the hash of the canonical input, the feature config and the app2run
+    version."""
+    if cache is None:
+        return check_for_incompatibility(context.input_data, context.input_type, \
+            context.input_key_value_pairs, context.range_checks)
+    key = compute_cache_key('incompatible_features', get_feature_config_hash(), \
+        context.input_type.value, get_canonical_input(context))
+    result = cache.get(key)
+    if result is not None:
+        return _load_incompatible_features(result, context.input_type)
+    incompatible_list = check_for_incompatibility(context.input_data, context.input_type, \
+        context.input_key_value_pairs, context.range_checks)
+    cache.put(key, [[feature.path[context.input_type.value], feature.reason] \
+        for feature in incompatible_list])
+    return incompatible_list
+
+def get_canonical_input(context: TranslationContext, registry: RuleRegistry = None) -> Any:
+    """Get the canonical form of an app.yaml input: the flattened key-value pairs of the
+    keys consumed by the features of the feature config or by the rules of the registry.
+    Inputs with the same canonical form have the same results, e.g. app.yaml files created
+    from a template that only differ in their service name. Deployed versions (admin API
+    input) are not reduced."""
+    if context.input_type != InputType.APP_YAML:
+        return context.input_data
+    feature_paths = _get_app_yaml_feature_paths()
+    return {str(key): value for key, value in context.input_key_value_pairs.items() \
+        if _is_feature_key(str(key), feature_paths) or \
+            (registry is not None and registry.consumes_key(str(key)))}
+
+def load_feature_lookups() -> None:
+    """Load the feature config and build the feature lookups ahead of the analysis, e.g.
+    once per worker process."""
+    get_feature_config_hash()
+    _get_app_yaml_feature_paths()
+    for input_type in InputType:
+        for feature_type in _INCOMPATIBLE_FEATURE_TYPES:
+            get_features_by_input_type(input_type, feature_type)
+
+def check_batch_ranges(inputs_data: List[Dict], input_type: InputType = InputType.APP_YAML) \
+    -> List[Dict[str, bool]]:
+    """Check the range_limited features of many inputs at once, see
+    range_check.check_ranges. The result of each input is passed to
+    check_for_incompatibility as range_checks."""
+    return check_ranges([input_data or {} for input_data in inputs_data], \
+        get_features_by_input_type(input_type, 'range_limited'))
+
+def check_for_incompatibility(input_data: Dict, input_type: InputType, \
+    input_key_value_pairs: Mapping = None, range_checks: Dict[str, bool] = None) \
+    -> List[UnsupportedFeature]:
+    """Check for incompatibility features in the input yaml, it flatterns the nested input into a
+    one-level key-value pairs and compare it with the configured list of incompatible features.
+    An already flattened view of the input could be passed as input_key_value_pairs, and the
+    range_limited features already checked (by check_batch_ranges) as range_checks."""
+    incompatible_list : List[UnsupportedFeature] = []
+
+    unsupported_features = get_features_by_input_type(input_type, 'unsupported')
+    range_limited_features = get_features_by_input_type(input_type, 'range_limited')
+    value_restricted_features = get_features_by_input_type(input_type, 'value_limited')
+    if input_key_value_pairs is None:
+        input_key_value_pairs = FlattenedView(input_data)
+    for key, val in input_key_value_pairs.items():
+        # Check for unsupported features.
+        if key in unsupported_features:
+            incompatible_list.append(unsupported_features[key])
+        # Check for range_limited features.
+        elif key in range_limited_features:
+            feature = range_limited_features[key]
+            in_range = range_checks.get(key) if range_checks is not None else None
+            if in_range is None:
+                in_range = feature.validate(val)
+            if not in_range:
+                incompatible_list.append(range_limited_features[key])
+        # Check for value_restricted features.
+        elif key in value_restricted_features:
+            feature = value_restricted_features[key]
+            if not feature.validate(val):
+                reason = feature.get_reason(val)
+                incompatible_list.append(feature if reason == feature.reason \
+                    else replace(feature, reason=reason))
+
+    return incompatible_list
+
+@lru_cache(maxsize=None)
+def _get_app_yaml_feature_paths() -> FrozenSet[str]:
+    feature_paths = set()
+    for feature_type in _FEATURE_TYPES:
+        feature_paths.update(get_app_yaml_features(feature_type))
+    return frozenset(feature_paths)
+
+def _is_feature_key(key: str, feature_paths: FrozenSet[str]) -> bool:
+    path = ''
+    for part in key.split('.'):
+        path = f'{path}.{part}' if path else part
+        if path in feature_paths:
+            return True
+    return False
+
+def _load_incompatible_features(result: List, input_type: InputType) \
+    -> List[UnsupportedFeature]:
+    features: Dict[str, UnsupportedFeature] = {}
+    for feature_type in _INCOMPATIBLE_FEATURE_TYPES:
+        features.update(get_features_by_input_type(input_type, feature_type))
+    incompatible_list: List[UnsupportedFeature] = []
+    for path, reason in result:
+        feature = features[path]
+        incompatible_list.append(feature if reason == feature.reason \
+            else replace(feature, reason=reason))
+    return incompatible_list
@@ -0,0 +1,177 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""analyze module contains the implementation for the `app2run analyze` command, which
+translates an input and lists its incompatible features in a single pass.
+"""
+from functools import partial
+from typing import Dict, Iterable, List, Tuple
+import click
+from click_option_group import optgroup
+from app2run.config.feature_config_loader import InputType
+from app2run.commands.emitters import EMITTERS
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.supported_features import \
+    needs_default_service_account
+from app2run.commands.translate import apply_write_plan, generate_translate_output, \
+    get_service_name, get_service_spec
+from app2run.commands.analysis import get_incompatible_features
+from app2run.commands.batch import BatchOptions, get_batch_options, get_batch_range_check, \
+    resolve_batch_project, run_batch, validate_batch_options
+from app2run.commands.list_incompatible_features import generate_incompatibility_output, \
+    generate_input_name
+from app2run.common.util import validate_input, validate_batch_input, \
+    get_project_id_from_gcloud
+from app2run.common.diagnostics import DIAGNOSTICS_FORMATS, Diagnostics
+from app2run.common.batch_inputs import get_input_source_dir, is_batch_input, \
+    iter_batch_inputs
+from app2run.common.result_cache import ResultCache, get_result_cache
+from app2run.common.write_plan import WritePlan
+
+@click.command(short_help="Translate an App Engine app.yaml or deployed version and list its \
+incompatible features in one pass.")
+@optgroup.group('APP.YAML', help='The option(s) for using an app.yaml as an input.')
+@optgroup.option('-a', '--appyaml', help='Path to the app.yaml of the app, use "-" to read a \
+stream of `---` separated YAML documents or NDJSON from stdin.')
+@optgroup.group('BATCH', help='The option(s) for using many app.yaml files as an input.')
+@optgroup.option('--changed-since', metavar='GIT_REF', help='Only analyze the app.yaml files \
+of the current git repository that changed (or whose included files changed) since GIT_REF.')
+@optgroup.option('--discover', metavar='DIR', type=click.Path(exists=True, file_okay=False), \
+    help='Analyze all the app.yaml files found in DIR, App Engine config files are recognized \
+by their content, .gitignore files are honored.')
+@optgroup.option('--max-depth', type=click.IntRange(min=0), help='Maximum depth of the \
+directories walked by --discover.')
+@optgroup.option('--exclude', multiple=True, help='.gitignore-style pattern of the files and \
+directories to skip with --discover, could be repeated.')
+@optgroup.option('-j', '--jobs', type=click.IntRange(min=1), default=1, show_default=True, \
+    help='Number of worker processes analyzing the inputs in parallel.')
+@optgroup.option('--completion-order', is_flag=True, help='With --jobs, output the result of \
+each input as soon as it completes rather than in the order of the inputs.')
+@optgroup.option('--shard-index', type=click.IntRange(min=0), help='Index of the shard of \
+the inputs to analyze, from 0 to --shard-count - 1.')
+@optgroup.option('--shard-count', type=click.IntRange(min=1), help='Number of shards the \
+inputs are partitioned into, by a stable hash of the input name.')
+@optgroup.option('--partial-output', type=click.Path(dir_okay=False), help='Write the results \
+to a partial result file rather than to the output, the partial result files of the shards \
+are combined by `app2run merge`.')
+@optgroup.group('ADMIN API', help='The option(s) for using a deployed App Engine version as \
+an input.')
+@optgroup.option('-s', '--service', help='Name of the App Engine service.')
+@optgroup.option('-v', '--version', help='App Engine version id.')
+@optgroup.option('-p', '--project', help='Name of the project where the App Engine version \
+is deployed.')
+@optgroup.group('CLOUD RUN', help='The option(s) for configuraing the `gcloud run deploy` output.')
+@optgroup.option('-c', '--command', help="The entrypoint for the CloudRun App, use this flag \
+    to override the entrypoint at app.yaml or deployed App Engine version.")
+@optgroup.option('--target-service', help="The name of the service for the Cloud Run app.")
+@optgroup.option('--output-format', type=click.Choice(sorted(EMITTERS)), multiple=True, \
+    default=['gcloud'], show_default=True, help='The output format(s) of the Cloud Run service, \
+could be repeated.')
+@optgroup.group('OTHERS')
+@optgroup.option('-o', '--output', default='yaml', show_default=True, type=click.Choice(['yaml', \
+    'html']), help='Output format of the incompatible features.')
+@optgroup.option('--html-dir', type=click.Path(file_okay=False), help='Directory of the html \
+output (one file per input), by default a new temporary directory per input.')
+@optgroup.option('--cache-dir', envvar='APP2RUN_CACHE_DIR', type=click.Path(file_okay=False), \
+    help='Directory of the result cache, results of unchanged inputs are read from the cache.')
+@optgroup.option('--dry-run', is_flag=True, help='Print the files the translation would create \
+(e.g. Procfile) as a patch instead of creating them.')
+@optgroup.option('--diagnostics', 'diagnostics_format', type=click.Choice(DIAGNOSTICS_FORMATS), \
+    default='text', show_default=True, help='Output format of the warnings and info messages of \
+each input, `json` writes one JSON record per message to stderr, `none` skips them.')
+def analyze(appyaml, changed_since, discover, max_depth, exclude, service, version, project, \
+    command, target_service, output_format, # pylint: disable=too-many-arguments,too-many-locals
+    output, html_dir, cache_dir, dry_run, diagnostics_format, jobs, completion_order, \
+    shard_index, shard_count, partial_output) -> None:
+    """Analyze command translates an App Engine app.yaml or a deployed version to the \
+        equivalent gcloud command and lists its incompatible features. The input is \
+        read, parsed and flattened once for both results."""
+    is_batch = is_batch_input(appyaml, changed_since, discover)
+    if not validate_batch_options(is_batch, shard_index, shard_count, partial_output):
+        return
+    cache = get_result_cache(cache_dir)
+    write_plan = WritePlan()
+    if is_batch:
+        if not validate_batch_input(appyaml, service, version, changed_since, discover):
+            return
+        inputs = iter_batch_inputs(appyaml, changed_since, discover, max_depth, exclude, \
+            cache_dir)
+        # Inputs with the same canonical form are analyzed once, through an in-memory
+        # cache if no cache directory is given.
+        _analyze_inputs(inputs, project, command, target_service, output_format, output, \
+            cache or ResultCache(), write_plan, diagnostics_format, get_batch_options(jobs, \
+            completion_order, shard_index, shard_count, partial_output), html_dir)
+    else:
+        # The invalid includes of the app.yaml are output with the other diagnostics.
+        diagnostics = Diagnostics()
+        input_type, input_data = validate_input(appyaml, service, version, project, \
+            diagnostics)
+        if not input_type or not input_data:
+            diagnostics.echo(diagnostics_format, appyaml or 'app.yaml')
+            return
+        # The project is resolved once, for both the default service account and the input
+        # name, and only if one of them needs it.
+        if project is None and (input_type == InputType.ADMIN_API \
+            or needs_default_service_account(input_data)):
+            project = get_project_id_from_gcloud()
+        appyaml = 'app.yaml' if appyaml is None else appyaml
+        input_name = generate_input_name(input_type, appyaml, service, version, project)
+        _analyze_input(input_name, TranslationContext(input_data, input_type, project, \
+            command, write_plan=write_plan, diagnostics=diagnostics), target_service, \
+            output_format, output, cache, diagnostics_format, html_dir)
+    apply_write_plan(write_plan, dry_run)
+    if cache is not None:
+        click.echo(f'[Info] Result cache: {cache.stats}.', err=True)
+
+def _analyze_inputs(inputs: Iterable[Tuple[str, Dict]], project: str, command: str, \
+    target_service: str, output_formats: List[str], # pylint: disable=too-many-arguments
+    output: str, cache: ResultCache, write_plan: WritePlan, diagnostics_format: str = 'text', \
+    options: BatchOptions = None, html_dir: str = None):
+    """Analyze every app.yaml input as it is produced, the project is resolved once for
+    all the inputs. The files created for each input (in the directory of its app.yaml)
+    are added to the write plan. The options select the worker processes and the shard of
+    the inputs. With worker processes, the range_limited features are checked for blocks of
+    inputs at once, see get_batch_range_check."""
+    project, inputs = resolve_batch_project(inputs, project)
+    run_batch(partial(_analyze_batch_input, project=project, command=command, \
+        target_service=target_service, output_formats=output_formats, output=output, \
+        diagnostics_format=diagnostics_format, html_dir=html_dir), inputs, cache, write_plan, \
+        options, get_batch_range_check(options))
+
+def _analyze_batch_input(input_name: str, input_data: Dict, cache: ResultCache, \
+    write_plan: WritePlan, project: str, # pylint: disable=too-many-arguments
+    command: str, target_service: str, output_formats: List[str], output: str, \
+    diagnostics_format: str, html_dir: str = None, prepared: Dict[str, bool] = None):
+    if not input_data:
+        click.echo(f'{input_name} is empty.')
+        return
+    _analyze_input(input_name, TranslationContext(input_data, InputType.APP_YAML, project, \
+        command, get_input_source_dir(input_name), write_plan=write_plan, \
+        range_checks=prepared), target_service, output_formats, output, cache, \
+        diagnostics_format, html_dir)
+
+def _analyze_input(input_name: str, context: TranslationContext, target_service: str, \
+    output_formats: List[str], output: str, # pylint: disable=too-many-arguments
+    cache: ResultCache = None, diagnostics_format: str = 'text', html_dir: str = None):
+    """Output the translation and the incompatible features of the input, both are computed
+    from the same flattened input."""
+    click.echo(f'analyze output for {input_name}:')
+    service_name = target_service if target_service is not None else \
+        get_service_name(context.input_data)
+    spec = get_service_spec(service_name, context, cache)
+    context.diagnostics.echo(diagnostics_format, input_name)
+    generate_translate_output(spec, output_formats)
+    incompatible_list = get_incompatible_features(context, cache)
+    generate_incompatibility_output(incompatible_list, context.input_type, output, input_name, \
+        html_dir)
@@ -0,0 +1,310 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""batch module runs the analysis of the inputs of a batch (stdin, --changed-since,
+--discover) in the current process, or in a pool of worker processes with --jobs. The
+output of an input analyzed by a worker is captured and written by the main process at
+once, so that the outputs of the inputs are never interleaved.
+
+The inputs could also be partitioned into shards (e.g. one per CI node), each shard writes
+its results to a partial result file, and `app2run merge` combines the partial result
+files into the output of a single run."""
+import hashlib
+import io
+import json
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import chain, islice
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+import click
+from app2run.commands.analysis import check_batch_ranges, load_feature_lookups
+from app2run.commands.translation_rules.supported_features import \
+    needs_default_service_account
+from app2run.common.parallel import iter_parallel
+from app2run.common.result_cache import CacheStats, ResultCache
+from app2run.common.util import get_project_id_from_gcloud
+from app2run.common.write_plan import PlannedWrite, WritePlan
+
+# process_input(input_name, input_data, cache, write_plan) outputs the analysis of an input.
+ProcessInput = Callable[[str, Dict, ResultCache, WritePlan], None]
+# prepare_inputs(inputs_data) returns a value for each input of a block of inputs, e.g. the
+# result of a check vectorized over the block, passed to process_input as `prepared`.
+PrepareInputs = Callable[[List[Dict]], List[Any]]
+# Item of a batch: (index, input_name, input_data, keyword arguments of process_input).
+BatchItem = Tuple[int, str, Dict, Dict]
+
+PARTIAL_RESULTS_FORMAT = 'app2run-partial-results/v1'
+# Number of inputs read ahead and prepared at once by prepare_inputs.
+PREPARE_BLOCK_SIZE = 1024
+
+# State of a worker process, created once by _init_worker.
+_WORKER_STATE: Dict = {}
+
+@dataclass(frozen=True)
+class Shard:
+    """Shard selects the inputs whose name hashes to index (out of count shards), the
+    partition is stable across runs and machines."""
+    index: int = 0
+    count: int = 1
+
+    def contains(self, input_name: str) -> bool:
+        """Check if the input belongs to the shard."""
+        if self.count == 1:
+            return True
+        digest = hashlib.sha256(input_name.encode('utf8')).digest()
+        return int.from_bytes(digest[:8], 'big') % self.count == self.index
+
+@dataclass
+class BatchOptions:
+    """BatchOptions configures the execution of a batch:
+        - jobs: number of worker processes, 1 analyzes the inputs in the current process.
+        - ordered: whether the outputs are written in the order of the inputs, rather than
+          as they complete.
+        - shard: the shard of the inputs to analyze, None for all the inputs.
+        - partial_output: path of the partial result file the results are written to,
+          rather than to the output.
+    """
+    jobs: int = 1
+    ordered: bool = True
+    shard: Shard = None
+    partial_output: str = None
+
+@dataclass
+class BatchResult:
+    """BatchResult is the captured output of an input, index is the position of the input
+    in the (unsharded) batch."""
+    index: int
+    input_name: str
+    output: str
+    error_output: str = ''
+    planned_writes: List[PlannedWrite] = field(default_factory=list)
+    cache_stats: CacheStats = field(default_factory=CacheStats)
+
+class _IndexedInputs:
+    """_IndexedInputs numbers the inputs of a batch and yields (index, input_name,
+    input_data) for the inputs of the shard, input_count is the number of inputs read so
+    far."""
+    def __init__(self, inputs: Iterable[Tuple[str, Dict]], shard: Shard):
+        self._inputs = inputs
+        self._shard = shard
+        self.input_count = 0
+
+    def __iter__(self) -> Iterator[Tuple[int, str, Dict]]:
+        for index, (input_name, input_data) in enumerate(self._inputs):
+            self.input_count = index + 1
+            if self._shard.contains(input_name):
+                yield index, input_name, input_data
+
+def validate_batch_options(is_batch: bool, shard_index: int, shard_count: int, \
+    partial_output: str) -> bool:
+    """Validate the sharding options of the cli commands, they are only supported with
+    many app.yaml inputs."""
+    if not is_batch and (shard_count is not None or shard_index is not None or \
+        partial_output is not None):
+        click.echo('[Error] Invalid input, --shard-index, --shard-count and --partial-output \
+are only supported with many app.yaml inputs (--appyaml -, --changed-since or --discover).')
+        return False
+    if (shard_index is None) != (shard_count is None):
+        click.echo('[Error] Invalid input, --shard-index and --shard-count should be used \
+together.')
+        return False
+    if shard_index is not None and shard_index >= shard_count:
+        click.echo(f'[Error] Invalid input, --shard-index should be less than --shard-count \
+({shard_count}).')
+        return False
+    return True
+
+def get_batch_options(jobs: int, completion_order: bool, shard_index: int, \
+    shard_count: int, partial_output: str) -> BatchOptions:
+    """Create the BatchOptions of the cli flags."""
+    shard = Shard(shard_index, shard_count) if shard_count is not None else None
+    return BatchOptions(jobs, not completion_order, shard, partial_output)
+
+def run_batch(process_input: ProcessInput, inputs: Iterable[Tuple[str, Dict]], \
+    cache: ResultCache, write_plan: WritePlan = None, # pylint: disable=too-many-arguments
+    options: BatchOptions = None, prepare_inputs: PrepareInputs = None) -> None:
+    """Run process_input for every input (of the shard). With more than one job, the inputs
+    are analyzed by worker processes and their outputs are written in the order of the
+    inputs (or as they complete). The planned writes and the cache stats of the workers are
+    merged into write_plan (if any) and cache. With a partial output, the results are
+    written to the partial result file instead, and the planned writes are left to
+    `app2run merge`. With prepare_inputs, the inputs are read ahead in blocks of
+    PREPARE_BLOCK_SIZE and prepared once per block by the current process. process_input
+    must be picklable, e.g. a functools.partial of a module level function."""
+    options = options or BatchOptions()
+    shard = options.shard or Shard()
+    indexed_inputs = _IndexedInputs(inputs, shard)
+    items = _iter_batch_items(indexed_inputs, prepare_inputs)
+    if options.jobs <= 1 and options.partial_output is None:
+        for item in items:
+            _process_item(process_input, cache, write_plan, item)
+        return
+    if options.jobs <= 1:
+        results = (_capture_result(process_input, cache, item) for item in items)
+    else:
+        results = iter_parallel(partial(_process_in_worker, process_input), items, \
+            options.jobs, options.ordered or options.partial_output is not None, \
+            initializer=_init_worker, initargs=(cache.cache_dir,))
+    if options.partial_output is not None:
+        _write_partial_results(options.partial_output, shard, indexed_inputs, results, cache)
+        return
+    for result in results:
+        output_batch_result(result, cache, write_plan)
+
+def output_batch_result(result: BatchResult, cache: ResultCache = None, \
+    write_plan: WritePlan = None) -> None:
+    """Write the captured output of an input, and merge its planned writes and cache stats
+    into write_plan and cache."""
+    click.echo(result.output, nl=False)
+    if result.error_output:
+        click.echo(result.error_output, nl=False, err=True)
+    if write_plan is not None:
+        for planned_write in result.planned_writes:
+            write_plan.add(planned_write)
+    if cache is not None:
+        cache.stats.merge(result.cache_stats)
+
+def get_batch_range_check(options: BatchOptions = None) -> Optional[PrepareInputs]:
+    """Get the prepare_inputs checking the range_limited features of blocks of inputs at
+    once (see analysis.check_batch_ranges), so that the worker processes do not check them
+    for each input. None with a single job, as checking the inputs of a block at once in
+    the current process is not faster than checking them one by one."""
+    if options is None or options.jobs <= 1:
+        return None
+    return check_batch_ranges
+
+def resolve_batch_project(inputs: Iterable[Tuple[str, Dict]], project: str) \
+    -> Tuple[str, Iterator[Tuple[str, Dict]]]:
+    """Resolve the project once for all the inputs of a batch, from `gcloud config list` if
+    it is not provided and an input of the batch needs the default service account (the
+    inputs are read ahead up to this input). Otherwise the project stays None, so gcloud
+    is not needed. Return the project and the inputs, including the inputs read ahead."""
+    inputs = iter(inputs)
+    if project is not None:
+        return project, inputs
+    read_ahead: List[Tuple[str, Dict]] = []
+    for batch_input in inputs:
+        read_ahead.append(batch_input)
+        if batch_input[1] and needs_default_service_account(batch_input[1]):
+            project = get_project_id_from_gcloud()
+            break
+    return project, chain(read_ahead, inputs)
+
+def read_partial_results_header(partial_results_path: str) -> Dict:
+    """Read the header and the summary of a partial result file, without its results. The
+    header has the command, the shard and, once the shard is complete, the number of
+    inputs of the batch (input_count), the number of results (result_count) and the
+    cache stats. Raises ValueError if the file is not a partial result file."""
+    header: Optional[Dict] = None
+    summary: Dict = {}
+    result_count = 0
+    with open(partial_results_path, 'r', encoding='utf8') as file:
+        for line in file:
+            if header is None:
+                header = json.loads(line)
+                if header.get('format') != PARTIAL_RESULTS_FORMAT:
+                    raise ValueError(f'{partial_results_path} is not an app2run partial \
+result file.')
+            elif line.startswith('{"summary"'):
+                summary = json.loads(line)['summary']
+            else:
+                result_count += 1
+    if header is None:
+        raise ValueError(f'{partial_results_path} is empty.')
+    return {**header, **summary, 'result_count': result_count}
+
+def iter_partial_results(partial_results_path: str) -> Iterator[BatchResult]:
+    """Yield the results of a partial result file, in the order of the inputs."""
+    with open(partial_results_path, 'r', encoding='utf8') as file:
+        next(file, None)
+        for line in file:
+            record = json.loads(line)
+            if 'summary' in record:
+                continue
+            yield BatchResult(record['index'], record['input'], record['output'], \
+                record['error_output'], [PlannedWrite(path, content) \
+                    for path, content in record['planned_writes']], \
+                CacheStats(**record['cache_stats']))
+
+def _write_partial_results(partial_results_path: str, shard: Shard, \
+    indexed_inputs: _IndexedInputs, results: Iterable[BatchResult], cache: ResultCache) -> None:
+    command_context = click.get_current_context(silent=True)
+    header = {'format': PARTIAL_RESULTS_FORMAT, 'command': command_context.info_name \
+        if command_context is not None else None, 'shard_index': shard.index, \
+        'shard_count': shard.count}
+    result_count = 0
+    with open(partial_results_path, 'w', encoding='utf8') as file:
+        _write_json_line(file, header)
+        for result in results:
+            result_count += 1
+            cache.stats.merge(result.cache_stats)
+            _write_json_line(file, {'index': result.index, 'input': result.input_name, \
+                'output': result.output, 'error_output': result.error_output, \
+                'planned_writes': [[write.path, write.content] \
+                    for write in result.planned_writes], \
+                'cache_stats': vars(result.cache_stats)})
+        _write_json_line(file, {'summary': {'input_count': indexed_inputs.input_count, \
+            'cache_stats': vars(cache.stats) if cache.cache_dir is not None else None}})
+    click.echo(f'[Info] {result_count} result(s) of shard {shard.index + 1}/{shard.count} \
+are written to {partial_results_path}, use `app2run merge` to combine the shards.')
+
+def _iter_batch_items(indexed_inputs: Iterable[Tuple[int, str, Dict]], \
+    prepare_inputs: PrepareInputs = None) -> Iterator[BatchItem]:
+    if prepare_inputs is None:
+        for index, input_name, input_data in indexed_inputs:
+            yield index, input_name, input_data, {}
+        return
+    indexed_inputs = iter(indexed_inputs)
+    while True:
+        block = list(islice(indexed_inputs, PREPARE_BLOCK_SIZE))
+        if not block:
+            return
+        prepared_inputs = prepare_inputs([input_data for _, _, input_data in block])
+        for (index, input_name, input_data), prepared in zip(block, prepared_inputs):
+            yield index, input_name, input_data, {'prepared': prepared}
+
+def _process_item(process_input: ProcessInput, cache: ResultCache, write_plan: WritePlan, \
+    item: BatchItem) -> None:
+    _, input_name, input_data, kwargs = item
+    process_input(input_name, input_data, cache, write_plan, **kwargs)
+
+def _write_json_line(file: IO[str], record: Dict) -> None:
+    file.write(json.dumps(record))
+    file.write('\n')
+
+def _init_worker(cache_dir: str) -> None:
+    """Initialize a worker process once: load the feature config and the feature lookups,
+    and create the result cache shared by the inputs analyzed by the worker."""
+    load_feature_lookups()
+    _WORKER_STATE['cache'] = ResultCache(cache_dir)
+
+def _process_in_worker(process_input: ProcessInput, item: BatchItem) -> BatchResult:
+    return _capture_result(process_input, _WORKER_STATE['cache'], item)
+
+def _capture_result(process_input: ProcessInput, cache: ResultCache, item: BatchItem) \
+    -> BatchResult:
+    index, input_name = item[:2]
+    stats = cache.stats
+    cache.stats = CacheStats()
+    # The files are planned per input, the plans are merged by the main process.
+    write_plan = WritePlan()
+    with redirect_stdout(io.StringIO()) as output, \
+        redirect_stderr(io.StringIO()) as error_output:
+        _process_item(process_input, cache, write_plan, item)
+    result = BatchResult(index, input_name, output.getvalue(), error_output.getvalue(), \
+        write_plan.writes, cache.stats)
+    # The stats of the result are merged by the consumer of the result.
+    cache.stats = stats
+    return result
@@ -0,0 +1,137 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""drift module contains the implementation for the `app2run drift` command, which
+compares the translation of many app.yaml files with the Cloud Run services exported
+from a project, to detect the performance settings that drifted since the migration.
+"""
+from functools import partial
+from typing import Dict, List, Set
+import click
+import yaml
+from click_option_group import optgroup
+from app2run.commands.batch import get_batch_options, resolve_batch_project, run_batch
+from app2run.commands.emitters import build_knative_service
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translate import get_service_name, get_service_spec
+from app2run.common.diagnostics import DIAGNOSTICS_FORMATS
+from app2run.common.batch_inputs import get_input_source_dir, is_batch_input, \
+    iter_batch_inputs
+from app2run.common.result_cache import ResultCache, get_result_cache
+from app2run.common.service_drift import ExportedService, compare_services, \
+    index_exported_services
+from app2run.common.util import validate_batch_input
+from app2run.common.write_plan import WritePlan
+
+@click.command(short_help="Compare the translation of many app.yaml files with the exported \
+Cloud Run services.")
+@click.option('--services-dir', required=True, type=click.Path(exists=True, file_okay=False), \
+    help='Directory of the Cloud Run services exported with `gcloud run services describe \
+SERVICE --format=export`, the .yaml, .yml and .json files (of one or more services) under \
+the directory are read.')
+@optgroup.group('BATCH', help='The option(s) selecting the app.yaml files to compare.')
+@optgroup.option('-a', '--appyaml', type=click.Choice(['-']), help='Use "-" to read a stream \
+of `---` separated YAML documents or NDJSON from stdin.')
+@optgroup.option('--changed-since', metavar='GIT_REF', help='Only compare the app.yaml files \
+of the current git repository that changed (or whose included files changed) since GIT_REF.')
+@optgroup.option('--discover', metavar='DIR', type=click.Path(exists=True, file_okay=False), \
+    help='Compare all the app.yaml files found in DIR, App Engine config files are recognized \
+by their content, .gitignore files are honored.')
+@optgroup.option('--max-depth', type=click.IntRange(min=0), help='Maximum depth of the \
+directories walked by --discover.')
+@optgroup.option('--exclude', multiple=True, help='.gitignore-style pattern of the files and \
+directories to skip with --discover, could be repeated.')
+@optgroup.option('-j', '--jobs', type=click.IntRange(min=1), default=1, show_default=True, \
+    help='Number of worker processes comparing the inputs in parallel.')
+@optgroup.option('--completion-order', is_flag=True, help='With --jobs, output the result of \
+each input as soon as it completes rather than in the order of the inputs.')
+@optgroup.group('CLOUD RUN', help='The option(s) for configuraing the translation.')
+@optgroup.option('-p', '--project', help='Name of the project of the Cloud Run services, by \
+default from `gcloud config list`.')
+@optgroup.option('-c', '--command', help="The entrypoint for the CloudRun App, use this flag \
+    to override the entrypoint at app.yaml.")
+@optgroup.group('OTHERS')
+@optgroup.option('--cache-dir', envvar='APP2RUN_CACHE_DIR', type=click.Path(file_okay=False), \
+    help='Directory of the result cache, results of unchanged inputs are read from the cache.')
+@optgroup.option('--diagnostics', 'diagnostics_format', type=click.Choice(DIAGNOSTICS_FORMATS), \
+    default='text', show_default=True, help='Output format of the warnings and info messages of \
+each input, `json` writes one JSON record per message to stderr, `none` skips them.')
+def drift(services_dir, appyaml, changed_since, discover, # pylint: disable=too-many-arguments,too-many-locals
+    max_depth, exclude, jobs, completion_order, project, command, cache_dir, \
+    diagnostics_format) -> None:
+    """Drift command translates every app.yaml input to a Cloud Run service and compares \
+        it with the exported Cloud Run service of the same name. The performance settings \
+        set by the translation (concurrency, CPU, memory, min and max instances, timeout \
+        and CPU throttling) which differ from the exported service are listed."""
+    if not is_batch_input(appyaml, changed_since, discover):
+        click.echo('[Error] Invalid input, use --appyaml -, --changed-since or --discover to \
+select the app.yaml files to compare.')
+        return
+    if not validate_batch_input(appyaml, None, None, changed_since, discover):
+        return
+    services = index_exported_services(services_dir)
+    click.echo(f'[Info] {len(services)} exported Cloud Run service(s) found in \
+{services_dir}.')
+    inputs = iter_batch_inputs(appyaml, changed_since, discover, max_depth, exclude, \
+        cache_dir)
+    project, inputs = resolve_batch_project(inputs, project)
+    compared_names: Set[str] = set()
+    # The exported services are looked up by the main process, so the worker processes
+    # only receive the exported service of their input.
+    run_batch(partial(_compare_batch_input, project=project, command=command, \
+        diagnostics_format=diagnostics_format), inputs, \
+        get_result_cache(cache_dir) or ResultCache(), options=get_batch_options(jobs, \
+        completion_order, None, None, None), prepare_inputs=partial( \
+        _get_exported_services, services, compared_names))
+    not_compared = sorted(set(services) - compared_names)
+    if not_compared:
+        click.echo(f'[Info] Exported Cloud Run service(s) without an app.yaml: \
+{", ".join(not_compared)}.')
+
+def _get_exported_services(services: Dict[str, ExportedService], compared_names: Set[str], \
+    inputs_data: List[Dict]) -> List[ExportedService]:
+    """Get the exported service of each input, by the service name of the input."""
+    exported_services = []
+    for input_data in inputs_data:
+        service_name = get_service_name(input_data) if input_data else None
+        if service_name in services:
+            compared_names.add(service_name)
+        exported_services.append(services.get(service_name))
+    return exported_services
+
+def _compare_batch_input(input_name: str, input_data: Dict, cache: ResultCache, \
+    _write_plan: WritePlan, project: str, command: str, # pylint: disable=too-many-arguments
+    diagnostics_format: str = 'text', prepared: ExportedService = None):
+    click.echo(f'drift output for {input_name}:')
+    if not input_data:
+        click.echo(f'{input_name} is empty.')
+        return
+    service_name = get_service_name(input_data)
+    if prepared is None:
+        click.echo(f'[Warning] No exported Cloud Run service {service_name}, it is not \
+compared.')
+        return
+    # The files the translation would create are not needed for the comparison.
+    context = TranslationContext(input_data, project=project, command=command, \
+        source_dir=get_input_source_dir(input_name), write_files=False)
+    translated = build_knative_service(get_service_spec(service_name, context, cache))
+    context.diagnostics.echo(diagnostics_format, input_name)
+    drifts = compare_services(translated, prepared.service)
+    if not drifts:
+        click.echo(f'No drift from the Cloud Run service {service_name} of {prepared.path}.')
+        return
+    click.echo(f'[Warning] {len(drifts)} setting(s) drifted from the Cloud Run service \
+{service_name} of {prepared.path}:')
+    click.echo(yaml.safe_dump([drift._asdict() for drift in drifts], sort_keys=False), \
+        nl=False)
@@ -0,0 +1,234 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Emitters render a translated Cloud Run service (ServiceSpec) in an output format:
+a `gcloud run deploy` command, a Knative service YAML or a Terraform resource."""
+import json
+from typing import Callable, Dict, List, Tuple
+import yaml
+from app2run.commands.translation_rules.service_spec import ServiceSpec
+
+_IMAGE_PLACEHOLDER = 'IMAGE_URL'
+_ENV_VARS_FILE_FLAG = '--env-vars-file'
+_TIMEOUT_UNITS_IN_SECONDS: Dict[str, int] = {'s': 1, 'm': 60, 'h': 3600}
+_KNATIVE_ANNOTATIONS: Dict[str, str] = {
+    '--min-instances': 'autoscaling.knative.dev/minScale',
+    '--max-instances': 'autoscaling.knative.dev/maxScale',
+    '--vpc-connector': 'run.googleapis.com/vpc-access-connector',
+    '--vpc-egress': 'run.googleapis.com/vpc-access-egress',
+    '--add-cloudsql-instances': 'run.googleapis.com/cloudsql-instances',
+}
+_TERRAFORM_VPC_EGRESS: Dict[str, str] = {
+    'all': 'ALL_TRAFFIC',
+    'all-traffic': 'ALL_TRAFFIC',
+    'private-ranges-only': 'PRIVATE_RANGES_ONLY',
+}
+# Flags handled by the Knative and Terraform emitters, other flags are listed as not
+# translated in their output. --env-vars-file is handled if the env vars of the file are
+# in the spec.
+_STRUCTURED_FLAGS = set(_KNATIVE_ANNOTATIONS) | {'--concurrency', '--timeout', '--cpu', \
+    '--memory', '--set-env-vars', '--service-account', '--command', '--labels', \
+    '--no-cpu-throttling', '--allow-unauthenticated'}
+
+Emitter = Callable[[ServiceSpec], str]
+EMITTERS: Dict[str, Emitter] = {}
+
+def register_emitter(name: str, emitter: Emitter) -> None:
+    """Register an emitter for the output format name."""
+    EMITTERS[name] = emitter
+
+def emit(output_format: str, spec: ServiceSpec) -> str:
+    """Render the spec in the output format."""
+    return EMITTERS[output_format](spec)
+
+def emit_gcloud(spec: ServiceSpec) -> str:
+    """
+    example output:
+    gcloud run deploy default \
+      --cpu=1 \
+      --memory=2Gi \
+      --timeout=10m
+    """
+    flags = spec.to_gcloud_flags()
+    first_line_ending_char = '' if len(flags) == 0 else '\\'
+    output = f"""
+gcloud run deploy {spec.name} {first_line_ending_char}
+"""
+    for i, flag in enumerate(flags):
+        # The last flag does not have tailing \
+        output += '  '
+        output += flag + ' \\' if i < len(flags) - 1 else flag
+        output += '\n'
+    return output
+
+def emit_knative(spec: ServiceSpec) -> str:
+    """Render the spec as a Cloud Run (Knative serving) service YAML, which could be
+    deployed with `gcloud run services replace`."""
+    header = f'# Replace {_IMAGE_PLACEHOLDER} with the container image of the app.\n'
+    return header + _get_not_translated_comments(spec) + \
+        yaml.safe_dump(build_knative_service(spec), sort_keys=False)
+
+def build_knative_service(spec: ServiceSpec) -> Dict:
+    """Build the Cloud Run (Knative serving) service of the spec, in the structure of
+    `gcloud run services describe --format=export`."""
+    values = _get_flag_values(spec)
+    annotations = {annotation: values[flag] for flag, annotation \
+        in _KNATIVE_ANNOTATIONS.items() if flag in values}
+    if '--no-cpu-throttling' in values:
+        annotations['run.googleapis.com/cpu-throttling'] = 'false'
+    container: Dict = {'image': _IMAGE_PLACEHOLDER}
+    if '--command' in values:
+        container['command'] = [values['--command']]
+    env_vars = _get_env_vars(spec)
+    if env_vars:
+        container['env'] = [{'name': name, 'value': value} for name, value in env_vars]
+    limits = {key: values[flag] for key, flag in (('cpu', '--cpu'), ('memory', '--memory')) \
+        if flag in values}
+    if limits:
+        container['resources'] = {'limits': limits}
+    template_spec: Dict = {}
+    if '--concurrency' in values:
+        template_spec['containerConcurrency'] = int(values['--concurrency'])
+    if '--timeout' in values:
+        template_spec['timeoutSeconds'] = _get_timeout_seconds(values['--timeout'])
+    if '--service-account' in values:
+        template_spec['serviceAccountName'] = values['--service-account']
+    template_spec['containers'] = [container]
+    template: Dict = {}
+    if annotations:
+        template['metadata'] = {'annotations': annotations}
+    template['spec'] = template_spec
+    metadata: Dict = {'name': spec.name}
+    labels = _get_mapping_value(spec, '--labels')
+    if labels:
+        metadata['labels'] = labels
+    return {
+        'apiVersion': 'serving.knative.dev/v1',
+        'kind': 'Service',
+        'metadata': metadata,
+        'spec': {'template': template},
+    }
+
+def emit_terraform(spec: ServiceSpec) -> str:
+    """Render the spec as a Terraform google_cloud_run_v2_service resource."""
+    values = _get_flag_values(spec)
+    resource_name = _get_terraform_identifier(spec.name)
+    lines = [f'resource "google_cloud_run_v2_service" "{resource_name}" {{', \
+        f'  name     = {_hcl(spec.name)}', '  location = var.region']
+    labels = _get_mapping_value(spec, '--labels')
+    if labels:
+        lines += _hcl_map('labels', labels, '  ')
+    lines.append('  template {')
+    if '--service-account' in values:
+        lines.append(f'    service_account = {_hcl(values["--service-account"])}')
+    if '--timeout' in values:
+        lines.append(f'    timeout = "{_get_timeout_seconds(values["--timeout"])}s"')
+    if '--concurrency' in values:
+        lines.append(f'    max_instance_request_concurrency = {int(values["--concurrency"])}')
+    if '--min-instances' in values or '--max-instances' in values:
+        lines.append('    scaling {')
+        if '--min-instances' in values:
+            lines.append(f'      min_instance_count = {int(values["--min-instances"])}')
+        if '--max-instances' in values:
+            lines.append(f'      max_instance_count = {int(values["--max-instances"])}')
+        lines.append('    }')
+    if '--vpc-connector' in values:
+        lines.append('    vpc_access {')
+        lines.append(f'      connector = {_hcl(values["--vpc-connector"])}')
+        if '--vpc-egress' in values:
+            egress = _TERRAFORM_VPC_EGRESS.get(values['--vpc-egress'], values['--vpc-egress'])
+            lines.append(f'      egress    = {_hcl(egress)}')
+        lines.append('    }')
+    lines += _get_terraform_container(values, _get_env_vars(spec))
+    if '--add-cloudsql-instances' in values:
+        instances = spec.get_flag('--add-cloudsql-instances').value
+        lines += ['    volumes {', '      name = "cloudsql"', '      cloud_sql_instance {', \
+            f'        instances = {_hcl(instances)}', '      }', '    }']
+    lines += ['  }', '}']
+    if '--allow-unauthenticated' in values:
+        lines += ['', f'resource "google_cloud_run_v2_service_iam_member" \
+"{resource_name}_invoker" {{', \
+            f'  name     = google_cloud_run_v2_service.{resource_name}.name', \
+            f'  location = google_cloud_run_v2_service.{resource_name}.location', \
+            '  role     = "roles/run.invoker"', '  member   = "allUsers"', '}']
+    return _get_not_translated_comments(spec) + '\n'.join(lines) + '\n'
+
+def _get_terraform_container(values: Dict[str, str], env_vars: List[Tuple[str, str]]) \
+    -> List[str]:
+    lines = ['    containers {', '      image = var.image']
+    if '--command' in values:
+        lines.append(f'      command = {_hcl([values["--command"]])}')
+    limits = {key: values[flag] for key, flag in (('cpu', '--cpu'), ('memory', '--memory')) \
+        if flag in values}
+    if limits or '--no-cpu-throttling' in values:
+        lines.append('      resources {')
+        if limits:
+            lines += _hcl_map('limits', limits, '        ')
+        if '--no-cpu-throttling' in values:
+            lines.append('        cpu_idle = false')
+        lines.append('      }')
+    for name, value in env_vars:
+        lines += ['      env {', f'        name  = {_hcl(name)}', \
+            f'        value = {_hcl(value)}', '      }']
+    if '--add-cloudsql-instances' in values:
+        lines += ['      volume_mounts {', '        name       = "cloudsql"', \
+            '        mount_path = "/cloudsql"', '      }']
+    lines.append('    }')
+    return lines
+
+def _get_flag_values(spec: ServiceSpec) -> Dict[str, str]:
+    return {flag.name: flag.format_value() for flag in spec.flags}
+
+def _get_mapping_value(spec: ServiceSpec, flag_name: str) -> Dict[str, str]:
+    flag = spec.get_flag(flag_name)
+    return dict(flag.value) if flag is not None and isinstance(flag.value, dict) else {}
+
+def _get_not_translated_comments(spec: ServiceSpec) -> str:
+    return ''.join(f'# Not translated: {flag.to_gcloud()}\n' for flag in spec.flags \
+        if flag.name not in _STRUCTURED_FLAGS and not (flag.name == _ENV_VARS_FILE_FLAG \
+            and spec.env_vars is not None))
+
+def _get_env_vars(spec: ServiceSpec) -> List[Tuple[str, str]]:
+    """Get the env vars set by --set-env-vars, or by --env-vars-file if they were read
+    from the file."""
+    if spec.get_flag(_ENV_VARS_FILE_FLAG) is not None and spec.env_vars is not None:
+        return list(spec.env_vars.items())
+    return list(_get_mapping_value(spec, '--set-env-vars').items())
+
+def _get_timeout_seconds(value: str) -> int:
+    unit = value[-1]
+    if unit in _TIMEOUT_UNITS_IN_SECONDS:
+        return int(value[:-1]) * _TIMEOUT_UNITS_IN_SECONDS[unit]
+    return int(value)
+
+def _get_terraform_identifier(name: str) -> str:
+    identifier = ''.join(char if char.isalnum() or char in '_-' else '_' for char in name)
+    return identifier if identifier[:1].isalpha() or identifier[:1] == '_' \
+        else f'_{identifier}'
+
+def _hcl(value) -> str:
+    # JSON strings and lists are valid HCL expressions, `${` is escaped to avoid
+    # template interpolation.
+    return json.dumps(value).replace('${', '$${')
+
+def _hcl_map(name: str, values: Dict[str, str], indent: str) -> List[str]:
+    lines = [f'{indent}{name} = {{']
+    for key, value in values.items():
+        lines.append(f'{indent}  {_hcl(key)} = {_hcl(value)}')
+    lines.append(f'{indent}}}')
+    return lines
+
+register_emitter('gcloud', emit_gcloud)
+register_emitter('knative', emit_knative)
+register_emitter('terraform', emit_terraform)
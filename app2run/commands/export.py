@@ -0,0 +1,137 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""export module contains the implementation for the `app2run export` command, which
+writes the features of many app.yaml files as a table (CSV, Arrow or Parquet), e.g. to
+load the results of a fleet into a notebook.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
+import click
+from click_option_group import optgroup
+from app2run.commands.analysis import get_incompatible_features, get_rule_flags
+from app2run.commands.batch import resolve_batch_project
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.context import TranslationContext, \
+    get_app_yaml_features
+from app2run.commands.translation_rules.rules import get_default_rule_registry
+from app2run.common.batch_inputs import get_input_source_dir, is_batch_input, \
+    iter_batch_inputs
+from app2run.common.result_cache import ResultCache, get_result_cache
+from app2run.common.table_export import TABLE_FORMATS, TableRow, TableWriter, \
+    get_row_values, get_table_format, open_table_writer
+from app2run.common.util import validate_batch_input
+from app2run.config.feature_config_loader import Feature, InputType
+
+_FEATURE_TYPES = ['unsupported', 'range_limited', 'value_limited', 'supported']
+
+@click.command(short_help="Export the features of many app.yaml files as a table.")
+@click.option('--output-file', required=True, type=click.Path(dir_okay=False), help='Path of \
+the table file, one row per app.yaml file and feature.')
+@click.option('--format', 'table_format', type=click.Choice(TABLE_FORMATS), help='Format of \
+the table file, by default from the extension of --output-file (csv if it is not known). \
+arrow and parquet require pyarrow.')
+@optgroup.group('BATCH', help='The option(s) selecting the app.yaml files to export.')
+@optgroup.option('-a', '--appyaml', type=click.Choice(['-']), help='Use "-" to read a stream \
+of `---` separated YAML documents or NDJSON from stdin.')
+@optgroup.option('--changed-since', metavar='GIT_REF', help='Only export the app.yaml files \
+of the current git repository that changed (or whose included files changed) since GIT_REF.')
+@optgroup.option('--discover', metavar='DIR', type=click.Path(exists=True, file_okay=False), \
+    help='Export all the app.yaml files found in DIR, App Engine config files are recognized \
+by their content, .gitignore files are honored.')
+@optgroup.option('--max-depth', type=click.IntRange(min=0), help='Maximum depth of the \
+directories walked by --discover.')
+@optgroup.option('--exclude', multiple=True, help='.gitignore-style pattern of the files and \
+directories to skip with --discover, could be repeated.')
+@optgroup.group('CLOUD RUN', help='The option(s) for configuraing the translation.')
+@optgroup.option('-p', '--project', help='Name of the project of the Cloud Run services, by \
+default from `gcloud config list`.')
+@optgroup.option('-c', '--command', help="The entrypoint for the CloudRun App, use this flag \
+    to override the entrypoint at app.yaml.")
+@optgroup.group('OTHERS')
+@optgroup.option('--cache-dir', envvar='APP2RUN_CACHE_DIR', type=click.Path(file_okay=False), \
+    help='Directory of the result cache, results of unchanged inputs are read from the cache.')
+def export(output_file, table_format, appyaml, changed_since, # pylint: disable=too-many-arguments
+    discover, max_depth, exclude, project, command, cache_dir) -> None:
+    """Export command writes a row for every feature (of the feature config) of every app.yaml \
+        input: its path, its value, its severity if it is incompatible, and the Cloud Run \
+        flag it is translated to with the target value."""
+    if not is_batch_input(appyaml, changed_since, discover):
+        click.echo('[Error] Invalid input, use --appyaml -, --changed-since or --discover to \
+select the app.yaml files to export.')
+        return
+    if not validate_batch_input(appyaml, None, None, changed_since, discover):
+        return
+    table_format = get_table_format(output_file, table_format)
+    try:
+        table_writer = open_table_writer(output_file, table_format)
+    except (OSError, ValueError) as error:
+        click.echo(f'[Error] Failed to open {output_file}: {error}')
+        return
+    inputs = iter_batch_inputs(appyaml, changed_since, discover, max_depth, exclude, \
+        cache_dir)
+    project, inputs = resolve_batch_project(inputs, project)
+    with table_writer:
+        input_count, row_count = _export_inputs(table_writer, inputs, project, command, \
+            get_result_cache(cache_dir) or ResultCache())
+    click.echo(f'[Info] {row_count} row(s) of {input_count} input(s) are written to \
+{output_file} ({table_format}).')
+
+def _export_inputs(table_writer: TableWriter, inputs: Iterable[Tuple[str, Dict]], \
+    project: str, command: str, cache: ResultCache) -> Tuple[int, int]:
+    """Write the rows of every input, return the number of inputs and rows."""
+    input_count = 0
+    row_count = 0
+    for input_name, input_data in inputs:
+        if not input_data:
+            click.echo(f'{input_name} is empty.')
+            continue
+        context = TranslationContext(input_data, project=project, command=command, \
+            source_dir=get_input_source_dir(input_name), write_files=False)
+        input_count += 1
+        row_count += table_writer.write_rows(get_table_rows(input_name, context, cache))
+    return input_count, row_count
+
+def get_table_rows(input_name: str, context: TranslationContext, cache: ResultCache = None) \
+    -> Iterator[TableRow]:
+    """Get the rows of an input, one per feature of the input and Cloud Run flag of the
+    feature."""
+    target_values = _get_target_values(get_rule_flags(context, get_default_rule_registry(), \
+        cache))
+    severities = {feature.path[InputType.APP_YAML.value]: feature.severity \
+        for feature in get_incompatible_features(context, cache)}
+    features = _get_features()
+    for path, value in context.input_key_value_pairs.items():
+        feature = features.get(path)
+        if feature is None:
+            continue
+        row_values = get_row_values(value)
+        flags = getattr(feature, 'flags', None) or [None]
+        for flag in flags:
+            yield TableRow(input_name, path, severities.get(path), *row_values, flag, \
+                target_values.get(flag))
+
+@lru_cache(maxsize=None)
+def _get_features() -> Dict[str, Feature]:
+    features: Dict[str, Feature] = {}
+    for feature_type in _FEATURE_TYPES:
+        features.update(get_app_yaml_features(feature_type))
+    return features
+
+def _get_target_values(rule_flags: Dict[str, List[CloudRunFlag]]) -> Dict[str, str]:
+    target_values: Dict[str, str] = {}
+    for output_flags in rule_flags.values():
+        for output_flag in output_flags:
+            target_values[output_flag.name] = output_flag.format_value()
+    return target_values
@@ -0,0 +1,107 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""index module contains the implementation for the `app2run index` command, which writes
+the results of many app.yaml files into a fleet index (a SQLite database) queried by
+`app2run query`.
+"""
+import sqlite3
+from typing import Dict, Iterable, Set, Tuple
+import click
+from click_option_group import optgroup
+from app2run.commands.analysis import get_incompatible_features
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.common.batch_inputs import is_batch_input, iter_batch_inputs
+from app2run.common.fleet_index import FleetIndex, IndexStats
+from app2run.common.result_cache import ResultCache, compute_cache_key, get_result_cache
+from app2run.common.util import validate_batch_input
+from app2run.config.feature_config_loader import get_feature_config_hash
+
+@click.command(short_help="Index the results of many app.yaml files into a SQLite database.")
+@click.option('--db', required=True, type=click.Path(dir_okay=False), help='Path of the \
+SQLite database of the fleet index, it is created if it does not exist.')
+@optgroup.group('BATCH', help='The option(s) selecting the app.yaml files to index.')
+@optgroup.option('-a', '--appyaml', type=click.Choice(['-']), help='Use "-" to read a stream \
+of `---` separated YAML documents or NDJSON from stdin.')
+@optgroup.option('--changed-since', metavar='GIT_REF', help='Only index the app.yaml files \
+of the current git repository that changed (or whose included files changed) since GIT_REF.')
+@optgroup.option('--discover', metavar='DIR', type=click.Path(exists=True, file_okay=False), \
+    help='Index all the app.yaml files found in DIR, App Engine config files are recognized \
+by their content, .gitignore files are honored.')
+@optgroup.option('--max-depth', type=click.IntRange(min=0), help='Maximum depth of the \
+directories walked by --discover.')
+@optgroup.option('--exclude', multiple=True, help='.gitignore-style pattern of the files and \
+directories to skip with --discover, could be repeated.')
+@optgroup.group('OTHERS')
+@optgroup.option('--prune', is_flag=True, help='Remove the inputs of the index which are not \
+part of this run, e.g. deleted app.yaml files. With --changed-since, --cache-dir is required \
+so that the unchanged app.yaml files are part of the run.')
+@optgroup.option('--cache-dir', envvar='APP2RUN_CACHE_DIR', type=click.Path(file_okay=False), \
+    help='Directory of the result cache, results of unchanged inputs are read from the cache.')
+def index(db, appyaml, changed_since, discover, max_depth, exclude, # pylint: disable=too-many-arguments
+    prune, cache_dir) -> None:
+    """Index command writes the feature values (the flattened app.yaml) and the incompatible \
+        features of every app.yaml input into the fleet index DB. Inputs which did not change \
+        since they were indexed are skipped."""
+    if not is_batch_input(appyaml, changed_since, discover):
+        click.echo('[Error] Invalid input, use --appyaml -, --changed-since or --discover to \
+select the app.yaml files to index.')
+        return
+    if not validate_batch_input(appyaml, None, None, changed_since, discover):
+        return
+    if prune and changed_since and cache_dir is None:
+        # Without a result cache, only the changed app.yaml files are part of the run and
+        # all the unchanged ones would be removed from the index.
+        click.echo('[Error] --prune with --changed-since requires --cache-dir, otherwise the \
+unchanged app.yaml files would be removed from the index.')
+        return
+    try:
+        fleet_index = FleetIndex(db)
+    except (OSError, sqlite3.Error, ValueError) as error:
+        click.echo(f'[Error] Failed to open the fleet index {db}: {error}')
+        return
+    try:
+        with fleet_index:
+            stats = _index_inputs(fleet_index, iter_batch_inputs(appyaml, changed_since, \
+                discover, max_depth, exclude, cache_dir), \
+                get_result_cache(cache_dir) or ResultCache(), prune)
+    except sqlite3.Error as error:
+        click.echo(f'[Error] Failed to write the fleet index {db}: {error}')
+        return
+    click.echo(f'[Info] Fleet index {db}: {stats}.')
+
+def _index_inputs(fleet_index: FleetIndex, inputs: Iterable[Tuple[str, Dict]], \
+    cache: ResultCache, prune: bool) -> IndexStats:
+    """Write the inputs whose content hash changed into the fleet index, and remove the
+    other inputs of the index if prune is True."""
+    stats = IndexStats()
+    input_names: Set[str] = set()
+    content_hashes = fleet_index.get_content_hashes()
+    feature_config_hash = get_feature_config_hash()
+    for input_name, input_data in inputs:
+        if not input_data:
+            click.echo(f'{input_name} is empty.')
+            continue
+        input_names.add(input_name)
+        content_hash = compute_cache_key('fleet_index', feature_config_hash, input_data)
+        if content_hashes.get(input_name) == content_hash:
+            stats.unchanged += 1
+            continue
+        context = TranslationContext(input_data)
+        fleet_index.upsert(input_name, content_hash, input_data, \
+            context.input_key_value_pairs, get_incompatible_features(context, cache))
+        stats.updated += 1
+    if prune:
+        stats.removed = fleet_index.remove_other_inputs(input_names)
+    return stats
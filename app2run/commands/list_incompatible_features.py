@@ -15,22 +15,60 @@
 """list_incompatible_features module contains the implmentation for
 the `app2run list-incompatible-features` command.
 """
+import hashlib
+import os
+import re
 import tempfile
+from functools import lru_cache, partial
 from os import path as os_path
-from typing import Dict, List
-from jinja2 import Environment, FileSystemLoader
+from typing import Dict, Iterable, List, Tuple
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 import click
 from click_option_group import optgroup
 import yaml
-from app2run.config.feature_config_loader import FeatureConfig, \
-    get_feature_config, InputType, UnsupportedFeature, get_feature_list_by_input_type
-from app2run.common.util import flatten_keys, validate_input, get_project_id_from_gcloud
+from app2run.config.feature_config_loader import InputType, UnsupportedFeature
+from app2run.commands.analysis import get_incompatible_features
+from app2run.commands.batch import BatchOptions, get_batch_options, get_batch_range_check, \
+    run_batch, validate_batch_options
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.common.util import validate_input, validate_batch_input, \
+    get_project_id_from_gcloud
+from app2run.common.batch_inputs import is_batch_input, iter_batch_inputs
+from app2run.common.result_cache import ResultCache, get_result_cache
 
 _TEMPLATE_PATH = os_path.join(os_path.dirname(__file__), '../config/')
+_HTML_TEMPLATE_NAME = 'output_tmpl.html'
+_HTML_FILENAME = 'incompatible_features.html'
+# Number of hex digits of the input name hash in the html file names of --html-dir.
+_HTML_NAME_HASH_SIZE = 8
+# Size of the write buffer of the html output, the rendered chunks are written through it.
+_HTML_BUFFER_SIZE = 64 * 1024
 
 @click.command(short_help="List incompatible App Engine features to migrate to Cloud Run.")
 @optgroup.group('APP.YAML', help='The option(s) for using an app.yaml as an input.')
-@optgroup.option('-a', '--appyaml', help='Path to the app.yaml of the app.')
+@optgroup.option('-a', '--appyaml', help='Path to the app.yaml of the app, use "-" to read a \
+stream of `---` separated YAML documents or NDJSON from stdin.')
+@optgroup.group('BATCH', help='The option(s) for using many app.yaml files as an input.')
+@optgroup.option('--changed-since', metavar='GIT_REF', help='Only check the app.yaml files \
+of the current git repository that changed (or whose included files changed) since GIT_REF.')
+@optgroup.option('--discover', metavar='DIR', type=click.Path(exists=True, file_okay=False), \
+    help='Check all the app.yaml files found in DIR, App Engine config files are recognized \
+by their content, .gitignore files are honored.')
+@optgroup.option('--max-depth', type=click.IntRange(min=0), help='Maximum depth of the \
+directories walked by --discover.')
+@optgroup.option('--exclude', multiple=True, help='.gitignore-style pattern of the files and \
+directories to skip with --discover, could be repeated.')
+@optgroup.option('-j', '--jobs', type=click.IntRange(min=1), default=1, show_default=True, \
+    help='Number of worker processes analyzing the inputs in parallel.')
+@optgroup.option('--completion-order', is_flag=True, help='With --jobs, output the result of \
+each input as soon as it completes rather than in the order of the inputs.')
+@optgroup.option('--shard-index', type=click.IntRange(min=0), help='Index of the shard of \
+the inputs to analyze, from 0 to --shard-count - 1.')
+@optgroup.option('--shard-count', type=click.IntRange(min=1), help='Number of shards the \
+inputs are partitioned into, by a stable hash of the input name.')
+@optgroup.option('--partial-output', type=click.Path(dir_okay=False), help='Write the results \
+to a partial result file rather than to the output, the partial result files of the shards \
+are combined by `app2run merge`.')
 @optgroup.group('ADMIN API', help='The option(s) for using a deployed version as an input.')
 @optgroup.option('-s', '--service', help='Service name of a deployed App Engine version.')
 @optgroup.option('-v', '--version', help='Version id of a deployed App Engine version.')
@@ -39,62 +77,80 @@ is deployed.')
 @optgroup.group('OTHERS')
 @optgroup.option('-o', '--output', default='yaml', show_default=True, type=click.Choice(['yaml', \
     'html']), help='Output format of the list-incompatible-features command.')
-def list_incompatible_features(appyaml, service, version, project, output) -> None:
+@optgroup.option('--html-dir', type=click.Path(file_okay=False), help='Directory of the html \
+output (one file per input), by default a new temporary directory per input.')
+@optgroup.option('--cache-dir', envvar='APP2RUN_CACHE_DIR', type=click.Path(file_okay=False), \
+    help='Directory of the result cache, results of unchanged inputs are read from the cache.')
+def list_incompatible_features(appyaml, changed_since, discover, max_depth, exclude, service, \
+    version, project, output, # pylint: disable=too-many-arguments,too-many-locals
+    html_dir, cache_dir, jobs, completion_order, shard_index, shard_count, partial_output) \
+    -> None:
     """list_incompatible_features command validates the input app.yaml or deployed app version
     to identify any incompatible features to migrate the App Engine app to Cloud Run."""
-    input_type, input_data = validate_input(appyaml, service, version, project)
-    if not input_type or not input_data:
+    cache = get_result_cache(cache_dir)
+    is_batch = is_batch_input(appyaml, changed_since, discover)
+    if not validate_batch_options(is_batch, shard_index, shard_count, partial_output):
         return
-    incompatible_list = _check_for_incompatibility(input_data, input_type)
-    appyaml = 'app.yaml' if appyaml is None else appyaml
-    input_name = _generate_input_name(input_type, appyaml, service, version, project)
-    _generate_output(incompatible_list, input_type, output, input_name)
+    if is_batch:
+        if not validate_batch_input(appyaml, service, version, changed_since, discover):
+            return
+        inputs = iter_batch_inputs(appyaml, changed_since, discover, max_depth, exclude, \
+            cache_dir)
+        # Inputs with the same canonical form are analyzed once, through an in-memory
+        # cache if no cache directory is given.
+        _check_inputs(inputs, output, cache or ResultCache(), get_batch_options(jobs, \
+            completion_order, shard_index, shard_count, partial_output), html_dir)
+    else:
+        input_type, input_data = validate_input(appyaml, service, version, project)
+        if not input_type or not input_data:
+            return
+        incompatible_list = get_incompatible_features(TranslationContext(input_data, \
+            input_type), cache)
+        appyaml = 'app.yaml' if appyaml is None else appyaml
+        input_name = generate_input_name(input_type, appyaml, service, version, project)
+        generate_incompatibility_output(incompatible_list, input_type, output, input_name, \
+            html_dir)
+    if cache is not None:
+        click.echo(f'[Info] Result cache: {cache.stats}.', err=True)
 
-def _generate_input_name(input_type, appyaml, service, version, project_cli_flag) -> str:
+def _check_inputs(inputs: Iterable[Tuple[str, Dict]], output: str, cache: ResultCache, \
+    options: BatchOptions = None, html_dir: str = None) -> None:
+    """Check every app.yaml input as it is produced, the output of each input is
+    identified by the input name. The options select the worker processes and the shard
+    of the inputs. With worker processes, the range_limited features are checked for blocks
+    of inputs at once, see get_batch_range_check."""
+    run_batch(partial(_check_batch_input, output=output, html_dir=html_dir), inputs, cache, \
+        None, options, get_batch_range_check(options))
+
+def _check_batch_input(input_name: str, input_data: Dict, cache: ResultCache, _write_plan, \
+    output: str, html_dir: str = None, # pylint: disable=too-many-arguments
+    prepared: Dict[str, bool] = None) -> None:
+    if not input_data:
+        click.echo(f'{input_name} is empty.')
+        return
+    incompatible_list = get_incompatible_features(TranslationContext(input_data, \
+        range_checks=prepared), cache)
+    generate_incompatibility_output(incompatible_list, InputType.APP_YAML, output, input_name, \
+        html_dir)
+
+def generate_input_name(input_type, appyaml, service, version, project_cli_flag) -> str:
+    """Generate the name of the input, `PROJECT/SERVICE/VERSION` for a deployed version."""
     if input_type == InputType.APP_YAML :
         return appyaml
     project_id = project_cli_flag if project_cli_flag is not None \
         else get_project_id_from_gcloud()
     return f'{project_id}/{service}/{version}'
 
-def _check_for_incompatibility(input_data: Dict, input_type: InputType) -> List[UnsupportedFeature]:
-    """Check for incompatibility features in the input yaml, it flatterns the nested input into a
-    one-level key-value pairs and compare it with the configured list of incompatible features."""
-    incompatible_list : List[UnsupportedFeature] = []
-
-    feature_config : FeatureConfig = get_feature_config()
-    unsupported_features = get_feature_list_by_input_type(input_type, feature_config.unsupported)
-    range_limited_features =  get_feature_list_by_input_type(input_type, \
-        feature_config.range_limited)
-    value_restricted_features = get_feature_list_by_input_type(input_type, \
-        feature_config.value_limited)
-    input_key_value_pairs = flatten_keys(input_data, "")
-    for key, val in input_key_value_pairs.items():
-        # Check for unsupported features.
-        if key in unsupported_features:
-            incompatible_list.append(unsupported_features[key])
-        # Check for range_limited features.
-        elif key in range_limited_features:
-            feature = range_limited_features[key]
-            if not feature.validate(val):
-                incompatible_list.append(range_limited_features[key])
-        # Check for value_restricted features.
-        elif key in value_restricted_features:
-            feature = value_restricted_features[key]
-            if not feature.validate(val):
-                incompatible_list.append(feature)
-
-    return incompatible_list
-
-def _generate_output(incompatible_features: List[UnsupportedFeature], input_type: InputType, \
-    output: str,  input_name: str) -> None:
-    """Generate readable output for features compability check result."""
+def generate_incompatibility_output(incompatible_features: List[UnsupportedFeature], \
+    input_type: InputType, output: str,  input_name: str, html_dir: str = None) -> None:
+    """Generate readable output for features compability check result. The html output is
+    written to html_dir, or to a new temporary directory if html_dir is None."""
     click.echo(f"list-incompatible-features output for {input_name}:\n")
     if len(incompatible_features) == 0:
         click.echo("No incompatibilities found.")
         return
     if output is not None and output == 'html'.casefold():
-        _genertate_html_output(incompatible_features, input_type)
+        _genertate_html_output(incompatible_features, input_type, input_name, html_dir)
         return
 
     click.echo("Summary:")
@@ -102,19 +158,40 @@ def _generate_output(incompatible_features: List[UnsupportedFeature], input_type
     click.echo("incompatible_features:")
     click.echo(yaml.dump(_get_display_features(incompatible_features, input_type)))
 
-def _genertate_html_output(incompatible_features: List[UnsupportedFeature], input_type: InputType):
-    environment = Environment(loader=FileSystemLoader(_TEMPLATE_PATH))
+def _genertate_html_output(incompatible_features: List[UnsupportedFeature], \
+    input_type: InputType, input_name: str, html_dir: str = None):
     incompatible_features.sort(key=lambda x: (x.severity, x.path[input_type.value]))
-    temp_dir = tempfile.mkdtemp()
-    results_filename = f'{temp_dir}/incompatible_features.html'
-    results_template = environment.get_template("output_tmpl.html")
+    if html_dir is None:
+        results_filename = f'{tempfile.mkdtemp()}/{_HTML_FILENAME}'
+    else:
+        os.makedirs(html_dir, exist_ok=True)
+        results_filename = os_path.join(html_dir, _get_html_filename(input_name))
     context = {
         "incompatible_features": incompatible_features,
         "input_type": input_type
     }
-    with open(results_filename, mode="w", encoding="utf-8") as results:
-        results.write(results_template.render(context))
-        click.secho(f'Html output of incompatible features: {results_filename}', fg='green')
+    # The chunks of the rendered template are streamed to the file rather than rendered
+    # as a single string.
+    with open(results_filename, mode="w", encoding="utf-8", buffering=_HTML_BUFFER_SIZE) \
+        as results:
+        results.writelines(_get_html_template().generate(context))
+    click.secho(f'Html output of incompatible features: {results_filename}', fg='green')
+
+@lru_cache(maxsize=None)
+def _get_html_template() -> Template:
+    """Get the template of the html output, loaded once per process. The compiled template
+    is kept in a bytecode cache (in the temporary directory) shared by the processes and
+    the runs of app2run, so the template is only compiled once."""
+    environment = Environment(loader=FileSystemLoader(_TEMPLATE_PATH), \
+        bytecode_cache=FileSystemBytecodeCache(), auto_reload=False)
+    return environment.get_template(_HTML_TEMPLATE_NAME)
+
+def _get_html_filename(input_name: str) -> str:
+    """Get the name of the html output of an input in the html directory, e.g.
+    `apps_a_app.yaml.<hash>.html` for `apps/a/app.yaml`. The short hash of the input name
+    tells apart the inputs flattened to the same name, e.g. `apps_a/app.yaml`."""
+    name_hash = hashlib.sha256(input_name.encode('utf8')).hexdigest()[:_HTML_NAME_HASH_SIZE]
+    return f"{re.sub(r'[^A-Za-z0-9._-]+', '_', input_name).strip('_')}.{name_hash}.html"
 
 def _get_display_features(features: List[UnsupportedFeature], input_type: InputType) -> List:
     """Convert a List[Tuple] to List[Object] in order to print desired output format."""
@@ -0,0 +1,82 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""merge module contains the implementation for the `app2run merge` command, which
+combines the partial result files of the shards of a batch run.
+"""
+import heapq
+from typing import Dict, List
+import click
+from app2run.commands.batch import iter_partial_results, output_batch_result, \
+    read_partial_results_header
+from app2run.commands.translate import apply_write_plan
+from app2run.common.result_cache import CacheStats
+from app2run.common.write_plan import WritePlan
+
+@click.command(short_help="Combine the partial result files of the shards of a batch run.")
+@click.argument('partial_results', nargs=-1, required=True, \
+    type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Print the files the translation would create \
+(e.g. Procfile) as a patch instead of creating them.')
+def merge(partial_results, dry_run) -> None:
+    """Merge command combines the partial result files written with --partial-output by \
+        every shard of a batch run into the output of the same run on a single node: the \
+        results are output in the order of the inputs, and the planned files are created."""
+    headers: List[Dict] = []
+    for partial_results_path in partial_results:
+        try:
+            headers.append(read_partial_results_header(partial_results_path))
+        except (OSError, ValueError) as error:
+            click.echo(f'[Error] Failed to read {partial_results_path}: {error}')
+            return
+    if not _validate_headers(partial_results, headers):
+        return
+    write_plan = WritePlan()
+    # Each partial result file is in the order of the inputs, they are merged lazily.
+    for result in heapq.merge(*[iter_partial_results(partial_results_path) \
+        for partial_results_path in partial_results], key=lambda result: result.index):
+        output_batch_result(result, write_plan=write_plan)
+    apply_write_plan(write_plan, dry_run)
+    if all(header['cache_stats'] is not None for header in headers):
+        cache_stats = CacheStats()
+        for header in headers:
+            cache_stats.merge(CacheStats(**header['cache_stats']))
+        click.echo(f'[Info] Result cache: {cache_stats}.', err=True)
+
+def _validate_headers(partial_results: List[str], headers: List[Dict]) -> bool:
+    """Check that the partial result files are the complete shards of the same run."""
+    for partial_results_path, header in zip(partial_results, headers):
+        if 'input_count' not in header:
+            click.echo(f'[Error] {partial_results_path} is incomplete, the shard did not \
+complete.')
+            return False
+    commands = {header['command'] for header in headers}
+    shard_counts = {header['shard_count'] for header in headers}
+    input_counts = {header['input_count'] for header in headers}
+    if len(commands) > 1 or len(shard_counts) > 1 or len(input_counts) > 1:
+        click.echo('[Error] The partial result files are not from the same run, they have \
+different commands, shard counts or inputs.')
+        return False
+    shard_count = shard_counts.pop()
+    shard_indexes = sorted(header['shard_index'] for header in headers)
+    if shard_indexes != list(range(shard_count)):
+        missing = sorted(set(range(shard_count)) - set(shard_indexes))
+        click.echo(f'[Error] Expected one partial result file per shard, shard indexes: \
+{shard_indexes}, missing: {missing}, shard count: {shard_count}.')
+        return False
+    if sum(header['result_count'] for header in headers) != input_counts.pop():
+        click.echo('[Error] The partial result files do not cover all the inputs, the shards \
+did not analyze the same inputs.')
+        return False
+    return True
@@ -0,0 +1,72 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""query module contains the implementation for the `app2run query` command, which
+answers questions about a fleet from the fleet index written by `app2run index`.
+"""
+import json
+import sqlite3
+import click
+import yaml
+from app2run.common.fleet_index import FleetIndex, QueryResult
+
+@click.command(short_help="Query the fleet index written by `app2run index`.")
+@click.option('--db', required=True, type=click.Path(exists=True, dir_okay=False), \
+    help='Path of the SQLite database of the fleet index.')
+@click.option('--path', help='app.yaml path (e.g. `inbound_services` or `resources.cpu`), \
+the inputs with a value at the path or at one of its children are listed.')
+@click.option('--greater-than', type=float, help='With --path, only list the numeric values \
+greater than the given number.')
+@click.option('--less-than', type=float, help='With --path, only list the numeric values \
+less than the given number.')
+@click.option('--equals', help='With --path, only list the values equal to the given YAML \
+value, e.g. `python39` or `true`.')
+@click.option('--incompatible', is_flag=True, help='List the incompatible features of the \
+inputs instead of their values, optionally filtered by --path and --severity.')
+@click.option('--severity', help='With --incompatible, only list the incompatible features \
+of the given severity, e.g. `major`.')
+@click.option('--sql', help='Run a read-only SQL query on the tables inputs, feature_values \
+and incompatible_features.')
+@click.option('-o', '--output', default='text', show_default=True, \
+    type=click.Choice(['text', 'json']), help='Output format of the query command.')
+def query(db, path, greater_than, less_than, equals, # pylint: disable=too-many-arguments
+    incompatible, severity, sql, output) -> None:
+    """Query command lists the inputs of the fleet index DB with a value at --path (e.g. \
+        the services using `inbound_services`, or the versions with `resources.cpu` \
+        greater than 8), or their incompatible features with --incompatible."""
+    if sum([path is not None and not incompatible, incompatible, sql is not None]) != 1:
+        click.echo('[Error] Invalid input, use one of --path, --incompatible or --sql.')
+        return
+    try:
+        with FleetIndex(db, read_only=True) as fleet_index:
+            if sql is not None:
+                result = fleet_index.execute(sql)
+            elif incompatible:
+                result = fleet_index.query_incompatible_features(path, severity)
+            else:
+                result = fleet_index.query_values(path, greater_than, less_than, \
+                    yaml.safe_load(equals) if equals is not None else None)
+    except (sqlite3.Error, ValueError) as error:
+        click.echo(f'[Error] Failed to query the fleet index {db}: {error}')
+        return
+    _output_query_result(result, output)
+
+def _output_query_result(result: QueryResult, output: str) -> None:
+    if output == 'json':
+        click.echo(json.dumps([dict(zip(result.columns, row)) for row in result.rows], \
+            indent=2))
+        return
+    click.echo('\t'.join(result.columns))
+    for row in result.rows:
+        click.echo('\t'.join('' if value is None else str(value) for value in row))
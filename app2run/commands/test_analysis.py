@@ -0,0 +1,140 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for analysis.py."""
+from unittest.mock import patch
+from click.testing import CliRunner
+from app2run.commands import analysis
+from app2run.commands.analysis import check_batch_ranges, check_for_incompatibility, \
+    get_canonical_input, get_rule_flags
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.rules import get_default_rule_registry
+from app2run.config.feature_config_loader import InputType, RangeLimitFeature
+from app2run.common.result_cache import ResultCache
+from app2run.main import cli
+
+runner = CliRunner()
+
+_TEMPLATE_STDIN_INPUT = """
+service: first
+runtime: nodejs16
+inbound_services:
+- warmup
+automatic_scaling:
+    max_instances: 3
+---
+service: second
+runtime: nodejs16
+inbound_services:
+- warmup
+automatic_scaling:
+    max_instances: 3
+---
+service: third
+runtime: nodejs16
+automatic_scaling:
+    max_instances: 5
+"""
+
+def test_canonical_input_drops_keys_not_consumed():
+    """test_canonical_input_drops_keys_not_consumed"""
+    context = TranslationContext({
+        'service': 'api',
+        'instance_class': 'F2',
+        'automatic_scaling': {'max_instances': 3},
+        'inbound_services': ['warmup'],
+    })
+    assert get_canonical_input(context) == {
+        'automatic_scaling.max_instances': 3,
+        'inbound_services': ['warmup'],
+    }
+    assert get_canonical_input(context, get_default_rule_registry()) == {
+        'instance_class': 'F2',
+        'automatic_scaling.max_instances': 3,
+        'inbound_services': ['warmup'],
+    }
+
+def test_canonical_input_admin_api():
+    """test_canonical_input_admin_api"""
+    input_data = {'id': 'v1', 'runtime': 'python39'}
+    context = TranslationContext(input_data, InputType.ADMIN_API)
+    assert get_canonical_input(context, get_default_rule_registry()) is input_data
+
+def test_batch_analyzes_identical_configurations_once():
+    """test_batch_analyzes_identical_configurations_once"""
+    with patch.object(analysis, 'check_for_incompatibility', \
+        wraps=analysis.check_for_incompatibility) as mock_check:
+        result = runner.invoke(cli, ['list-incompatible-features', '--appyaml', '-'], \
+            input=_TEMPLATE_STDIN_INPUT)
+    assert result.exit_code == 0
+    assert mock_check.call_count == 2
+    assert result.output.count('path: inbound_services') == 2
+    assert "list-incompatible-features output for <stdin>#2:\n\nNo incompatibilities found." \
+        in result.output
+
+def test_batch_translation_fans_out_to_every_input():
+    """test_batch_translation_fans_out_to_every_input"""
+    registry = get_default_rule_registry()
+    with patch.object(registry, 'run', wraps=registry.run) as mock_run:
+        result = runner.invoke(cli, ['translate', '--appyaml', '-', '--project', 'test'], \
+            input=_TEMPLATE_STDIN_INPUT)
+    assert result.exit_code == 0
+    # The cacheable rules run once per distinct configuration, the other rules (e.g.
+    # entrypoint) run for every input.
+    assert mock_run.call_count == 2 + 3
+    assert "gcloud run deploy first \\\n" in result.output
+    assert "gcloud run deploy second \\\n" in result.output
+    assert "gcloud run deploy third \\\n" in result.output
+    assert result.output.count('--max-instances=3') == 2
+    assert result.output.count('--max-instances=5') == 1
+
+def test_cached_rule_flags_replay_diagnostics():
+    """test_cached_rule_flags_replay_diagnostics"""
+    cache = ResultCache()
+    input_data = {'runtime': 'nodejs16', 'automatic_scaling': {'max_instances': -1}}
+    for _ in range(2):
+        context = TranslationContext(input_data, project='test-project')
+        get_rule_flags(context, get_default_rule_registry(), cache)
+        assert [diagnostic.code for diagnostic in context.diagnostics.records] == \
+            ['invalid-value']
+    assert cache.stats.hits == 1
+
+def test_check_batch_ranges():
+    """test_check_batch_ranges"""
+    inputs_data = [
+        {'runtime': 'python39', 'resources': {'cpu': 10, 'memory_gb': 4}},
+        {'runtime': 'python39', 'automatic_scaling': {'max_instances': 1001}},
+        None,
+        {'runtime': 'python39', 'automatic_scaling': {'min_instances': 3}},
+        {'runtime': 'python39', 'resources': {'cpu': True, 'memory_gb': 'large'}},
+    ]
+    range_checks = check_batch_ranges(inputs_data)
+    assert range_checks[2] == {}
+    for input_data, input_range_checks in zip(inputs_data, range_checks):
+        if input_data:
+            expected = check_for_incompatibility(input_data, InputType.APP_YAML)
+            # The range_limited values are not validated again for each input.
+            with patch.object(RangeLimitFeature, 'validate') as mock_validate:
+                assert check_for_incompatibility(input_data, InputType.APP_YAML, \
+                    range_checks=input_range_checks) == expected
+            assert mock_validate.call_count == 0
+    for jobs, check_ranges_count in [(1, 0), (2, 1)]:
+        with runner.isolated_filesystem():
+            with patch.object(analysis, 'check_ranges', wraps=analysis.check_ranges) \
+                as mock_check_ranges:
+                result = runner.invoke(cli, ['list-incompatible-features', '--appyaml', '-', \
+                    '--jobs', str(jobs)], input=_TEMPLATE_STDIN_INPUT)
+        assert result.exit_code == 0
+        # With worker processes, the inputs of the batch are checked at once.
+        assert mock_check_ranges.call_count == check_ranges_count
@@ -0,0 +1,170 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit test for `app2run analyze` command."""
+import io
+import os
+from unittest.mock import patch
+from click.testing import CliRunner
+from app2run.main import cli
+
+runner = CliRunner()
+
+def _gcloud_config_list(*_):
+    return io.StringIO('project = test-project')
+
+def test_analyze_appyaml():
+    """test_analyze_appyaml"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+service: api
+inbound_services:
+- warmup
+automatic_scaling:
+    max_instances: 3
+            """)
+        with patch.object(os, 'popen', side_effect=_gcloud_config_list) as mock_popen:
+            result = runner.invoke(cli, ['analyze'])
+        assert result.exit_code == 0
+        assert mock_popen.call_count == 1
+        assert "analyze output for app.yaml:" in result.output
+        assert "gcloud run deploy api \\" in result.output
+        assert "--max-instances=3" in result.output
+        assert '--service-account="test-project@appspot.gserviceaccount.com"' in result.output
+        assert "list-incompatible-features output for app.yaml:" in result.output
+        assert "path: inbound_services" in result.output
+
+def test_analyze_appyaml_service_account_without_gcloud():
+    """test_analyze_appyaml_service_account_without_gcloud"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+service: api
+service_account: api@test.iam.gserviceaccount.com
+            """)
+        # The project is not needed, gcloud is not run.
+        with patch.object(os, 'popen', side_effect=FileNotFoundError('gcloud')) \
+            as mock_popen:
+            result = runner.invoke(cli, ['analyze'])
+        assert result.exit_code == 0
+        assert mock_popen.call_count == 0
+        assert "gcloud run deploy api \\" in result.output
+        assert '--service-account="api@test.iam.gserviceaccount.com"' in result.output
+
+def test_analyze_admin_api_reads_input_once():
+    """test_analyze_admin_api_reads_input_once"""
+    gcloud_version_describe_output = """
+env: flexible
+id: dummy-python
+inboundServices:
+- INBOUND_SERVICE_WARMUP
+"""
+    with patch.object(os, 'popen', side_effect=[gcloud_version_describe_output, \
+        _gcloud_config_list()]) as mock_popen:
+        result = runner.invoke(cli, ['analyze', '--service', 's1', '--version', 'v1'])
+    assert result.exit_code == 0
+    # One `gcloud app versions describe` and one `gcloud config list`.
+    assert mock_popen.call_count == 2
+    assert "analyze output for test-project/s1/v1:" in result.output
+    assert "gcloud run deploy default \\" in result.output
+    assert "--timeout=60m" in result.output
+    assert "path: inboundServices" in result.output
+
+def test_analyze_stdin_stream():
+    """test_analyze_stdin_stream"""
+    stdin_input = """
+service: first
+---
+service: second
+inbound_services:
+- warmup
+"""
+    with patch.object(os, 'popen', side_effect=_gcloud_config_list) as mock_popen:
+        result = runner.invoke(cli, ['analyze', '--appyaml', '-', '--output-format', \
+            'knative'], input=stdin_input)
+    assert result.exit_code == 0
+    assert mock_popen.call_count == 1
+    assert "analyze output for <stdin>#0:" in result.output
+    assert "analyze output for <stdin>#1:" in result.output
+    assert "  name: second\n" in result.output
+    assert "gcloud run deploy" not in result.output
+    assert "No incompatibilities found." in result.output
+    assert "path: inbound_services" in result.output
+
+def test_analyze_result_cache():
+    """test_analyze_result_cache"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+inbound_services:
+- warmup
+automatic_scaling:
+    max_instances: -1
+            """)
+        first = runner.invoke(cli, ['analyze', '--project', 'test', '--cache-dir', 'cache'])
+        second = runner.invoke(cli, ['analyze', '--project', 'test', '--cache-dir', 'cache'])
+        assert "[Info] Result cache: 0 hit(s), 2 miss(es), 0 eviction(s)." in first.output
+        assert "[Info] Result cache: 2 hit(s), 0 miss(es), 0 eviction(s)." in second.output
+        # The cache stats are not part of the output of the command.
+        assert "[Info] Result cache:" in second.stderr
+        assert "[Info] Result cache:" not in second.stdout
+        # Warnings of the translation rules are replayed on a cache hit.
+        assert first.output == \
+            second.output.replace('2 hit(s), 0 miss(es)', '0 hit(s), 2 miss(es)')
+        assert "has a negagive value of -1" in second.output
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("automatic_scaling:\n    min_instances: 1\n")
+        third = runner.invoke(cli, ['analyze', '--project', 'test', '--cache-dir', 'cache'])
+        assert "[Info] Result cache: 0 hit(s), 2 miss(es), 0 eviction(s)." in third.output
+        assert "--min-instances=1" in third.output
+
+def test_analyze_discover_creates_files_per_app():
+    """test_analyze_discover_creates_files_per_app"""
+    with runner.isolated_filesystem():
+        for app_dir in ['app1', 'app2']:
+            os.makedirs(app_dir)
+            with open(f'{app_dir}/app.yaml', 'w', encoding='utf8') as appyaml:
+                appyaml.write('runtime: python39\n')
+        with patch.object(os, 'popen', side_effect=_gcloud_config_list):
+            result = runner.invoke(cli, ['analyze', '--discover', '.', '--dry-run'])
+        assert result.exit_code == 0
+        assert '+++ b/app1/Procfile' in result.output
+        assert '+++ b/app2/requirements.txt' in result.output
+        assert not os.path.exists('app1/Procfile')
+        with patch.object(os, 'popen', side_effect=_gcloud_config_list):
+            result = runner.invoke(cli, ['analyze', '--discover', '.'])
+        assert result.exit_code == 0
+        for app_dir in ['app1', 'app2']:
+            assert sorted(os.listdir(app_dir)) == ['Procfile', 'app.yaml', 'requirements.txt']
+        assert not os.path.exists('Procfile')
+
+def test_analyze_discover_jobs():
+    """test_analyze_discover_jobs"""
+    with runner.isolated_filesystem():
+        for index in range(12):
+            os.makedirs(f'app{index:02}')
+            with open(f'app{index:02}/app.yaml', 'w', encoding='utf8') as appyaml:
+                appyaml.write(f"""
+runtime: nodejs16
+service: app{index:02}
+automatic_scaling:
+    max_instances: {index % 3 - 1}
+""")
+        serial_result = runner.invoke(cli, ['analyze', '--discover', '.', '--project', 'test'])
+        parallel_result = runner.invoke(cli, ['analyze', '--discover', '.', '--project', 'test', \
+            '--jobs', '3'])
+        assert parallel_result.exit_code == 0
+        assert parallel_result.output == serial_result.output
+        assert "analyze output for app11/app.yaml:" in parallel_result.output
@@ -0,0 +1,167 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit test for `app2run drift` command."""
+import json
+import os
+from unittest.mock import patch
+from click.testing import CliRunner
+from app2run.main import cli
+
+runner = CliRunner()
+
+def _write_inputs():
+    os.makedirs('apps/a')
+    os.makedirs('apps/b')
+    os.makedirs('apps/c')
+    os.makedirs('services')
+    with open('apps/a/app.yaml', 'w', encoding='utf8') as appyaml:
+        appyaml.write("""
+runtime: python39
+service: a
+entrypoint: gunicorn -b :$PORT main:app
+automatic_scaling:
+    max_instances: 20
+    max_concurrent_requests: 50
+""")
+    with open('apps/b/app.yaml', 'w', encoding='utf8') as appyaml:
+        appyaml.write("""
+runtime: nodejs16
+service: b
+""")
+    with open('apps/c/app.yaml', 'w', encoding='utf8') as appyaml:
+        appyaml.write("""
+runtime: nodejs16
+service: c
+""")
+    # Exported by `gcloud run services describe a --format=export`, with the memory limit
+    # in another unit (0.25Gi is translated) and the max instances changed since the
+    # migration.
+    with open('services/a.yaml', 'w', encoding='utf8') as service:
+        service.write("""
+apiVersion: serving.knative.dev/v1
+kind: Service
+metadata:
+  name: a
+spec:
+  template:
+    metadata:
+      annotations:
+        autoscaling.knative.dev/maxScale: '100'
+        run.googleapis.com/cpu-throttling: 'false'
+    spec:
+      containerConcurrency: 50
+      timeoutSeconds: 600
+      containers:
+      - image: gcr.io/test/a
+        resources:
+          limits:
+            cpu: 1000m
+            memory: 256Mi
+""")
+    with open('services/b.json', 'w', encoding='utf8') as service:
+        json.dump({'apiVersion': 'serving.knative.dev/v1', 'kind': 'Service', \
+            'metadata': {'name': 'b'}, 'spec': {'template': {'spec': { \
+            'containerConcurrency': 80, 'containers': [{'image': 'gcr.io/test/b'}]}}}}, \
+            service)
+    with open('services/d.yaml', 'w', encoding='utf8') as service:
+        service.write("""
+apiVersion: serving.knative.dev/v1
+kind: Service
+metadata:
+  name: d
+""")
+
+_EXPECTED_OUTPUT = """[Info] 3 exported Cloud Run service(s) found in services.
+drift output for apps/a/app.yaml:
+[Info] A Procfile is created with entrypoint "gunicorn -b :$PORT main:app", this is \
+needed to deploy Apps from source with python39 runtime to Cloud Run using Buildpacks.
+[Warning] 1 setting(s) drifted from the Cloud Run service a of services/a.yaml:
+- field: max_instances
+  translated: '20'
+  exported: '100'
+drift output for apps/b/app.yaml:
+[Warning] 2 setting(s) drifted from the Cloud Run service b of services/b.json:
+- field: concurrency
+  translated: 10
+  exported: 80
+- field: cpu_throttling
+  translated: 'false'
+  exported: 'true'
+drift output for apps/c/app.yaml:
+[Warning] No exported Cloud Run service c, it is not compared.
+[Info] Exported Cloud Run service(s) without an app.yaml: d.
+"""
+
+def test_drift():
+    """test_drift"""
+    with runner.isolated_filesystem():
+        _write_inputs()
+        result = runner.invoke(cli, ['drift', '--services-dir', 'services', '--discover', \
+            'apps', '--project', 'test'])
+        assert result.exit_code == 0
+        assert result.output == _EXPECTED_OUTPUT
+        # No file (e.g. Procfile) is created by the translation.
+        assert sorted(os.listdir('apps/a')) == ['app.yaml']
+
+def test_drift_jobs():
+    """test_drift_jobs"""
+    with runner.isolated_filesystem():
+        _write_inputs()
+        result = runner.invoke(cli, ['drift', '--services-dir', 'services', '--discover', \
+            'apps', '--project', 'test', '--jobs', '2'])
+        assert result.exit_code == 0
+        assert result.output == _EXPECTED_OUTPUT
+
+def test_drift_service_account_without_gcloud():
+    """test_drift_service_account_without_gcloud"""
+    with runner.isolated_filesystem():
+        _write_inputs()
+        for name in ['a', 'b', 'c']:
+            with open(f'apps/{name}/app.yaml', 'a', encoding='utf8') as appyaml:
+                appyaml.write(f'service_account: {name}@test.iam.gserviceaccount.com\n')
+        # No input needs the default service account, the project is not resolved.
+        with patch.object(os, 'popen', side_effect=FileNotFoundError('gcloud')) \
+            as mock_popen:
+            result = runner.invoke(cli, ['drift', '--services-dir', 'services', \
+                '--discover', 'apps'])
+        assert result.exit_code == 0
+        assert mock_popen.call_count == 0
+        assert result.output == _EXPECTED_OUTPUT
+
+def test_drift_diagnostics():
+    """test_drift_diagnostics"""
+    with runner.isolated_filesystem():
+        _write_inputs()
+        with open('apps/b/app.yaml', 'a', encoding='utf8') as appyaml:
+            appyaml.write('automatic_scaling:\n    max_instances: -1\n')
+        result = runner.invoke(cli, ['drift', '--services-dir', 'services', '--discover', \
+            'apps', '--project', 'test'])
+        assert result.exit_code == 0
+        # The diagnostics of the translation are output with the input.
+        assert 'drift output for apps/b/app.yaml:\n[Warning] automatic_scaling.max_instances \
+has a negagive value of -1' in result.output
+        result = runner.invoke(cli, ['drift', '--services-dir', 'services', '--discover', \
+            'apps', '--project', 'test', '--diagnostics', 'json'])
+        assert result.exit_code == 0
+        assert '{"input": "apps/b/app.yaml", "code": "invalid-value"' in result.stderr
+        assert 'negagive value' not in result.stdout
+
+def test_drift_invalid_input():
+    """test_drift_invalid_input"""
+    with runner.isolated_filesystem():
+        os.makedirs('services')
+        result = runner.invoke(cli, ['drift', '--services-dir', 'services'])
+        assert result.exit_code == 0
+        assert result.output.startswith('[Error] Invalid input, use --appyaml -')
@@ -0,0 +1,92 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for emitters.py."""
+import yaml
+from app2run.commands.emitters import emit, emit_gcloud, emit_knative, emit_terraform, \
+    register_emitter, EMITTERS
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.service_spec import ServiceSpec
+
+def _spec(flags):
+    return ServiceSpec('default', flags)
+
+def test_emit_gcloud():
+    """test_emit_gcloud"""
+    assert emit_gcloud(_spec([CloudRunFlag('--cpu', '1'), CloudRunFlag('--timeout', '10m')])) == """
+gcloud run deploy default \\
+  --cpu=1 \\
+  --timeout=10m
+"""
+    assert emit_gcloud(_spec([])) == "\ngcloud run deploy default \n"
+
+def test_emit_knative():
+    """test_emit_knative"""
+    output = emit_knative(_spec([CloudRunFlag('--concurrency', '80'), \
+        CloudRunFlag('--timeout', '60m'), CloudRunFlag('--min-instances', '1'), \
+        CloudRunFlag('--set-env-vars', {'A': '1,2', 'B': '3'}, True), \
+        CloudRunFlag('--no-cpu-throttling'), CloudRunFlag('--memory', '2Gi'), \
+        CloudRunFlag('--labels', {'a': 'b', 'c': 'd'}), CloudRunFlag('--unknown', '1')]))
+    assert '# Not translated: --unknown=1\n' in output
+    service = yaml.safe_load(output)
+    assert service['metadata'] == {'name': 'default', 'labels': {'a': 'b', 'c': 'd'}}
+    template = service['spec']['template']
+    assert template['metadata']['annotations'] == {
+        'autoscaling.knative.dev/minScale': '1',
+        'run.googleapis.com/cpu-throttling': 'false',
+    }
+    assert template['spec']['containerConcurrency'] == 80
+    assert template['spec']['timeoutSeconds'] == 3600
+    container = template['spec']['containers'][0]
+    assert container['env'] == [{'name': 'A', 'value': '1,2'}, {'name': 'B', 'value': '3'}]
+    assert container['resources'] == {'limits': {'memory': '2Gi'}}
+
+def test_emit_terraform():
+    """test_emit_terraform"""
+    output = emit_terraform(_spec([CloudRunFlag('--max-instances', '3'), \
+        CloudRunFlag('--vpc-connector', 'c', True), \
+        CloudRunFlag('--vpc-egress', 'private-ranges-only', True), \
+        CloudRunFlag('--set-env-vars', {'A': '${x}'}, True), \
+        CloudRunFlag('--add-cloudsql-instances', ['p:r:i']), \
+        CloudRunFlag('--allow-unauthenticated')]))
+    assert 'resource "google_cloud_run_v2_service" "default" {' in output
+    assert '      max_instance_count = 3\n' in output
+    assert '      egress    = "PRIVATE_RANGES_ONLY"\n' in output
+    assert '        value = "$${x}"\n' in output
+    assert '        instances = ["p:r:i"]\n' in output
+    assert '  member   = "allUsers"\n' in output
+
+def test_emit_env_vars_file():
+    """test_emit_env_vars_file"""
+    spec = _spec([CloudRunFlag('--env-vars-file', 'env_vars.yaml')])
+    assert emit_gcloud(spec) == "\ngcloud run deploy default \\\n  --env-vars-file=env_vars.yaml\n"
+    # The env vars of the file are not read.
+    assert '# Not translated: --env-vars-file=env_vars.yaml\n' in emit_knative(spec)
+    spec.env_vars = {'A': '1', 'B': '$x'}
+    output = emit_knative(spec)
+    assert '# Not translated' not in output
+    assert yaml.safe_load(output)['spec']['template']['spec']['containers'][0]['env'] == \
+        [{'name': 'A', 'value': '1'}, {'name': 'B', 'value': '$x'}]
+    output = emit_terraform(spec)
+    assert '# Not translated' not in output
+    assert '        name  = "A"\n        value = "1"\n' in output
+
+def test_register_emitter():
+    """test_register_emitter"""
+    register_emitter('names', lambda spec: ' '.join(flag.name for flag in spec.flags))
+    try:
+        assert emit('names', _spec([CloudRunFlag('--cpu', '1'), \
+            CloudRunFlag('--memory', '1Gi')])) == '--cpu --memory'
+    finally:
+        del EMITTERS['names']
@@ -0,0 +1,128 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit test for `app2run export` command."""
+import csv
+import os
+from unittest.mock import patch
+import pytest
+from click.testing import CliRunner
+from app2run.commands import export
+from app2run.common import table_export
+from app2run.main import cli
+
+runner = CliRunner()
+
+def _write_app_yamls():
+    os.makedirs('apps/a')
+    os.makedirs('apps/b')
+    with open('apps/a/app.yaml', 'w', encoding='utf8') as appyaml:
+        appyaml.write("""
+runtime: python39
+service: a
+inbound_services:
+- warmup
+automatic_scaling:
+    max_instances: 2000
+""")
+    with open('apps/b/app.yaml', 'w', encoding='utf8') as appyaml:
+        appyaml.write("""
+runtime: nodejs16
+service: b
+env: flex
+resources:
+    cpu: 4
+    memory_gb: 8
+""")
+
+_EXPECTED_ROWS = [
+    ['apps/a/app.yaml', 'runtime', '', 'python39', '', '', '', ''],
+    ['apps/a/app.yaml', 'inbound_services', 'major', '["warmup"]', '', '', '', ''],
+    ['apps/a/app.yaml', 'automatic_scaling.max_instances', 'major', '2000', '2000', '', \
+        '--max-instances', '1000'],
+    ['apps/b/app.yaml', 'runtime', '', 'nodejs16', '', '', '', ''],
+    ['apps/b/app.yaml', 'resources.cpu', '', '4', '4', '', '--cpu', '4'],
+    ['apps/b/app.yaml', 'resources.memory_gb', '', '8', '8', '', '--memory', '8Gi'],
+]
+
+def test_export_csv():
+    """test_export_csv"""
+    with runner.isolated_filesystem():
+        _write_app_yamls()
+        result = runner.invoke(cli, ['export', '--discover', 'apps', '--project', 'test', \
+            '--output-file', 'fleet.csv'])
+        assert result.exit_code == 0
+        assert result.output == '[Info] 6 row(s) of 2 input(s) are written to fleet.csv (csv).\n'
+        with open('fleet.csv', 'r', encoding='utf8', newline='') as table:
+            rows = list(csv.reader(table))
+        assert rows == [table_export.TABLE_COLUMNS] + _EXPECTED_ROWS
+
+@pytest.mark.parametrize('output_file', ['fleet.arrow', 'fleet.parquet'])
+def test_export_arrow(output_file):
+    """test_export_arrow"""
+    pyarrow = pytest.importorskip('pyarrow')
+    with runner.isolated_filesystem():
+        _write_app_yamls()
+        # Write a record batch (or row group) every 4 rows.
+        with patch.object(table_export, '_BATCH_ROWS', 4):
+            result = runner.invoke(cli, ['export', '--discover', 'apps', '--project', 'test', \
+                '--output-file', output_file])
+        assert result.exit_code == 0
+        if output_file.endswith('.parquet'):
+            table = table_export.pyarrow.parquet.read_table(output_file)
+        else:
+            table = table_export.pyarrow.ipc.open_file(output_file).read_all()
+        assert table.schema.field('path').type == \
+            pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+        assert table.schema.field('number_value').type == pyarrow.float64()
+        assert table.schema.field('boolean_value').type == pyarrow.bool_()
+        assert [['' if value is None else str(value).removesuffix('.0') \
+            for value in row.values()] for row in table.to_pylist()] == _EXPECTED_ROWS
+        if output_file.endswith('.arrow'):
+            # The batches after the first one only add the new paths and flags.
+            reader = table_export.pyarrow.ipc.open_file(output_file)
+            reader.read_all()
+            assert reader.stats.num_dictionary_deltas > 0
+            assert reader.stats.num_replaced_dictionaries == 0
+
+def test_export_source_dir():
+    """test_export_source_dir"""
+    with runner.isolated_filesystem():
+        _write_app_yamls()
+        with patch('app2run.commands.export.TranslationContext', \
+            wraps=export.TranslationContext) as mock_context:
+            result = runner.invoke(cli, ['export', '--discover', 'apps', '--project', 'test', \
+                '--output-file', 'fleet.csv'])
+        assert result.exit_code == 0
+        assert [call.kwargs['source_dir'] for call in mock_context.call_args_list] == \
+            ['apps/a', 'apps/b']
+
+def test_get_row_values():
+    """test_get_row_values"""
+    assert table_export.get_row_values('python39') == ('python39', None, None)
+    assert table_export.get_row_values(4) == ('4', 4, None)
+    assert table_export.get_row_values(0.5) == ('0.5', 0.5, None)
+    assert table_export.get_row_values(True) == ('true', None, True)
+    assert table_export.get_row_values(['warmup']) == ('["warmup"]', None, None)
+
+def test_export_without_pyarrow():
+    """test_export_without_pyarrow"""
+    with runner.isolated_filesystem():
+        _write_app_yamls()
+        with patch.object(table_export, 'pyarrow', None):
+            result = runner.invoke(cli, ['export', '--discover', 'apps', '--project', 'test', \
+                '--output-file', 'fleet.parquet'])
+        assert result.output == '[Error] Failed to open fleet.parquet: The parquet format \
+requires pyarrow, install it with `pip install app2run[arrow]`.\n'
+        assert not os.path.exists('fleet.parquet')
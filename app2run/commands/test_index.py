@@ -0,0 +1,132 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit test for `app2run index` and `app2run query` commands."""
+import json
+import os
+from click.testing import CliRunner
+from app2run.common.fleet_index import FleetIndex
+from app2run.main import cli
+
+runner = CliRunner()
+
+def _write_app_yaml(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf8') as appyaml:
+        appyaml.write(content)
+
+def test_index_and_query():
+    """test_index_and_query"""
+    with runner.isolated_filesystem():
+        _write_app_yaml('apps/a/app.yaml', """
+runtime: python39
+service: a
+inbound_services:
+- warmup
+""")
+        _write_app_yaml('apps/b/app.yaml', """
+runtime: nodejs16
+service: b
+env: flex
+resources:
+    cpu: 10
+    memory_gb: 4
+""")
+        result = runner.invoke(cli, ['index', '--db', 'fleet.db', '--discover', 'apps'])
+        assert result.exit_code == 0
+        assert result.output == \
+            '[Info] Fleet index fleet.db: 2 updated, 0 unchanged, 0 removed.\n'
+        result = runner.invoke(cli, ['query', '--db', 'fleet.db', '--path', 'inbound_services'])
+        assert result.output == 'input_name\tservice\truntime\tpath\tvalue\n\
+apps/a/app.yaml\ta\tpython39\tinbound_services\t["warmup"]\n'
+        result = runner.invoke(cli, ['query', '--db', 'fleet.db', '--path', 'resources', \
+            '--greater-than', '8', '-o', 'json'])
+        assert json.loads(result.output) == [{'input_name': 'apps/b/app.yaml', 'service': 'b', \
+            'runtime': 'nodejs16', 'path': 'resources.cpu', 'value': '10'}]
+        result = runner.invoke(cli, ['query', '--db', 'fleet.db', '--path', 'runtime', \
+            '--equals', 'nodejs16', '-o', 'json'])
+        assert [row['input_name'] for row in json.loads(result.output)] == ['apps/b/app.yaml']
+        result = runner.invoke(cli, ['query', '--db', 'fleet.db', '--incompatible', '-o', \
+            'json'])
+        assert [(row['input_name'], row['path']) for row in json.loads(result.output)] == \
+            [('apps/a/app.yaml', 'inbound_services'), ('apps/b/app.yaml', 'resources.cpu')]
+        result = runner.invoke(cli, ['query', '--db', 'fleet.db', '--sql', \
+            'SELECT count(*) AS inputs FROM inputs'])
+        assert result.output == 'inputs\n2\n'
+
+def test_index_upserts_changed_inputs():
+    """test_index_upserts_changed_inputs"""
+    with runner.isolated_filesystem():
+        _write_app_yaml('apps/a/app.yaml', 'runtime: python39\n')
+        _write_app_yaml('apps/b/app.yaml', 'runtime: python39\n')
+        _write_app_yaml('apps/c/app.yaml', 'runtime: python39\n')
+        runner.invoke(cli, ['index', '--db', 'fleet.db', '--discover', 'apps'])
+        _write_app_yaml('apps/b/app.yaml', 'runtime: python310\n')
+        os.remove('apps/c/app.yaml')
+        result = runner.invoke(cli, ['index', '--db', 'fleet.db', '--discover', 'apps'])
+        assert result.output == \
+            '[Info] Fleet index fleet.db: 1 updated, 1 unchanged, 0 removed.\n'
+        result = runner.invoke(cli, ['index', '--db', 'fleet.db', '--discover', 'apps', \
+            '--prune'])
+        assert result.output == \
+            '[Info] Fleet index fleet.db: 0 updated, 2 unchanged, 1 removed.\n'
+        result = runner.invoke(cli, ['query', '--db', 'fleet.db', '--path', 'runtime', \
+            '-o', 'json'])
+        assert [(row['input_name'], row['value']) for row in json.loads(result.output)] == \
+            [('apps/a/app.yaml', '"python39"'), ('apps/b/app.yaml', '"python310"')]
+
+def test_index_prune_with_changed_since_requires_cache_dir():
+    """test_index_prune_with_changed_since_requires_cache_dir"""
+    with runner.isolated_filesystem():
+        result = runner.invoke(cli, ['index', '--db', 'fleet.db', '--changed-since', 'HEAD', \
+            '--prune'])
+        assert result.output == '[Error] --prune with --changed-since requires --cache-dir, \
+otherwise the unchanged app.yaml files would be removed from the index.\n'
+        assert not os.path.exists('fleet.db')
+
+def test_index_invalid_db():
+    """test_index_invalid_db"""
+    with runner.isolated_filesystem():
+        _write_app_yaml('apps/a/app.yaml', 'runtime: python39\n')
+        with open('fleet.db', 'w', encoding='utf8') as db_file:
+            db_file.write('not a SQLite database' * 10)
+        result = runner.invoke(cli, ['index', '--db', 'fleet.db', '--discover', 'apps'])
+        assert result.exit_code == 0
+        assert result.output.startswith('[Error] Failed to open the fleet index fleet.db: ')
+
+def test_fleet_index_rolls_back_on_error():
+    """test_fleet_index_rolls_back_on_error"""
+    with runner.isolated_filesystem():
+        try:
+            with FleetIndex('fleet.db') as fleet_index:
+                fleet_index.upsert('app.yaml', 'hash', {'runtime': 'python39'}, \
+                    {'runtime': 'python39'}, [])
+                raise RuntimeError('failed run')
+        except RuntimeError:
+            pass
+        with FleetIndex('fleet.db', read_only=True) as fleet_index:
+            assert not fleet_index.get_content_hashes()
+
+def test_query_invalid_input():
+    """test_query_invalid_input"""
+    with runner.isolated_filesystem():
+        _write_app_yaml('apps/a/app.yaml', 'runtime: python39\n')
+        runner.invoke(cli, ['index', '--db', 'fleet.db', '--discover', 'apps'])
+        result = runner.invoke(cli, ['query', '--db', 'fleet.db'])
+        assert result.output == '[Error] Invalid input, use one of --path, --incompatible \
+or --sql.\n'
+        result = runner.invoke(cli, ['query', '--db', 'fleet.db', '--sql', 'DELETE FROM inputs'])
+        assert result.output.startswith('[Error] Failed to query the fleet index fleet.db: ')
+        result = runner.invoke(cli, ['index', '--db', 'fleet.db'])
+        assert result.output.startswith('[Error] Invalid input, use --appyaml -')
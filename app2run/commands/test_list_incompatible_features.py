@@ -14,6 +14,7 @@
 
 """Unit test for `app2run list-incompatible-features` command."""
 import tempfile
+from hashlib import sha256
 from unittest.mock import patch
 import os
 import pytest
@@ -82,6 +83,27 @@ beta_settings:
             assert result.exit_code == 0
             assert f"Html output of incompatible features: {tmp_dir}" in result.output
 
+def test_html_output_dir():
+    """test_html_output_dir"""
+    # Both app.yaml files are flattened to apps_a_app.yaml, the hash of their path tells
+    # them apart.
+    html_names = {path: f'apps_a_app.yaml.{sha256(path.encode()).hexdigest()[:8]}.html' \
+        for path in ['apps/a/app.yaml', 'apps/a_app.yaml']}
+    with runner.isolated_filesystem():
+        os.makedirs('apps/a')
+        for service, path in zip(['a', 'b'], html_names):
+            with open(path, 'w', encoding='utf8') as appyaml:
+                appyaml.write(f'runtime: python39\nservice: {service}\ninbound_services:\n'
+                    '- warmup\n')
+        result = runner.invoke(cli, ['list-incompatible-features', '--discover', 'apps', \
+            '-o', 'html', '--html-dir', 'reports', '--jobs', '2'])
+        assert result.exit_code == 0
+        assert sorted(os.listdir('reports')) == sorted(html_names.values())
+        assert f"Html output of incompatible features: reports/{html_names['apps/a_app.yaml']}" \
+            in result.output
+        with open(f"reports/{html_names['apps/a/app.yaml']}", 'r', encoding='utf8') as html:
+            assert '<td>inbound_services</td>' in html.read()
+
 def test_appyaml_no_incompatibility_found():
     """test_appyaml_no_incompatibility_found"""
     with runner.isolated_filesystem():
@@ -399,6 +421,25 @@ runtime: foo
             assert "severity: major" in result.output
             assert "foo is not a known value." in result.output
 
+def test_appyaml_includes_unsupported():
+    """test_appyaml_includes_unsupported"""
+    with runner.isolated_filesystem():
+        os.mkdir('app')
+        with open('shared.yaml', 'w', encoding='utf8') as fragment:
+            fragment.write("""
+inbound_services:
+- warmup
+""")
+        with open('app/app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+runtime: python
+includes:
+- ../shared.yaml
+""")
+        result = runner.invoke(cli, ['list-incompatible-features', '--appyaml', 'app/app.yaml'])
+        assert result.exit_code == 0
+        assert "path: inbound_services" in result.output
+
 ##################### Tests using deployed version (admin API) input ###################
 
 def test_admin_api_no_incompatibility_found():
@@ -776,3 +817,23 @@ runtime: foo
         assert "path: runtime" in result.output
         assert "severity: major" in result.output
         assert "foo is not a known value." in result.output
+
+##################### Tests using stdin stream input ###################
+
+def test_stdin_multi_document_yaml_stream():
+    """test_stdin_multi_document_yaml_stream"""
+    stdin_input = """
+inbound_services:
+- warmup
+---
+---
+env: flex
+"""
+    result = runner.invoke(cli, ['list-incompatible-features', '--appyaml', '-'], \
+        input=stdin_input)
+    assert result.exit_code == 0
+    assert result.output.startswith("list-incompatible-features output for <stdin>#0:")
+    assert "path: inbound_services" in result.output
+    assert "<stdin>#1 is empty." in result.output
+    assert "list-incompatible-features output for <stdin>#2:\n\nNo incompatibilities found." \
+        in result.output
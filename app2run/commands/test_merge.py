@@ -0,0 +1,89 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit test for `app2run merge` command."""
+import os
+from click.testing import CliRunner
+from app2run.commands.batch import Shard
+from app2run.main import cli
+
+runner = CliRunner()
+
+def _write_app_yamls(count: int):
+    for index in range(count):
+        os.makedirs(f'app{index:02}')
+        runtime = 'python39' if index % 4 == 0 else 'nodejs16'
+        with open(f'app{index:02}/app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write(f"""
+runtime: {runtime}
+service: app{index:02}
+automatic_scaling:
+    max_instances: {index % 3 - 1}
+""")
+
+def test_shard_partition():
+    """test_shard_partition"""
+    input_names = [f'app{index}/app.yaml' for index in range(100)]
+    shards = [Shard(index, 3) for index in range(3)]
+    for input_name in input_names:
+        assert sum(shard.contains(input_name) for shard in shards) == 1
+    assert all(any(shard.contains(input_name) for input_name in input_names) \
+        for shard in shards)
+
+def test_merge_shards():
+    """test_merge_shards"""
+    with runner.isolated_filesystem():
+        _write_app_yamls(10)
+        single_result = runner.invoke(cli, ['analyze', '--discover', '.', '--project', 'test', \
+            '--dry-run'])
+        for shard_index in range(3):
+            result = runner.invoke(cli, ['analyze', '--discover', '.', '--project', 'test', \
+                '--shard-index', str(shard_index), '--shard-count', '3', '--jobs', \
+                str(shard_index + 1), '--partial-output', f'shard{shard_index}.jsonl'])
+            assert result.exit_code == 0
+            assert f'of shard {shard_index + 1}/3 are written to shard{shard_index}.jsonl' \
+                in result.output
+            assert 'analyze output for' not in result.output
+        # No files are created by the shards, they are planned in the partial results.
+        assert not os.path.exists('app00/Procfile')
+        merge_result = runner.invoke(cli, ['merge', 'shard2.jsonl', 'shard0.jsonl', \
+            'shard1.jsonl', '--dry-run'])
+        assert merge_result.exit_code == 0
+        assert merge_result.output == single_result.output
+        merge_result = runner.invoke(cli, ['merge', 'shard0.jsonl', 'shard1.jsonl', \
+            'shard2.jsonl'])
+        assert os.path.exists('app00/Procfile')
+        assert os.path.exists('app04/requirements.txt')
+
+def test_merge_missing_shard():
+    """test_merge_missing_shard"""
+    with runner.isolated_filesystem():
+        _write_app_yamls(4)
+        for shard_index in range(2):
+            runner.invoke(cli, ['list-incompatible-features', '--discover', '.', \
+                '--shard-index', str(shard_index), '--shard-count', '3', \
+                '--partial-output', f'shard{shard_index}.jsonl'])
+        result = runner.invoke(cli, ['merge', 'shard0.jsonl', 'shard1.jsonl'])
+        assert result.output == '[Error] Expected one partial result file per shard, \
+shard indexes: [0, 1], missing: [2], shard count: 3.\n'
+
+def test_shard_options_require_batch_input():
+    """test_shard_options_require_batch_input"""
+    result = runner.invoke(cli, ['translate', '--shard-index', '0', '--shard-count', '2'])
+    assert result.output.startswith('[Error] Invalid input, --shard-index, --shard-count and \
+--partial-output are only supported with many app.yaml inputs')
+    result = runner.invoke(cli, ['translate', '--discover', '.', '--shard-index', '2', \
+        '--shard-count', '2'])
+    assert result.output == '[Error] Invalid input, --shard-index should be less than \
+--shard-count (2).\n'
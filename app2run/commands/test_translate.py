@@ -17,6 +17,7 @@ from unittest.mock import patch
 import os
 from os import path
 import pytest
+import yaml
 from click.testing import CliRunner
 from app2run.main import cli
 from app2run.common.util import RUNTIMES_WITH_PROCFILE_ENTRYPOINT, \
@@ -866,6 +867,58 @@ entrypoint: foo
 found at existing Procfile, please add "web: foo" to the existing Procfile.'
             assert un_expected_warning_msg not in result.output
 
+def test_entrypoint_python_runtime_dry_run():
+    """test_entrypoint_python_runtime_dry_run"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+runtime: python
+entrypoint: foo
+            """)
+            appyaml.close()
+            result = runner.invoke(cli, ['translate', '--dry-run'])
+            assert "[Info] Dry run, the following files are not created:" in result.output
+            assert "+++ b/Procfile\n@@ -0,0 +1 @@\n+web: foo\n" in result.output
+            assert not path.exists('Procfile')
+
+def test_diagnostics_json():
+    """test_diagnostics_json"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+automatic_scaling:
+    max_instances: -1
+            """)
+            appyaml.close()
+            result = runner.invoke(cli, ['translate', '--diagnostics', 'json', \
+                '--project', 'test'])
+            assert result.exit_code == 0
+            assert '{"input": "app.yaml", "code": "invalid-value", "severity": "warning", \
+"message": "automatic_scaling.max_instances has a negagive value of -1, minimum value is 0."}' \
+                in result.stderr
+            assert 'negagive value' not in result.stdout
+            result = runner.invoke(cli, ['translate', '--diagnostics', 'none', \
+                '--project', 'test'])
+            assert 'negagive value' not in result.output
+
+def test_diagnostics_json_missing_include():
+    """test_diagnostics_json_missing_include"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+service: api
+includes:
+- missing.yaml
+            """)
+        result = runner.invoke(cli, ['translate', '--diagnostics', 'json', \
+            '--project', 'test'])
+        assert result.exit_code == 0
+        # The invalid include is a diagnostic of the input, not printed to stdout.
+        assert '"input": "app.yaml", "code": "missing-include", "severity": "warning"' \
+            in result.stderr
+        assert 'missing.yaml' not in result.stdout
+        assert 'gcloud run deploy api' in result.stdout
+
 def test_entrypoint_python_runtime_with_existing_procfile_no_entrypoint():
     """test_entrypoint_python_runtime_with_existing_procfile_no_entrypoint"""
     with runner.isolated_filesystem():
@@ -981,6 +1034,70 @@ env_variables:
             expected_flag = "--set-env-vars=\"^@^foo=bar@foo2=bar1,bar2\""
             assert expected_flag in result.output
 
+def test_env_variables_delimiter_not_in_values():
+    """test_env_variables_delimiter_not_in_values"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+env_variables:
+    foo: bar1,bar2
+    foo2: user@example.com
+            """)
+        result = runner.invoke(cli, ['translate'])
+        expected_flag = "--set-env-vars=\"^#^foo=bar1,bar2#foo2=user@example.com\""
+        assert expected_flag in result.output
+
+def test_env_variables_file():
+    """test_env_variables_file"""
+    envs = {f'VAR_{index}': 'x' * 200 for index in range(200)}
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            yaml.safe_dump({'runtime': 'nodejs16', 'env_variables': envs}, appyaml)
+        result = runner.invoke(cli, ['translate'])
+        assert '--env-vars-file=env_vars.yaml' in result.output
+        assert '--set-env-vars' not in result.output
+        assert '[Info] 200 env vars are written to env_vars.yaml and set by --env-vars-file.' \
+            in result.output
+        with open('env_vars.yaml', 'r', encoding='utf8') as env_vars_file:
+            assert yaml.safe_load(env_vars_file) == envs
+        # The other output formats set the env vars of the file.
+        for output_format in ['knative', 'terraform']:
+            result = runner.invoke(cli, ['translate', '--output-format', output_format])
+            assert '# Not translated' not in result.output
+            assert 'VAR_199' in result.output
+        # The file is reused as is, another file is not overwritten.
+        result = runner.invoke(cli, ['translate'])
+        assert '--env-vars-file=env_vars.yaml' in result.output
+        assert '[Info]' not in result.output
+        with open('env_vars.yaml', 'w', encoding='utf8') as env_vars_file:
+            env_vars_file.write('OTHER: value\n')
+        result = runner.invoke(cli, ['translate'])
+        assert '[Warning] env_vars.yaml already exists with other env vars, the env vars are \
+set by --set-env-vars.' in result.output
+        assert '--set-env-vars="VAR_0=' in result.output
+
+def test_env_variables_without_shell_safe_delimiter():
+    """test_env_variables_without_shell_safe_delimiter"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            yaml.safe_dump({'runtime': 'nodejs16', 'env_variables': \
+                {'foo': ',@#%&|;:~+*'}}, appyaml)
+        result = runner.invoke(cli, ['translate'])
+        # `!` would trigger the history expansion of bash in the double-quoted value.
+        assert '--set-env-vars="^!^' not in result.output
+        assert '--env-vars-file=env_vars.yaml' in result.output
+
+def test_flags_order():
+    """test_flags_order"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            yaml.safe_dump({'runtime': 'nodejs16', 'env_variables': {'foo': 'bar'}}, appyaml)
+        result = runner.invoke(cli, ['translate', '--project', 'test-project'])
+        flags = [line.split()[0].split('=')[0] for line in result.output.splitlines() \
+            if line.strip().startswith('--')]
+        assert flags == ['--concurrency', '--set-env-vars', '--service-account', \
+            '--no-cpu-throttling', '--allow-unauthenticated', '--labels']
+
 def test_vpc_access_connector_name_found():
     """test_vpc_access_connector_name_found"""
     with runner.isolated_filesystem():
@@ -1118,6 +1235,53 @@ beta_settings:
             expected_output_flag = "--add-cloudsql-instances=test"
             assert expected_output_flag in result.output
 
+def test_watch_retranslates_on_change():
+    """test_watch_retranslates_on_change"""
+    def edit_then_stop(_):
+        if not os.path.exists('edited'):
+            with open('edited', 'w', encoding='utf8'):
+                pass
+            with open('app.yaml', 'w', encoding='utf8') as appyaml:
+                appyaml.write("""
+env: flex
+resources:
+    cpu: 10
+            """)
+            return
+        raise KeyboardInterrupt()
+
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+env: flex
+resources:
+    cpu: 2
+            """)
+        with patch('app2run.common.watch.time.sleep', side_effect=edit_then_stop):
+            result = runner.invoke(cli, ['translate', '--watch', '--project', 'test'])
+        assert result.exit_code == 0
+        assert "[Watch] app.yaml changed (resources.cpu), re-translated in" in result.output
+        assert "  - --cpu=2\n  + --cpu=8\n" in result.output
+        assert "  incompatible features:\n  + resources.cpu\n" in result.output
+        assert "[Watch] Stopped." in result.output
+
+def test_multiple_output_formats():
+    """test_multiple_output_formats"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+service: api
+instance_class: F2
+            """)
+        result = runner.invoke(cli, ['translate', '--project', 'test', '-o', 'gcloud', \
+            '-o', 'knative', '-o', 'terraform'])
+        assert result.exit_code == 0
+        assert "gcloud run deploy api \\\n" in result.output
+        assert "kind: Service" in result.output
+        assert "            memory: 0.5Gi" in result.output
+        assert 'resource "google_cloud_run_v2_service" "api" {' in result.output
+        assert '          "memory" = "0.5Gi"' in result.output
+
 ##################### Tests using deployed version (admin API) input ###################
 
 def test_admin_api_default_service_name():
@@ -1198,6 +1362,71 @@ envVariables:
         expected_cpu_flag = "--set-env-vars=\"^@^foo=bar@foo2=bar1,bar2\""
         assert expected_cpu_flag in result.output
 
+_GCLOUD_SERVICE_OUTPUTS = {
+    'gcloud app services describe foo --project=test': """
+id: foo
+split:
+    allocations:
+        v1: 0.333
+        v2: 0.667
+        v3: 0
+""",
+    'gcloud app versions describe v1 --service=foo --project=test': """
+automaticScaling:
+    maxConcurrentRequests: 20
+""",
+    'gcloud app versions describe v2 --service=foo --project=test': """
+automaticScaling:
+    maxConcurrentRequests: 50
+""",
+}
+
+def test_admin_api_all_versions():
+    """test_admin_api_all_versions"""
+    with patch.object(os, 'popen', side_effect=_GCLOUD_SERVICE_OUTPUTS.get) as mock_popen:
+        result = runner.invoke(cli, \
+            ['translate', '--service', 'foo', '--all-versions', '--project', 'test'])
+    assert result.exit_code == 0
+    assert mock_popen.call_count == 3
+    # The version with the largest share of the traffic is deployed first.
+    v2_output = result.output.index('translate output for foo/v2 (67% of the traffic):')
+    v1_output = result.output.index('translate output for foo/v1 (33% of the traffic):')
+    assert v2_output < v1_output
+    assert '--concurrency=50' in result.output[v2_output:v1_output]
+    assert '--revision-suffix=v2\n' in result.output[v2_output:v1_output]
+    assert '--concurrency=20' in result.output[v1_output:]
+    assert '--revision-suffix=v1 \\\n  --no-traffic\n' in result.output[v1_output:]
+    assert result.output.endswith("""Traffic split of the service foo:
+
+gcloud run services update-traffic foo \\
+  --to-revisions=foo-v2=67,foo-v1=33
+
+""")
+
+def test_admin_api_all_versions_failed_version():
+    """test_admin_api_all_versions_failed_version"""
+    gcloud_outputs = {**_GCLOUD_SERVICE_OUTPUTS, \
+        'gcloud app versions describe v1 --service=foo --project=test': ''}
+    with patch.object(os, 'popen', side_effect=gcloud_outputs.get):
+        result = runner.invoke(cli, \
+            ['translate', '--service', 'foo', '--all-versions', '--project', 'test'])
+    assert result.exit_code == 0
+    # No deploy command is output, the version v2 was read but the traffic split could
+    # not be translated.
+    assert 'gcloud run' not in result.output
+    assert result.output.endswith('[Error] Failed to read the version(s) foo/v1, the versions \
+and the traffic split of the service foo are not translated.\n')
+
+def test_admin_api_all_versions_invalid_input():
+    """test_admin_api_all_versions_invalid_input"""
+    result = runner.invoke(cli, ['translate', '--service', 'foo', '--version', 'v1', \
+        '--all-versions'])
+    assert result.output.startswith('[Error] Invalid input, --all-versions requires --service')
+    with patch.object(os, 'popen', return_value='id: foo\n'):
+        result = runner.invoke(cli, \
+            ['translate', '--service', 'foo', '--all-versions', '--project', 'test'])
+    assert result.output == '[Error] Failed to read the traffic split of the service foo.\n'
+
 def test_admin_api_vpc_access_connector_name_found():
     """test_admin_api_vpc_access_connector_name_found"""
     gcloud_version_describe_output = """
@@ -2034,7 +2263,7 @@ env: flexible
             mock_popen.assert_called_with('gcloud app versions describe bar --service=foo \
 --project=test')
             assert result.exit_code == 0
-            expected_output = "Warning: entrypoint for the app is not detected/provided, \
+            expected_output = "[Warning] entrypoint for the app is not detected/provided, \
 if an entrypoint is needed to start the app, please use the `--command` flag to specify \
 the entrypoint for the App."
             assert expected_output in result.output
@@ -2094,7 +2323,7 @@ env: flexible
             mock_popen.assert_called_with('gcloud app versions describe bar --service=foo \
 --project=test')
             assert result.exit_code == 0
-            unexpected_output = "Warning: entrypoint for the app is not detected/provided, \
+            unexpected_output = "[Warning] entrypoint for the app is not detected/provided, \
 if an entrypoint is needed to start the app, please use the `--command` flag to specify \
 the entrypoint for the App."
             assert unexpected_output in result.output
@@ -2280,3 +2509,43 @@ betaSettings:
         assert result.exit_code == 0
         expected_output_flag = "--add-cloudsql-instances=test"
         assert expected_output_flag in result.output
+
+##################### Tests using stdin stream input ###################
+
+def test_stdin_multi_document_yaml_stream():
+    """test_stdin_multi_document_yaml_stream"""
+    with runner.isolated_filesystem():
+        stdin_input = """
+service: foo
+instance_class: F2
+---
+service: bar
+env: flex
+"""
+        result = runner.invoke(cli, ['translate', '--appyaml', '-', '--project', 'test'], \
+            input=stdin_input)
+        assert result.exit_code == 0
+        assert "translate output for <stdin>#0:" in result.output
+        assert "translate output for <stdin>#1:" in result.output
+        assert result.output.index("gcloud run deploy foo") < \
+            result.output.index("gcloud run deploy bar")
+        assert "--memory=0.5Gi" in result.output
+        assert "--timeout=60m" in result.output
+
+def test_stdin_ndjson_stream():
+    """test_stdin_ndjson_stream"""
+    with runner.isolated_filesystem():
+        stdin_input = '{"service": "foo"}\n\n{"service": "bar", "env": "flex"}\n'
+        result = runner.invoke(cli, ['translate', '--appyaml', '-', '--project', 'test'], \
+            input=stdin_input)
+        assert result.exit_code == 0
+        assert "translate output for <stdin>#1:" in result.output
+        assert "gcloud run deploy foo" in result.output
+        assert "gcloud run deploy bar" in result.output
+
+def test_stdin_stream_with_deployed_version():
+    """test_stdin_stream_with_deployed_version"""
+    result = runner.invoke(cli, ['translate', '--appyaml', '-', '--service', 'foo', \
+        '--version', 'bar'], input='service: foo\n')
+    assert result.exit_code == 0
+    assert "[Error] Invalid input, only one of app.yaml or deployed version" in result.output
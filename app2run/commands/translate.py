@@ -14,123 +14,357 @@
 
 """translate module contains the implmentation for the `app2run translate` command.
 """
-from typing import Dict, List
+import time
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import click
 from click_option_group import optgroup
-from app2run.commands.translation_rules.entrypoint import translate_entrypoint_features
-from app2run.config.feature_config_loader import Feature, InputType, FeatureConfig,\
-    get_feature_config, get_feature_list_by_input_type
-from app2run.commands.translation_rules.scaling import translate_scaling_features
-from app2run.commands.translation_rules.concurrent_requests import \
-    translate_concurrent_requests_features
-from app2run.commands.translation_rules.timeout import translate_timeout_features
-from app2run.commands.translation_rules.cpu_memory import translate_app_resources
-from app2run.commands.translation_rules.supported_features import translate_supported_features
-from app2run.commands.translation_rules.required_flags import translate_add_required_flags
-from app2run.commands.translation_rules.cloud_sql_instances import \
-    traqnslate_cloud_sql_instances_features
-from app2run.common.util import flatten_keys, validate_input
+from app2run.config.feature_config_loader import InputType
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.rules import get_default_rule_registry
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.service_spec import ServiceSpec, build_service_spec
+from app2run.commands.translation_rules.supported_features import read_env_vars_file
+from app2run.commands.emitters import EMITTERS, emit
+from app2run.common.util import validate_input, validate_batch_input, \
+    get_project_id_from_gcloud, read_app_yaml
+from app2run.common.watch import watch_files
+from app2run.commands.analysis import check_for_incompatibility, get_rule_flags
+from app2run.commands.batch import BatchOptions, get_batch_options, resolve_batch_project, \
+    run_batch, validate_batch_options
+from app2run.common.diagnostics import DIAGNOSTICS_FORMATS, Diagnostics
+from app2run.common.batch_inputs import get_input_source_dir, is_batch_input, \
+    iter_batch_inputs
+from app2run.common.result_cache import ResultCache, get_result_cache
+from app2run.common.service_versions import ServiceVersion, get_traffic_split, \
+    map_service_versions
+from app2run.common.write_plan import WritePlan
 
 @click.command(short_help="Translate an App Engine app.yaml or deployed version to \
 migrate to Cloud Run.")
 @optgroup.group('APP.YAML', help='The option(s) for using an app.yaml as an input.')
-@optgroup.option('-a', '--appyaml', help='Path to the app.yaml of the app.')
+@optgroup.option('-a', '--appyaml', help='Path to the app.yaml of the app, use "-" to read a \
+stream of `---` separated YAML documents or NDJSON from stdin.')
+@optgroup.option('--watch', is_flag=True, help='Watch the app.yaml and its included files, \
+and print the updated translation and incompatibility changes on every change.')
+@optgroup.group('BATCH', help='The option(s) for using many app.yaml files as an input.')
+@optgroup.option('--changed-since', metavar='GIT_REF', help='Only translate the app.yaml files \
+of the current git repository that changed (or whose included files changed) since GIT_REF.')
+@optgroup.option('--discover', metavar='DIR', type=click.Path(exists=True, file_okay=False), \
+    help='Translate all the app.yaml files found in DIR, App Engine config files are recognized \
+by their content, .gitignore files are honored.')
+@optgroup.option('--max-depth', type=click.IntRange(min=0), help='Maximum depth of the \
+directories walked by --discover.')
+@optgroup.option('--exclude', multiple=True, help='.gitignore-style pattern of the files and \
+directories to skip with --discover, could be repeated.')
+@optgroup.option('-j', '--jobs', type=click.IntRange(min=1), default=1, show_default=True, \
+    help='Number of worker processes analyzing the inputs in parallel.')
+@optgroup.option('--completion-order', is_flag=True, help='With --jobs, output the result of \
+each input as soon as it completes rather than in the order of the inputs.')
+@optgroup.option('--shard-index', type=click.IntRange(min=0), help='Index of the shard of \
+the inputs to analyze, from 0 to --shard-count - 1.')
+@optgroup.option('--shard-count', type=click.IntRange(min=1), help='Number of shards the \
+inputs are partitioned into, by a stable hash of the input name.')
+@optgroup.option('--partial-output', type=click.Path(dir_okay=False), help='Write the results \
+to a partial result file rather than to the output, the partial result files of the shards \
+are combined by `app2run merge`.')
 @optgroup.group('ADMIN API', help='The option(s) for using a deployed App Engine version as \
 an input.')
 @optgroup.option('-s', '--service', help='Name of the App Engine service.')
 @optgroup.option('-v', '--version', help='App Engine version id.')
+@optgroup.option('--all-versions', is_flag=True, help='Translate all the versions of --service \
+serving traffic to revisions of the Cloud Run service, with the traffic split of the service.')
 @optgroup.option('-p', '--project', help='Name of the project where the App Engine version \
 is deployed.')
 @optgroup.group('CLOUD RUN', help='The option(s) for configuraing the `gcloud run deploy` output.')
 @optgroup.option('-c', '--command', help="The entrypoint for the CloudRun App, use this flag \
     to override the entrypoint at app.yaml or deployed App Engine version.")
 @optgroup.option('--target-service', help="The name of the service for the Cloud Run app.")
-def translate(appyaml, service, version, project, command, target_service) -> None: # pylint: disable=too-many-arguments
+@optgroup.option('-o', '--output-format', type=click.Choice(sorted(EMITTERS)), multiple=True, \
+    default=['gcloud'], show_default=True, help='The output format(s) of the Cloud Run service, \
+could be repeated to output several formats from the same translation.')
+@optgroup.group('OTHERS')
+@optgroup.option('--cache-dir', envvar='APP2RUN_CACHE_DIR', type=click.Path(file_okay=False), \
+    help='Directory of the result cache, results of unchanged inputs are read from the cache.')
+@optgroup.option('--dry-run', is_flag=True, help='Print the files the translation would create \
+(e.g. Procfile) as a patch instead of creating them.')
+@optgroup.option('--diagnostics', 'diagnostics_format', type=click.Choice(DIAGNOSTICS_FORMATS), \
+    default='text', show_default=True, help='Output format of the warnings and info messages of \
+each input, `json` writes one JSON record per message to stderr, `none` skips them.')
+def translate(appyaml, watch, changed_since, discover, max_depth, exclude, service, version, \
+    project, command, target_service, # pylint: disable=too-many-arguments,too-many-locals
+    output_format, cache_dir, dry_run, diagnostics_format, jobs, completion_order, \
+    shard_index, shard_count, partial_output, all_versions) -> None:
     """Translate command translates an App Engine app.yaml or a deployed version to \
         eqauivalant gcloud command to migrate the GAE App to Cloud Run."""
+    cache = get_result_cache(cache_dir)
+    write_plan = WritePlan()
+    is_batch = is_batch_input(appyaml, changed_since, discover)
+    if not validate_batch_options(is_batch, shard_index, shard_count, partial_output):
+        return
+    if all_versions:
+        if service is None or version is not None or appyaml is not None or is_batch or watch:
+            click.echo('[Error] Invalid input, --all-versions requires --service, and could not \
+be used together with --version, --appyaml, --changed-since, --discover or --watch.')
+            return
+        _translate_service_versions(service, project, command, target_service, output_format, \
+            write_plan, diagnostics_format)
+    elif is_batch:
+        if not validate_batch_input(appyaml, service, version, changed_since, discover):
+            return
+        inputs = iter_batch_inputs(appyaml, changed_since, discover, max_depth, exclude, \
+            cache_dir)
+        # Inputs with the same canonical form are analyzed once, through an in-memory
+        # cache if no cache directory is given.
+        _translate_inputs(inputs, project, command, target_service, output_format, \
+            cache or ResultCache(), write_plan, diagnostics_format, get_batch_options(jobs, \
+            completion_order, shard_index, shard_count, partial_output))
+    elif watch:
+        if service is not None or version is not None:
+            click.echo('[Error] Invalid input, --watch only supports an app.yaml as an input.')
+            return
+        _watch_appyaml(appyaml if appyaml is not None else 'app.yaml', project, command, \
+            target_service, output_format, diagnostics_format)
+        return
+    else:
+        # The invalid includes of the app.yaml are output with the other diagnostics.
+        diagnostics = Diagnostics()
+        input_type, input_data = validate_input(appyaml, service, version, project, \
+            diagnostics)
+        if not input_type or not input_data:
+            diagnostics.echo(diagnostics_format, appyaml or 'app.yaml')
+            return
+        input_name = appyaml if appyaml is not None else 'app.yaml'
+        if input_type == InputType.ADMIN_API:
+            input_name = f'{service}/{version}'
+        _translate_input(input_data, input_type, project, command, target_service, \
+            output_format, cache, write_plan, diagnostics_format=diagnostics_format, \
+            input_name=input_name, diagnostics=diagnostics)
+    apply_write_plan(write_plan, dry_run)
+    if cache is not None:
+        click.echo(f'[Info] Result cache: {cache.stats}.', err=True)
+
+def _translate_inputs(inputs: Iterable[Tuple[str, Dict]], project: str, command: str, \
+    target_service: str, output_formats: List[str], # pylint: disable=too-many-arguments
+    cache: ResultCache, write_plan: WritePlan, diagnostics_format: str = 'text', \
+    options: BatchOptions = None):
+    """Translate every app.yaml input as it is produced, the output of each input is
+    prefixed with the input name. The project is resolved once for all the inputs. The
+    files created for each input (in the directory of its app.yaml) are added to the write
+    plan. The options select the worker processes and the shard of the inputs."""
+    project, inputs = resolve_batch_project(inputs, project)
+    run_batch(partial(_translate_batch_input, project=project, command=command, \
+        target_service=target_service, output_formats=output_formats, \
+        diagnostics_format=diagnostics_format), inputs, cache, write_plan, options)
 
-    input_type, input_data = validate_input(appyaml, service, version, project)
-    if not input_type or not input_data:
+def _translate_batch_input(input_name: str, input_data: Dict, cache: ResultCache, \
+    write_plan: WritePlan, project: str, # pylint: disable=too-many-arguments
+    command: str, target_service: str, output_formats: List[str], diagnostics_format: str):
+    click.echo(f'translate output for {input_name}:')
+    if not input_data:
+        click.echo(f'{input_name} is empty.')
         return
+    _translate_input(input_data, InputType.APP_YAML, project, command, target_service, \
+        output_formats, cache, write_plan, get_input_source_dir(input_name), \
+        diagnostics_format, input_name)
+
+def _translate_input(input_data: Dict, input_type: InputType, project: str, command: str, \
+    target_service: str, output_formats: List[str], # pylint: disable=too-many-arguments
+    cache: ResultCache = None, write_plan: WritePlan = None, source_dir: str = None, \
+    diagnostics_format: str = 'text', input_name: str = None, diagnostics: Diagnostics = None):
+    """Translate an input, the diagnostics of the translation (added to the diagnostics
+    of reading the input, if any) are output before the translated service."""
     target_service = target_service if target_service is not None else \
-        _get_service_name(input_data)
-    input_flatten_as_appyaml = flatten_keys(input_data, "") if input_type == InputType.APP_YAML \
-        else _convert_admin_api_input_to_app_yaml(input_data)
-    flags: List[str] = _get_cloud_run_flags(input_data, input_flatten_as_appyaml, \
-        input_type, project, command)
-    _generate_output(target_service, flags)
-
-def _convert_admin_api_input_to_app_yaml(admin_api_input_data: Dict):
-    input_key_value_pairs = flatten_keys(admin_api_input_data, "")
-    feature_config : FeatureConfig = get_feature_config()
-    translatable_features = {}
-    translatable_features.update(get_feature_list_by_input_type(InputType.ADMIN_API, \
-        feature_config.range_limited))
-    translatable_features.update(get_feature_list_by_input_type(InputType.ADMIN_API, \
-        feature_config.value_limited))
-    translatable_features.update(get_feature_list_by_input_type(InputType.ADMIN_API, \
-        feature_config.supported))
-
-    merged_keys = [key for key in input_key_value_pairs if key in translatable_features]
-    merged_features: List[Feature] = []
-    for key in merged_keys:
-        merged_features.append(translatable_features[key])
-    app_yaml_input = {}
-    for feature in merged_features:
-        app_yaml_input[feature.path[InputType.APP_YAML.value]] = \
-            input_key_value_pairs[feature.path[InputType.ADMIN_API.value]]
-    if 'env' in admin_api_input_data and admin_api_input_data['env'] == 'flexible':
-        app_yaml_input['env'] = 'flex'
-    if 'instanceClass' in admin_api_input_data:
-        app_yaml_input['instance_class'] = input_key_value_pairs['instanceClass']
-    return app_yaml_input
-
-def _get_cloud_run_flags(input_data: Dict, input_flatten_as_appyaml: Dict, input_type: InputType, \
-    project: str, command: str):
-
-    feature_config : FeatureConfig = get_feature_config()
-    range_limited_features_app_yaml = get_feature_list_by_input_type(InputType.APP_YAML, \
-        feature_config.range_limited)
-    supported_features = get_feature_list_by_input_type(InputType.APP_YAML, \
-        feature_config.supported)
-    value_limited_features_app_yaml = get_feature_list_by_input_type(InputType.APP_YAML, \
-        feature_config.value_limited)
-    return translate_concurrent_requests_features(input_flatten_as_appyaml, \
-        range_limited_features_app_yaml) + \
-           translate_scaling_features(input_flatten_as_appyaml, range_limited_features_app_yaml) + \
-           translate_timeout_features(input_flatten_as_appyaml) + \
-           translate_app_resources(input_flatten_as_appyaml, range_limited_features_app_yaml) + \
-           translate_supported_features(input_flatten_as_appyaml, supported_features, project) + \
-           translate_entrypoint_features(input_data, input_type, supported_features, command) + \
-           traqnslate_cloud_sql_instances_features(input_flatten_as_appyaml, \
-            value_limited_features_app_yaml) + \
-           translate_add_required_flags()
-
-def _get_service_name(input_data: Dict):
+        get_service_name(input_data)
+    context = TranslationContext(input_data, input_type, project, command, source_dir, \
+        write_plan=write_plan, diagnostics=diagnostics or Diagnostics())
+    spec = get_service_spec(target_service, context, cache)
+    context.diagnostics.echo(diagnostics_format, input_name)
+    generate_translate_output(spec, output_formats)
+
+def _translate_service_versions(service: str, project: str, command: str, \
+    target_service: str, output_formats: List[str], # pylint: disable=too-many-arguments
+    write_plan: WritePlan, diagnostics_format: str = 'text'):
+    """Translate the versions of the service serving traffic to revisions of the Cloud Run
+    service, followed by the traffic assignment of the revisions. The versions are fetched
+    and translated concurrently, the project, the target service and the command are
+    resolved once for all the versions. The version with the largest share of the traffic
+    is deployed first, the other revisions are deployed without traffic until the traffic
+    assignment. Nothing is translated if any of the versions fails to be read, a partial
+    set of revisions would not match the traffic split."""
+    if project is None:
+        project = get_project_id_from_gcloud()
+    versions = get_traffic_split(service, project)
+    if not versions:
+        click.echo(f'[Error] Failed to read the traffic split of the service {service}.')
+        return
+    target_service = target_service if target_service is not None else service
+    results = map_service_versions(partial(_translate_service_version, project=project, \
+        command=command, target_service=target_service), service, versions, project)
+    failed_versions = [f'{service}/{version.version_id}' for version, (spec, _) \
+        in zip(versions, results) if spec is None]
+    if failed_versions:
+        click.echo(f'[Error] Failed to read the version(s) {", ".join(failed_versions)}, the \
+versions and the traffic split of the service {service} are not translated.')
+        return
+    _output_service_versions(service, versions, results, output_formats, write_plan, \
+        diagnostics_format)
+    click.echo(f'Traffic split of the service {service}:')
+    click.echo(generate_traffic_output(target_service, versions))
+
+def _output_service_versions(service: str, versions: List[ServiceVersion], \
+    results: List[Tuple[ServiceSpec, TranslationContext]], # pylint: disable=too-many-arguments
+    output_formats: List[str], write_plan: WritePlan, diagnostics_format: str):
+    for index, (version, (spec, context)) in enumerate(zip(versions, results)):
+        input_name = f'{service}/{version.version_id}'
+        click.echo(f'translate output for {input_name} ({version.percent}% of the traffic):')
+        spec.flags.append(CloudRunFlag('--revision-suffix', version.version_id))
+        if index > 0:
+            spec.flags.append(CloudRunFlag('--no-traffic'))
+        for planned_write in context.planned_writes:
+            write_plan.add(planned_write)
+        context.diagnostics.echo(diagnostics_format, input_name)
+        generate_translate_output(spec, output_formats)
+
+def _translate_service_version(_version: ServiceVersion, version_data: Dict, project: str, \
+    command: str, target_service: str) \
+    -> Tuple[Optional[ServiceSpec], Optional[TranslationContext]]:
+    """Translate a version of a service, run by a thread per version. The files created by
+    the translation are planned in the context and added to the write plan by the caller."""
+    if not version_data:
+        return None, None
+    context = TranslationContext(version_data, InputType.ADMIN_API, project, command, \
+        write_files=False)
+    return get_service_spec(target_service, context), context
+
+def generate_traffic_output(target_service: str, versions: List[ServiceVersion]) -> str:
+    """Generate the `gcloud run services update-traffic` command assigning the traffic of
+    the versions to the matching revisions."""
+    revisions = ','.join(f'{target_service}-{version.version_id}={version.percent}' \
+        for version in versions)
+    return f"""
+gcloud run services update-traffic {target_service} \\
+  --to-revisions={revisions}
+"""
+
+def _watch_appyaml(appyaml: str, project: str, command: str, target_service: str, \
+    output_formats: List[str], diagnostics_format: str = 'text', # pylint: disable=too-many-arguments
+    max_polls: int = None):
+    """Translate the app.yaml, then re-translate it whenever the app.yaml or any of its
+    included files changes. The feature config and the parsed included fragments stay
+    cached between changes, and the translation is skipped when the change does not
+    modify any configuration key. Only the rules consuming the changed keys are
+    re-run, the output of the other rules is reused."""
+    watched_files: Set[str] = {appyaml}
+    previous: Dict = {}
+    registry = get_default_rule_registry()
+
+    def on_change():
+        nonlocal project
+        start_time = time.perf_counter()
+        diagnostics = Diagnostics()
+        input_data, included_files = read_app_yaml(appyaml, diagnostics)
+        watched_files.clear()
+        watched_files.update({appyaml} | included_files)
+        if not input_data:
+            diagnostics.echo(diagnostics_format, appyaml)
+            return
+        context = TranslationContext(input_data, InputType.APP_YAML, project, command, \
+            diagnostics=diagnostics)
+        input_flatten = context.input_flatten_as_appyaml
+        changed_keys = _get_changed_keys(previous.get('input', {}), input_flatten)
+        if previous and not changed_keys:
+            click.echo(f'[Watch] {appyaml} changed without configuration changes.')
+            return
+        if previous:
+            rule_flags = dict(previous['rule_flags'])
+            rule_flags.update(registry.run(context, registry.get_rules_for_keys(changed_keys)))
+        else:
+            rule_flags = registry.run(context)
+        # The project resolved for the default service account is reused by the next changes.
+        project = context.project
+        service_name = target_service if target_service is not None else \
+            get_service_name(input_data)
+        spec = build_service_spec(service_name, registry, rule_flags)
+        flags = spec.to_gcloud_flags()
+        incompatible_features = [feature.path[InputType.APP_YAML.value] for feature \
+            in check_for_incompatibility(input_data, InputType.APP_YAML, \
+                context.input_key_value_pairs)]
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        if previous:
+            click.echo(f'[Watch] {appyaml} changed ({", ".join(changed_keys)}), \
+re-translated in {elapsed_ms:.1f}ms.')
+            _print_delta('flags', previous['flags'], flags)
+            _print_delta('incompatible features', previous['incompatible_features'], \
+                incompatible_features)
+        context.diagnostics.echo(diagnostics_format, appyaml)
+        generate_translate_output(spec, output_formats)
+        previous.update(input=input_flatten, rule_flags=rule_flags, flags=flags, \
+            incompatible_features=incompatible_features)
+
+    on_change()
+    click.echo(f'[Watch] Watching {appyaml} for changes, press Ctrl+C to stop.')
+    try:
+        watch_files(lambda: sorted(watched_files), on_change, max_polls=max_polls)
+    except KeyboardInterrupt:
+        click.echo('[Watch] Stopped.')
+
+def _get_changed_keys(previous_input: Dict, current_input: Dict) -> List[str]:
+    keys = set(previous_input) | set(current_input)
+    return sorted(key for key in keys if key not in previous_input or key not in current_input \
+        or previous_input[key] != current_input[key])
+
+def _print_delta(name: str, previous_values: List[str], current_values: List[str]):
+    removed = [value for value in previous_values if value not in current_values]
+    added = [value for value in current_values if value not in previous_values]
+    if not removed and not added:
+        click.echo(f'  {name}: unchanged')
+        return
+    click.echo(f'  {name}:')
+    for value in removed:
+        click.echo(f'  - {value}')
+    for value in added:
+        click.echo(f'  + {value}')
+
+def get_service_spec(service_name: str, context: TranslationContext, \
+    cache: ResultCache = None) -> ServiceSpec:
+    """Translate the input of the context to the Cloud Run service spec."""
+    registry = get_default_rule_registry()
+    rule_flags = get_rule_flags(context, registry, cache)
+    spec = build_service_spec(service_name, registry, rule_flags)
+    if spec.get_flag('--env-vars-file') is not None:
+        spec.env_vars = read_env_vars_file(context)
+    return spec
+
+def apply_write_plan(write_plan: WritePlan, dry_run: bool = False):
+    """Create the planned files, or print them as a patch in dry-run mode."""
+    if not write_plan.writes:
+        return
+    if dry_run:
+        click.echo('[Info] Dry run, the following files are not created:')
+        click.echo(write_plan.to_patch(), nl=False)
+        return
+    try:
+        _, skipped = write_plan.apply()
+    except OSError as error:
+        click.echo(f'[Error] Failed to create the planned files, no file is created: {error}')
+        return
+    for write in skipped:
+        click.echo(f'[Warning] {write.path} was created during the translation, it is not \
+overwritten.')
+
+def get_service_name(input_data: Dict):
+    """Get the service name of the input, `default` if not specified."""
     if 'service' in input_data:
         custom_service_name = input_data['service'].strip()
         if len(custom_service_name) > 0:
             return custom_service_name
     return 'default'
 
-def _generate_output(service_name: str, flags: List[str]):
-    """
-    example output:
-    gcloud run deploy default \
-      --cpu=1 \
-      --memory=2Gi \
-      --timeout=10m
-    """
+def generate_translate_output(spec: ServiceSpec, output_formats: List[str]):
+    """Output the translated service in every output format, the service is translated
+    once for all the formats."""
     click.echo("""Warning: not all configuration could be translated,
 for more info use app2run list–incompatible-features.""")
-    first_line_ending_char = '' if flags is None or len(flags) == 0 else '\\'
-    output = f"""
-gcloud run deploy {service_name} {first_line_ending_char}
-"""
-    if flags is not None:
-        for i, flag in enumerate(flags):
-            # The last flag does not have tailing \
-            output += '  '
-            output += flag + ' \\' if i < len(flags) - 1 else flag
-            output += '\n'
-    click.echo(output)
+    for output_format in output_formats:
+        click.echo(emit(output_format, spec))
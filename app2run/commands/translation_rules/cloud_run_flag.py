@@ -0,0 +1,92 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The Cloud Run flags output by the translation rules, as typed values rendered to the
+`gcloud run deploy` flags."""
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+# Candidate delimiters of a `KEY=VALUE` pairs value, the first one which appears in no key
+# or value is used, see
+# https://cloud.google.com/run/docs/configuring/environment-variables#escaping
+# The value could be emitted in a double-quoted shell string, the characters which are
+# special there ($, `, \, " and ! for the history expansion) are not candidates.
+_KEY_VALUE_DELIMITERS = ',@#%&|;:~+*'
+
+FlagValue = Union[None, str, List[str], Dict[str, str]]
+
+@dataclass
+class CloudRunFlag:
+    """CloudRunFlag is a translated `gcloud run deploy` flag, e.g. `--cpu=1`:
+        - value: the unquoted value, None for a flag without value. A list is rendered
+          comma separated (e.g. --add-cloudsql-instances) and a mapping as `KEY=VALUE`
+          pairs (e.g. --set-env-vars, --labels).
+        - quoted: whether the value is quoted in the gcloud command.
+        - rule: name of the translation rule which output the flag.
+        - source_keys: the input keys (app.yaml paths) the flag is translated from.
+    """
+    name: str
+    value: FlagValue = None
+    quoted: bool = False
+    rule: str = None
+    source_keys: List[str] = field(default_factory=list)
+
+    def format_value(self) -> Optional[str]:
+        """Format the value as in the gcloud command, without quotes."""
+        if isinstance(self.value, dict):
+            return format_key_value_pairs(self.value)
+        if isinstance(self.value, list):
+            return ','.join(self.value)
+        return self.value
+
+    def to_gcloud(self) -> str:
+        """Format the flag as a `gcloud run deploy` flag."""
+        value = self.format_value()
+        if value is None:
+            return self.name
+        value = f'"{value}"' if self.quoted else value
+        return f'{self.name}={value}'
+
+    def to_record(self) -> Dict[str, Any]:
+        """Convert the flag to a JSON serializable record."""
+        return asdict(self)
+
+    @staticmethod
+    def from_record(record: Dict[str, Any]) -> 'CloudRunFlag':
+        """Create a flag from a record created by to_record."""
+        return CloudRunFlag(**record)
+
+def generate_flags(flag_names: List[str], value: Any, source_keys: List[str] = None, \
+    quoted: bool = False) -> List[CloudRunFlag]:
+    """Generate the flags of the given flag names with the same value, a scalar value is
+    converted to a string."""
+    if not isinstance(value, (list, dict)):
+        value = str(value)
+    return [CloudRunFlag(name, value, quoted, source_keys=[str(key) for key \
+        in source_keys or []]) for name in flag_names]
+
+def format_key_value_pairs(pairs: Dict[str, str]) -> Optional[str]:
+    """Format the pairs as `KEY=VALUE` pairs separated by a delimiter which appears in no
+    key or value (`,` if possible, otherwise with the `^DELIMITER^` escaping syntax).
+    Return None if every candidate delimiter appears in the pairs."""
+    if len(pairs) == 0:
+        return ''
+    key_values = [f'{key}={value}' for key, value in pairs.items()]
+    used_characters = set().union(*key_values)
+    delimiter = next((delimiter for delimiter in _KEY_VALUE_DELIMITERS \
+        if delimiter not in used_characters), None)
+    if delimiter is None:
+        return None
+    prefix = '' if delimiter == ',' else f'^{delimiter}^'
+    return prefix + delimiter.join(key_values)
@@ -13,17 +13,20 @@
 # limitations under the License.
 
 """Translation rule for cloud_sql_instances feature."""
-from typing import Dict, List
-from app2run.common.util import generate_output_flags, \
-    get_feature_key_from_input
+from typing import List
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag, generate_flags
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.registry import TranslationRule
 _ALLOW_CLOUD_SQL_INSTANCES_KEY = 'beta_settings.cloud_sql_instances'
 
-def traqnslate_cloud_sql_instances_features(input_data: Dict, value_limited_features: Dict) \
-    -> List[str]:
+def traqnslate_cloud_sql_instances_features(context: TranslationContext) \
+    -> List[CloudRunFlag]:
     """Translate cloud_sql_instances to the equivalent Cloud Run add-cloudsql-instances flag."""
+    input_data = context.input_flatten_as_appyaml
+    value_limited_features = context.value_limited_features
     output_values: List[str] = []
-    output_flags: List[str] = []
-    cloud_sql_instances_key_from_input = get_feature_key_from_input(input_data, \
+    output_flags: List[CloudRunFlag] = []
+    cloud_sql_instances_key_from_input = context.get_feature_key( \
         [_ALLOW_CLOUD_SQL_INSTANCES_KEY])
     if cloud_sql_instances_key_from_input:
         feature = value_limited_features[cloud_sql_instances_key_from_input]
@@ -34,5 +37,13 @@ def traqnslate_cloud_sql_instances_features(input_data: Dict, value_limited_feat
             if feature.validate(connection):
                 output_values.append(connection)
     if len(output_values) > 0:
-        output_flags += generate_output_flags(feature.flags, ','.join(output_values))
+        output_flags += generate_flags(feature.flags, output_values, \
+            [cloud_sql_instances_key_from_input])
     return output_flags
+
+CLOUD_SQL_INSTANCES_RULE = TranslationRule(
+    name='cloud_sql_instances',
+    translate=traqnslate_cloud_sql_instances_features,
+    input_keys=[_ALLOW_CLOUD_SQL_INSTANCES_KEY],
+    conflict_groups=[[_ALLOW_CLOUD_SQL_INSTANCES_KEY]],
+    output_flags=['--add-cloudsql-instances'])
@@ -14,23 +14,24 @@
 
 """Translation rule for concurrent_requests feature."""
 
-from typing import Dict, List
-import click
-from app2run.common.util import generate_output_flags, is_flex_env, \
-    get_feature_key_from_input
+from typing import List
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag, generate_flags
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.registry import TranslationRule
 
 _MAX_CONCURRENT_REQUESTS_KEY = 'automatic_scaling.max_concurrent_requests'
 _TARGET_CONCURRENT_REQUESTS_KEY = 'automatic_scaling.target_concurrent_requests'
 _ALLOW_MAX_CONCURRENT_REQ_KEYS = [_MAX_CONCURRENT_REQUESTS_KEY, _TARGET_CONCURRENT_REQUESTS_KEY]
 _DEFAULT_STANDARD_CONCURRENCY = 10
 
-def translate_concurrent_requests_features(input_data: Dict, \
-    range_limited_features: Dict) -> List[str]:
+def translate_concurrent_requests_features(context: TranslationContext) \
+    -> List[CloudRunFlag]:
     """Translate target_concurrent_requests(flex) and max_concurrent_requests
     (standard) to Cloud Run --concurrency flag."""
-    is_flex = is_flex_env(input_data)
-    feature_key = get_feature_key_from_input(input_data, \
-        _ALLOW_MAX_CONCURRENT_REQ_KEYS)
+    input_data = context.input_flatten_as_appyaml
+    range_limited_features = context.range_limited_features
+    is_flex = context.is_flex
+    feature_key = context.get_feature_key(_ALLOW_MAX_CONCURRENT_REQ_KEYS)
     input_has_concurrent_requests = feature_key is not None
 
     # if input does not have max_concurrent_request/target_concurrent_request specified,
@@ -40,13 +41,22 @@ def translate_concurrent_requests_features(input_data: Dict, \
         feature = range_limited_features[_MAX_CONCURRENT_REQUESTS_KEY]
         default_value = feature.range['max'] if is_flex else \
             _DEFAULT_STANDARD_CONCURRENCY
-        return generate_output_flags(feature.flags, default_value)
+        return generate_flags(feature.flags, default_value)
 
     feature = range_limited_features[feature_key]
     input_value = input_data[feature_key]
     if input_value < feature.range['min']:
-        click.echo(f'Warning: {feature_key} has invalid value of {input_value}, \
-           minimum value is {feature.range["min"]}')
+        context.diagnostics.warning('invalid-value', f'{feature_key} has invalid value of \
+{input_value}, minimum value is {feature.range["min"]}')
         return []
     target_value = input_value if feature.validate(input_value) else feature.range['max']
-    return generate_output_flags(feature.flags, target_value)
+    return generate_flags(feature.flags, target_value, [feature_key])
+
+# Always runs, a default --concurrency is set when none is specified.
+CONCURRENT_REQUESTS_RULE = TranslationRule(
+    name='concurrent_requests',
+    translate=translate_concurrent_requests_features,
+    input_keys=['env'] + _ALLOW_MAX_CONCURRENT_REQ_KEYS,
+    conflict_groups=[_ALLOW_MAX_CONCURRENT_REQ_KEYS],
+    output_flags=['--concurrency'],
+    always=True)
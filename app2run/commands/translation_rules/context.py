@@ -0,0 +1,184 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Analysis context shared by the translation rules of a single input."""
+import os
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import cached_property, lru_cache
+from typing import Any, Dict, List, Tuple
+from app2run.config.feature_config_loader import Feature, InputType, \
+    get_feature_config, get_feature_list_by_input_type
+from app2run.common.util import FlattenedView, get_feature_key_from_input, \
+    get_features_by_prefix, is_flex_env
+from app2run.common.diagnostics import Diagnostics
+from app2run.common.write_plan import PlannedWrite, WritePlan
+
+class ScalingTypeAppYaml(Enum):
+    """Enum of scaling types in app.yaml."""
+    AUTOMATIC_SCALING = "automatic_scaling"
+    MANUAL_SCALING = 'manual_scaling'
+    BASIC_SCALING = 'basic_scaling'
+
+@dataclass
+class TranslationContext: # pylint: disable=too-many-instance-attributes
+    """TranslationContext holds an input and the facts derived from it. Each fact is
+    computed once on first access and shared by all the translation rules. The rules
+    report their messages to diagnostics rather than printing them. The files
+    created by the rules are relative to source_dir (the current directory by default),
+    they are recorded in planned_writes and only written if write_files is True. With a
+    write_plan (shared by the inputs of a batch), the files are added to the plan instead
+    of being written. range_checks are the range_limited features of the input already
+    checked with the other inputs of a batch, keyed by path."""
+    input_data: Dict
+    input_type: InputType = InputType.APP_YAML
+    project: str = None
+    command: str = None
+    source_dir: str = None
+    write_files: bool = True
+    write_plan: WritePlan = None
+    diagnostics: Diagnostics = field(default_factory=Diagnostics, repr=False)
+    range_checks: Dict[str, bool] = field(default=None, repr=False)
+    planned_writes: List[PlannedWrite] = field(default_factory=list, init=False)
+    _feature_keys: Dict[Tuple[str, ...], str] = field(default_factory=dict, init=False, \
+        repr=False)
+
+    @cached_property
+    def input_key_value_pairs(self) -> Dict[str, Any]:
+        """A flattened (one-level key-value pairs) view of the input, keyed by the paths
+        of the input type."""
+        return FlattenedView(self.input_data)
+
+    @cached_property
+    def input_flatten_as_appyaml(self) -> Dict[str, Any]:
+        """The flattened input keyed by app.yaml paths, deployed versions (admin API
+        input) are converted to the equivalent app.yaml paths."""
+        if self.input_type == InputType.APP_YAML:
+            return self.input_key_value_pairs
+        return _convert_admin_api_input_to_app_yaml(self.input_data, \
+            self.input_key_value_pairs)
+
+    @cached_property
+    def is_flex(self) -> bool:
+        """Whether the input is for the flex environment."""
+        return is_flex_env(self.input_flatten_as_appyaml)
+
+    @cached_property
+    def runtime(self) -> str:
+        """The runtime of the input, None if not specified."""
+        return self.input_flatten_as_appyaml.get('runtime')
+
+    @cached_property
+    def scaling_types(self) -> List[ScalingTypeAppYaml]:
+        """The scaling types used in the input."""
+        return get_scaling_features_used(self.input_flatten_as_appyaml)
+
+    def get_feature_key(self, allow_keys: List[str]) -> str:
+        """Get the feature key from the input (keyed by app.yaml paths) based on the
+        list of allowed keys of which only one could be specified. The key is resolved
+        once per list, so conflicts are reported once."""
+        group = tuple(allow_keys)
+        if group not in self._feature_keys:
+            self._feature_keys[group] = get_feature_key_from_input( \
+                self.input_flatten_as_appyaml, allow_keys, self.diagnostics)
+        return self._feature_keys[group]
+
+    def get_source_path(self, filename: str) -> str:
+        """Get the path of a file of the source directory."""
+        return os.path.join(self.source_dir, filename) if self.source_dir else filename
+
+    def read_source_file(self, filename: str) -> str:
+        """Read a file of the source directory, a planned write is read back. Return
+        None if the file does not exist."""
+        file_path = self.get_source_path(filename)
+        for planned_write in reversed(self.planned_writes):
+            if planned_write.path == file_path:
+                return planned_write.content
+        if self.write_plan is not None:
+            return self.write_plan.read_file(file_path)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'r', encoding='utf8') as file:
+            return file.read()
+
+    def write_source_file(self, filename: str, content: str) -> None:
+        """Create a file in the source directory, the write is recorded in planned_writes
+        and added to the write plan, or performed if write_files is True."""
+        planned_write = PlannedWrite(self.get_source_path(filename), content)
+        self.planned_writes.append(planned_write)
+        if self.write_plan is not None:
+            self.write_plan.add(planned_write)
+        elif self.write_files:
+            with open(planned_write.path, 'w', encoding='utf8') as file:
+                file.write(content)
+
+    @property
+    def range_limited_features(self) -> Dict[str, Feature]:
+        """range_limited features keyed by app.yaml path."""
+        return get_app_yaml_features('range_limited')
+
+    @property
+    def supported_features(self) -> Dict[str, Feature]:
+        """supported features keyed by app.yaml path."""
+        return get_app_yaml_features('supported')
+
+    @property
+    def value_limited_features(self) -> Dict[str, Feature]:
+        """value_limited features keyed by app.yaml path."""
+        return get_app_yaml_features('value_limited')
+
+@lru_cache(maxsize=None)
+def get_app_yaml_features(feature_type: str) -> Dict[str, Feature]:
+    """Get the features of the given type (e.g. 'supported') of the feature config keyed
+    by app.yaml path, the lookup is built once per process."""
+    return get_features_by_input_type(InputType.APP_YAML, feature_type)
+
+@lru_cache(maxsize=None)
+def get_features_by_input_type(input_type: InputType, feature_type: str) -> Dict[str, Feature]:
+    """Get the features of the given type of the feature config keyed by the path of the
+    input type, the lookup is built once per process."""
+    return get_feature_list_by_input_type(input_type, getattr(get_feature_config(), feature_type))
+
+def get_scaling_features_used(input_data: Dict) -> List[ScalingTypeAppYaml]:
+    """Detect which scaling features are used in input (app.yaml)."""
+    scaling_types_detected = set()
+    for scaling_type in ScalingTypeAppYaml:
+        scaling_features_from_input = get_features_by_prefix(input_data, scaling_type.value)
+        if len(scaling_features_from_input) > 0:
+            scaling_types_detected.add(scaling_type)
+    return list(scaling_types_detected)
+
+def _convert_admin_api_input_to_app_yaml(admin_api_input_data: Dict, \
+    input_key_value_pairs: Dict) -> Dict:
+    translatable_features = {}
+    translatable_features.update(get_features_by_input_type(InputType.ADMIN_API, \
+        'range_limited'))
+    translatable_features.update(get_features_by_input_type(InputType.ADMIN_API, \
+        'value_limited'))
+    translatable_features.update(get_features_by_input_type(InputType.ADMIN_API, \
+        'supported'))
+
+    merged_keys = [key for key in input_key_value_pairs if key in translatable_features]
+    merged_features: List[Feature] = []
+    for key in merged_keys:
+        merged_features.append(translatable_features[key])
+    app_yaml_input = {}
+    for feature in merged_features:
+        app_yaml_input[feature.path[InputType.APP_YAML.value]] = \
+            input_key_value_pairs[feature.path[InputType.ADMIN_API.value]]
+    if 'env' in admin_api_input_data and admin_api_input_data['env'] == 'flexible':
+        app_yaml_input['env'] = 'flex'
+    if 'instanceClass' in admin_api_input_data:
+        app_yaml_input['instance_class'] = input_key_value_pairs['instanceClass']
+    return app_yaml_input
@@ -14,11 +14,10 @@
 
 """Translation rule for app resources (instance_class, cpu, memory)."""
 from typing import Dict, List
-import click
-from app2run.common.util import flatten_keys, get_features_by_prefix, is_flex_env, \
-    generate_output_flags, get_feature_key_from_input
-from app2run.commands.translation_rules.scaling import \
-    ScalingTypeAppYaml, get_scaling_features_used
+from app2run.common.util import get_features_by_prefix
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag, generate_flags
+from app2run.commands.translation_rules.context import ScalingTypeAppYaml, TranslationContext
+from app2run.commands.translation_rules.registry import TranslationRule
 
 _ALLOWED_RESOURCE_KEY: List[str] = ['resources.cpu', 'resources.memory_gb']
 _ALLOW_INSTANCE_CLASS_KEY: str = 'instance_class'
@@ -68,16 +67,17 @@ _INSTANCE_CLASS_MAP : Dict = {
         'memory': 2
     }
 }
-def translate_app_resources(input_data: Dict, range_limited_features: Dict) -> List[str]:
+def translate_app_resources(context: TranslationContext) -> List[CloudRunFlag]:
     """Translate instance_class(standard), cpu/memory(flex) to equivalent/compatible
     Cloud Run --cpu and --memory flags."""
-    if is_flex_env(input_data):
-        return _translate_flex_cpu_memory(input_data, range_limited_features)
-    return _translate_standard_instance_class(input_data)
+    if context.is_flex:
+        return _translate_flex_cpu_memory(context.input_flatten_as_appyaml, \
+            context.range_limited_features)
+    return _translate_standard_instance_class(context)
 
-def _translate_flex_cpu_memory(input_data: Dict, range_limited_features: Dict) -> List[str]:
-    output_flags: List[str] = []
-    input_key_value_pairs = flatten_keys(input_data, "")
+def _translate_flex_cpu_memory(input_key_value_pairs: Dict, range_limited_features: Dict) \
+    -> List[CloudRunFlag]:
+    output_flags: List[CloudRunFlag] = []
     input_feature_keys = get_features_by_prefix(input_key_value_pairs, 'resources')
     allowed_input_feature_keys = [key for key in input_feature_keys \
         if key in _ALLOWED_RESOURCE_KEY]
@@ -92,39 +92,41 @@ def _translate_flex_cpu_memory(input_data: Dict, range_limited_features: Dict) -
         # https://cloud.google.com/run/docs/configuring/memory-limits#setting-services
         if field_name.startswith('memory'):
             target_value = _format_cloud_run_memory_unit(target_value)
-        output_flags += generate_output_flags(range_limited_feature.flags, target_value)
+        output_flags += generate_flags(range_limited_feature.flags, target_value, [key])
 
     return output_flags
 
-def _translate_standard_instance_class(input_data: Dict) -> List[str]:
-    instance_class_key_from_input = get_feature_key_from_input(input_data, \
-        [_ALLOW_INSTANCE_CLASS_KEY])
+def _translate_standard_instance_class(context: TranslationContext) -> List[CloudRunFlag]:
+    instance_class_key_from_input = context.get_feature_key([_ALLOW_INSTANCE_CLASS_KEY])
     if instance_class_key_from_input:
-        instance_class = input_data[instance_class_key_from_input]
-        return _generate_cpu_memory_flags_by_instance_class(instance_class)
-    return _get_cpu_memory_default_based_on_scaling_method(input_data)
+        instance_class = context.input_flatten_as_appyaml[instance_class_key_from_input]
+        return _generate_cpu_memory_flags_by_instance_class(instance_class, \
+            [instance_class_key_from_input])
+    return _get_cpu_memory_default_based_on_scaling_method(context, context.scaling_types)
 
-def _get_cpu_memory_default_based_on_scaling_method(input_data: Dict) \
-    -> List[str]:
-    scaling_features_used = get_scaling_features_used(input_data)
+def _get_cpu_memory_default_based_on_scaling_method(context: TranslationContext, \
+    scaling_features_used: List[ScalingTypeAppYaml]) -> List[CloudRunFlag]:
     if len(scaling_features_used) == 0:
         return []
     if len(scaling_features_used) > 1:
-        click.echo('Warning: More than one scaling option is defined, \
-            only one scaling option should be used.')
+        context.diagnostics.warning('conflicting-scaling', 'More than one scaling option is \
+defined, only one scaling option should be used.')
         return []
     scaling_method = scaling_features_used[0]
     default_instance_class = _DEFAULT_CPU_MEM_CONFIG[scaling_method]
-    return _generate_cpu_memory_flags_by_instance_class(default_instance_class)
+    return _generate_cpu_memory_flags_by_instance_class(default_instance_class, \
+        [scaling_method.value])
 
-def _generate_cpu_memory_flags_by_instance_class(instance_class: str) -> List[str]:
+def _generate_cpu_memory_flags_by_instance_class(instance_class: str, \
+    source_keys: List[str]) -> List[CloudRunFlag]:
     cpu_memory_config = _INSTANCE_CLASS_MAP[instance_class]
     cpu_value = cpu_memory_config["cpu"]
     memory_value = cpu_memory_config["memory"]
     # Cloud Run --memory requires a unit suffix
     # https://cloud.google.com/run/docs/configuring/memory-limits#setting-services
     memory_value = _format_cloud_run_memory_unit(memory_value)
-    return [f'--cpu={cpu_value}', f'--memory={memory_value}']
+    return generate_flags(['--cpu'], cpu_value, source_keys) + \
+        generate_flags(['--memory'], memory_value, source_keys)
 
 def _format_cloud_run_memory_unit(value: float) -> str:
     # 1GB = 953Mi, 1Gi = 1024Mi memory, in Cloud Run, a minimum of 512MiB memory is
@@ -132,3 +134,10 @@ def _format_cloud_run_memory_unit(value: float) -> str:
     # memory requirement.
     # Allowed values are [m, k, M, G, T, Ki, Mi, Gi, Ti, Pi, Ei]
     return f'{value}Gi'
+
+APP_RESOURCES_RULE = TranslationRule(
+    name='app_resources',
+    translate=translate_app_resources,
+    input_keys=['env', 'resources', _ALLOW_INSTANCE_CLASS_KEY] + \
+        [scaling_type.value for scaling_type in ScalingTypeAppYaml],
+    output_flags=['--cpu', '--memory'])
@@ -14,92 +14,83 @@
 
 """Translation rule for entrypoint."""
 
-from os import path
 from typing import Dict, List
-import click
-from app2run.common.util import ENTRYPOINT_FEATURE_KEYS, RUNTIMES_WITH_PROCFILE_ENTRYPOINT, \
-    flatten_keys, generate_output_flags
+from app2run.common.util import ENTRYPOINT_FEATURE_KEYS, RUNTIMES_WITH_PROCFILE_ENTRYPOINT
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag, generate_flags
 from app2run.config.feature_config_loader import InputType
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.registry import TranslationRule
 
 _DEFAULT_PYTHON_ENTRYPOINT = 'gunicorn -b :$PORT main:app'
 # Cloud Run service must listen on 0.0.0.0 host,
 # ref https://cloud.google.com/run/docs/container-contract#port
 _DEFAULT_RUBY_ENTRYPOINT = 'bundle exec ruby app.rb -o 0.0.0.0'
-_DEFAULT_ENTRYPOINT_INFO_FORMAT = '[Info] Default entrypoint point for {runtime} is : \
+_DEFAULT_ENTRYPOINT_INFO_FORMAT = 'Default entrypoint point for {runtime} is : \
 "{entrypoint}", retry `app2run translate` with the --command="{entrypoint}" flag.'
 
-def translate_entrypoint_features(input_data: Dict, input_type: InputType, \
-    supported_features_app_yaml: Dict, command: str=None) -> List[str]:
+def translate_entrypoint_features(context: TranslationContext) -> List[CloudRunFlag]:
     """Tranlsate entrypoint from App Engine app to entrypoint for equivalent Cloud Run app."""
-    input_key_value_pairs = flatten_keys(input_data, "")
-    if input_type is InputType.ADMIN_API:
-        return _generate_entrypoint_admin_api(input_key_value_pairs, command)
-    return _generate_entrypoint_app_yaml(input_key_value_pairs, supported_features_app_yaml)
+    if context.input_type is InputType.ADMIN_API:
+        return _generate_entrypoint_admin_api(context)
+    return _generate_entrypoint_app_yaml(context, context.input_key_value_pairs)
 
-def _generate_entrypoint_admin_api(input_key_value_pairs: Dict, command: str=None):
+# Always runs, the entrypoint also depends on the --command flag, and a deployed
+# version (admin API input) does not include its entrypoint. Not cacheable, the rule
+# reads and writes the Procfile and requirements.txt of the source directory.
+ENTRYPOINT_RULE = TranslationRule(
+    name='entrypoint',
+    translate=translate_entrypoint_features,
+    input_keys=['runtime'] + ENTRYPOINT_FEATURE_KEYS,
+    output_flags=['--command'],
+    always=True,
+    cacheable=False)
+
+def _generate_entrypoint_admin_api(context: TranslationContext):
     # entrypoint is not included in the `gcloud app versions describe` output for GAE apps \
     # deployed from source, it needs to be provided via the --command flag when calling the \
     # app2run translate CLI.
+    command = context.command
     if command is None:
-        click.echo('Warning: entrypoint for the app is not detected/provided, if an entrypoint is \
-needed to start the app, please use the `--command` flag to specify the entrypoint for the App.')
-        _print_default_entryoint_per_runtime(input_key_value_pairs)
+        context.diagnostics.warning('missing-entrypoint', 'entrypoint for the app is not \
+detected/provided, if an entrypoint is needed to start the app, please use the `--command` flag \
+to specify the entrypoint for the App.')
+        _report_default_entryoint_per_runtime(context)
+        return []
+    runtime = context.runtime
+    if runtime in RUNTIMES_WITH_PROCFILE_ENTRYPOINT:
+        context.diagnostics.info('procfile-generated', f'generating a procfile with \
+runtime {runtime}, entrypoint {command}')
+        _generate_procfile(context, runtime, command)
         return []
-    if 'runtime' in input_key_value_pairs:
-        runtime = input_key_value_pairs['runtime']
-        if runtime in RUNTIMES_WITH_PROCFILE_ENTRYPOINT:
-            click.echo(f'generating a procfile with runtime {runtime}, entrypoint {command}')
-            _generate_procfile(runtime, command)
-            return []
-    return generate_output_flags(['--command'], f'"{command}"')
+    return generate_flags(['--command'], command, quoted=True)
 
-def _generate_entrypoint_app_yaml(input_key_value_pairs: Dict, supported_features_app_yaml: Dict):
-    if _should_generate_procfile(input_key_value_pairs):
-        runtime = input_key_value_pairs['runtime']
+def _generate_entrypoint_app_yaml(context: TranslationContext, input_key_value_pairs: Dict):
+    if context.runtime in RUNTIMES_WITH_PROCFILE_ENTRYPOINT:
         entrypoint = _get_entrypoint_from_input(input_key_value_pairs)
         # entrypoint is not specified at input, use the default entrypoint
         if not entrypoint:
-            entrypoint = _get_default_entrypoint_by_runtime(input_key_value_pairs)
-        _generate_procfile(runtime, entrypoint)
+            entrypoint = _get_default_entrypoint_by_runtime(context)
+        _generate_procfile(context, context.runtime, entrypoint)
         return []
     feature_key = 'entrypoint'
     if feature_key in input_key_value_pairs:
-        feature = supported_features_app_yaml[feature_key]
-        input_value = f'"{input_key_value_pairs[feature_key]}"'
-        return generate_output_flags(feature.flags, input_value)
+        feature = context.supported_features[feature_key]
+        return generate_flags(feature.flags, input_key_value_pairs[feature_key], \
+            [feature_key], quoted=True)
     return []
 
-def _should_generate_procfile(input_key_value_pairs: Dict) -> bool:
-    if 'runtime' not in input_key_value_pairs:
-        return False
-    runtime = input_key_value_pairs['runtime']
-    if runtime not in RUNTIMES_WITH_PROCFILE_ENTRYPOINT:
-        return False
-    return True
-
-def _generate_procfile(runtime: str, entrypoint: str):
-    if not _procfile_exists():
-        with open('Procfile', 'w', encoding='utf8') as file:
-            file.write(f'web: {entrypoint}')
-            click.echo(f'[Info] A Procfile is created with entrypoint "{entrypoint}", \
-this is needed to deploy Apps from source with {runtime} runtime to Cloud Run using Buildpacks.')
+def _generate_procfile(context: TranslationContext, runtime: str, entrypoint: str):
+    procfile_content = context.read_source_file('Procfile')
+    if procfile_content is None:
+        context.write_source_file('Procfile', f'web: {entrypoint}')
+        context.diagnostics.info('procfile-created', f'A Procfile is created with entrypoint \
+"{entrypoint}", this is needed to deploy Apps from source with {runtime} runtime to Cloud Run \
+using Buildpacks.')
         return
 
-    if not _procfile_contains_entrypoint(entrypoint):
-        click.echo(f'[Warning] Entrypoint "{entrypoint}" is not found at existing Procfile, \
-please add "web: {entrypoint}" to the existing Procfile.')
-
-def _procfile_exists() -> bool:
-    return path.exists('Procfile')
-
-def _procfile_contains_entrypoint(entrypoint: str) -> bool:
-    if not _procfile_exists():
-        return False
-    with open('Procfile', 'r', encoding='utf8') as file:
-        procfile_content = file.read()
-        if entrypoint in procfile_content:
-            return True
-    return False
+    if entrypoint not in procfile_content:
+        context.diagnostics.warning('procfile-missing-entrypoint', f'Entrypoint "{entrypoint}" \
+is not found at existing Procfile, please add "web: {entrypoint}" to the existing Procfile.')
 
 def _get_entrypoint_from_input(input_key_value_pairs: Dict) -> str:
     for key in ENTRYPOINT_FEATURE_KEYS:
@@ -107,40 +98,37 @@ def _get_entrypoint_from_input(input_key_value_pairs: Dict) -> str:
             return input_key_value_pairs[key]
     return ''
 
-def _get_default_entrypoint_by_runtime(input_key_value_pairs) -> str:
-    if 'runtime' in input_key_value_pairs:
-        runtime = input_key_value_pairs['runtime']
-        if runtime.startswith('python'):
-            # Check if requirements.txt exists and contains gunicorn as a dependency
-            _generate_requirement_file()
-            return _DEFAULT_PYTHON_ENTRYPOINT
-        if runtime.startswith('ruby'):
-            return _DEFAULT_RUBY_ENTRYPOINT
+def _get_default_entrypoint_by_runtime(context: TranslationContext) -> str:
+    runtime = context.runtime or ''
+    if runtime.startswith('python'):
+        # Check if requirements.txt exists and contains gunicorn as a dependency
+        _generate_requirement_file(context)
+        return _DEFAULT_PYTHON_ENTRYPOINT
+    if runtime.startswith('ruby'):
+        return _DEFAULT_RUBY_ENTRYPOINT
     return ''
 
-def _generate_requirement_file():
-    _file_exist = path.exists('requirements.txt')
-    if _file_exist:
-        with open('requirements.txt', 'r', encoding='utf8') as file:
-            _file_content = file.read()
+def _generate_requirement_file(context: TranslationContext):
+    _file_content = context.read_source_file('requirements.txt')
+    if _file_content is not None:
         if "gunicorn" not in _file_content:
-            click.echo('[Warning] gunicorn is not found at requirements.txt, \
-please add "gunicorn" to the existing requirements.txt in order to deploy Apps \
-from source to Cloud Run using Buildpacks.')
+            context.diagnostics.warning('requirements-missing-gunicorn', 'gunicorn is not \
+found at requirements.txt, please add "gunicorn" to the existing requirements.txt in order to \
+deploy Apps from source to Cloud Run using Buildpacks.')
     else:
-        with open('requirements.txt', 'w', encoding='utf8') as file:
-            file.write('gunicorn')
-            click.echo('[Info] A requirements.txt is created with gunicorn as a dependency, \
-this is needed to deploy Apps from source with python runtime to Cloud Run using Buildpacks.')
+        context.write_source_file('requirements.txt', 'gunicorn')
+        context.diagnostics.info('requirements-created', 'A requirements.txt is created with \
+gunicorn as a dependency, this is needed to deploy Apps from source with python runtime to \
+Cloud Run using Buildpacks.')
 
-def _print_default_entryoint_per_runtime(input_key_value_pairs):
-    if 'runtime' in input_key_value_pairs:
-        runtime = input_key_value_pairs['runtime']
-        if runtime.startswith('python'):
-            click.echo(_DEFAULT_ENTRYPOINT_INFO_FORMAT.format(runtime=runtime, \
-                entrypoint=_DEFAULT_PYTHON_ENTRYPOINT))
-            click.echo(f'[Info] Add "gunicorn" as a dependency to requirements.txt because it \
+def _report_default_entryoint_per_runtime(context: TranslationContext):
+    runtime = context.runtime or ''
+    if runtime.startswith('python'):
+        context.diagnostics.info('default-entrypoint', _DEFAULT_ENTRYPOINT_INFO_FORMAT.format( \
+            runtime=runtime, entrypoint=_DEFAULT_PYTHON_ENTRYPOINT))
+        context.diagnostics.info('default-entrypoint-dependency', f'Add "gunicorn" as a \
+dependency to requirements.txt because it \
 is used for the {runtime}\'s default entrypoint "{_DEFAULT_PYTHON_ENTRYPOINT}"')
-        if runtime.startswith('ruby'):
-            click.echo(_DEFAULT_ENTRYPOINT_INFO_FORMAT.format(runtime=runtime, \
-                entrypoint=_DEFAULT_RUBY_ENTRYPOINT))
+    if runtime.startswith('ruby'):
+        context.diagnostics.info('default-entrypoint', _DEFAULT_ENTRYPOINT_INFO_FORMAT.format( \
+            runtime=runtime, entrypoint=_DEFAULT_RUBY_ENTRYPOINT))
@@ -0,0 +1,147 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Translation rules provided by other packages through the `app2run.translation_rules`
+entry point group, e.g. in setup.py:
+
+    entry_points={
+        'app2run.translation_rules': [
+            'internal_runtime = my_package.rules:INTERNAL_RUNTIME_RULE',
+        ],
+    }
+
+where INTERNAL_RUNTIME_RULE is a TranslationRule. The declarations of the rules (name,
+input keys, etc.) are cached on disk, a plugin module is only imported when its rule
+runs, i.e. when its input keys appear in the input."""
+import json
+import os
+from importlib import metadata
+from typing import Dict, List, Tuple
+import click
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.registry import TranslationRule
+
+ENTRY_POINT_GROUP = 'app2run.translation_rules'
+_METADATA_CACHE_FILENAME = 'plugin_rules.json'
+
+class _LazyTranslate:
+    """_LazyTranslate loads the rule of an entry point on its first call."""
+    def __init__(self, entry_point: str):
+        self.entry_point = entry_point
+        self._translate = None
+
+    def __call__(self, context: TranslationContext) -> List[CloudRunFlag]:
+        if self._translate is None:
+            self._translate = _load_rule(metadata.EntryPoint(name='rule', \
+                value=self.entry_point, group=ENTRY_POINT_GROUP)).translate
+        return self._translate(context)
+
+def load_plugin_rules(metadata_cache_path: str = None) -> List[TranslationRule]:
+    """Get the translation rules of the installed plugins, sorted by name. The plugin
+    modules are not imported if the declarations of the installed entry points are
+    found in the metadata cache."""
+    if metadata_cache_path is None:
+        metadata_cache_path = _get_default_metadata_cache_path()
+    entry_points = sorted(_get_entry_points(), key=lambda entry_point: entry_point.name)
+    if not entry_points:
+        return []
+    fingerprint = [[*_get_distribution(entry_point), _describe(entry_point)] \
+        for entry_point in entry_points]
+    declarations = _read_metadata_cache(metadata_cache_path, fingerprint)
+    if declarations is None:
+        declarations, failed = _get_declarations(entry_points)
+        # Plugins failing to load are retried on the next run.
+        if not failed:
+            _write_metadata_cache(metadata_cache_path, fingerprint, declarations)
+    return [TranslationRule(
+        name=declaration['name'],
+        translate=_LazyTranslate(declaration['entry_point']),
+        input_keys=declaration['input_keys'],
+        conflict_groups=declaration['conflict_groups'],
+        output_flags=declaration['output_flags'],
+        always=declaration['always'],
+        cacheable=declaration['cacheable'],
+        version=declaration['version']) for declaration in declarations]
+
+def _get_entry_points() -> List[metadata.EntryPoint]:
+    try:
+        return list(metadata.entry_points(group=ENTRY_POINT_GROUP))
+    except TypeError:
+        # Before Python 3.10, entry_points() returns the entry points keyed by group.
+        return list(metadata.entry_points().get(ENTRY_POINT_GROUP, []))
+
+def _get_distribution(entry_point: metadata.EntryPoint) -> Tuple[str, str]:
+    """Get the (name, version) of the distribution of the entry point."""
+    dist = getattr(entry_point, 'dist', None)
+    if dist is None:
+        return (None, None)
+    return (dist.metadata['Name'], dist.version)
+
+def _describe(entry_point: metadata.EntryPoint) -> str:
+    return f'{entry_point.name} = {entry_point.value}'
+
+def _get_declarations(entry_points: List[metadata.EntryPoint]) -> Tuple[List[Dict], bool]:
+    declarations: List[Dict] = []
+    failed = False
+    for entry_point in entry_points:
+        try:
+            rule = _load_rule(entry_point)
+        except Exception as error: # pylint: disable=broad-except
+            click.echo(f'[Warning] Failed to load the translation rule plugin \
+{_describe(entry_point)}: {error}')
+            failed = True
+            continue
+        declarations.append({
+            'name': rule.name,
+            'entry_point': entry_point.value,
+            'input_keys': list(rule.input_keys),
+            'conflict_groups': [list(group) for group in rule.conflict_groups],
+            'output_flags': list(rule.output_flags),
+            'always': rule.always,
+            'cacheable': rule.cacheable,
+            'version': _get_distribution(entry_point)[1],
+        })
+    return declarations, failed
+
+def _load_rule(entry_point: metadata.EntryPoint) -> TranslationRule:
+    rule = entry_point.load()
+    if not isinstance(rule, TranslationRule):
+        raise TypeError(f'{entry_point.value} is not a TranslationRule')
+    return rule
+
+def _read_metadata_cache(metadata_cache_path: str, fingerprint: List) -> List[Dict]:
+    try:
+        with open(metadata_cache_path, 'r', encoding='utf8') as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if metadata.get('fingerprint') != fingerprint:
+        return None
+    return metadata.get('rules')
+
+def _write_metadata_cache(metadata_cache_path: str, fingerprint: List, \
+    declarations: List[Dict]) -> None:
+    try:
+        if os.path.dirname(metadata_cache_path):
+            os.makedirs(os.path.dirname(metadata_cache_path), exist_ok=True)
+        with open(metadata_cache_path, 'w', encoding='utf8') as file:
+            json.dump({'fingerprint': fingerprint, 'rules': declarations}, file)
+    except OSError:
+        pass
+
+def _get_default_metadata_cache_path() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), \
+        '.cache'))
+    return os.path.join(cache_home, 'app2run', _METADATA_CACHE_FILENAME)
@@ -0,0 +1,110 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Registry of the translation rules, with an index of the rules by the input
+keys they consume."""
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Set
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.context import TranslationContext
+
+@dataclass(frozen=True)
+class TranslationRule: # pylint: disable=too-many-instance-attributes
+    """TranslationRule declares a translation rule:
+        - input_keys: app.yaml paths (or parent paths, e.g. `automatic_scaling`) the
+          rule consumes.
+        - conflict_groups: groups of input keys of which only one could be specified.
+        - output_flags: the Cloud Run flags the rule could output.
+        - always: whether the rule runs even if none of its input keys is present,
+          e.g. to output a default value.
+        - cacheable: whether the output only depends on the input, the project and the
+          command, e.g. a rule reading or writing files is not cacheable.
+        - version: version of the rule, for rules not shipped with app2run (plugins).
+    """
+    name: str
+    translate: Callable[[TranslationContext], List[CloudRunFlag]]
+    input_keys: List[str] = field(default_factory=list)
+    conflict_groups: List[List[str]] = field(default_factory=list)
+    output_flags: List[str] = field(default_factory=list)
+    always: bool = False
+    cacheable: bool = True
+    version: str = None
+
+class RuleRegistry:
+    """RuleRegistry holds the translation rules in the order of their output, and an
+    index of the rules by input key, so that only the rules relevant to the keys of an
+    input are invoked."""
+    def __init__(self, rules: Iterable[TranslationRule] = ()):
+        self._rules: List[TranslationRule] = []
+        self._rules_by_key: Dict[str, Set[int]] = {}
+        self._always_rules: Set[int] = set()
+        for rule in rules:
+            self.register(rule)
+
+    @property
+    def rules(self) -> List[TranslationRule]:
+        """All the registered rules, in the order of their output."""
+        return list(self._rules)
+
+    def register(self, rule: TranslationRule) -> None:
+        """Register a rule, its output comes after the rules registered before it."""
+        if any(registered.name == rule.name for registered in self._rules):
+            raise ValueError(f'Translation rule {rule.name} is already registered.')
+        rule_index = len(self._rules)
+        self._rules.append(rule)
+        for key in rule.input_keys:
+            self._rules_by_key.setdefault(key, set()).add(rule_index)
+        if rule.always:
+            self._always_rules.add(rule_index)
+
+    def get_rules_for_keys(self, input_keys: Iterable[str], \
+        include_always: bool = False) -> List[TranslationRule]:
+        """Get the rules consuming any of the input keys (or any of their parent paths),
+        in the order of their output."""
+        rule_indexes = set(self._always_rules) if include_always else set()
+        for input_key in input_keys:
+            rule_indexes |= self._get_rule_indexes_for_key(str(input_key))
+        return [self._rules[rule_index] for rule_index in sorted(rule_indexes)]
+
+    def consumes_key(self, input_key: str) -> bool:
+        """Check if any rule consumes the input key (or any of its parent paths)."""
+        return len(self._get_rule_indexes_for_key(input_key)) > 0
+
+    def run(self, context: TranslationContext, rules: List[TranslationRule] = None, \
+        on_rule_done: Callable[[TranslationRule, float], None] = None) \
+        -> Dict[str, List[CloudRunFlag]]:
+        """Run the given rules (by default, the rules relevant to the input) and return
+        the output flags of each rule keyed by rule name, in the order of their output.
+        on_rule_done is called with each rule and its run time in seconds."""
+        if rules is None:
+            rules = self.get_rules_for_keys(context.input_flatten_as_appyaml, \
+                include_always=True)
+        output: Dict[str, List[str]] = {}
+        for rule in rules:
+            start_time = time.perf_counter()
+            for conflict_group in rule.conflict_groups:
+                context.get_feature_key(conflict_group)
+            output[rule.name] = rule.translate(context)
+            if on_rule_done is not None:
+                on_rule_done(rule, time.perf_counter() - start_time)
+        return output
+
+    def _get_rule_indexes_for_key(self, input_key: str) -> Set[int]:
+        rule_indexes: Set[int] = set()
+        path = ''
+        for part in input_key.split('.'):
+            path = f'{path}.{part}' if path else part
+            rule_indexes |= self._rules_by_key.get(path, set())
+        return rule_indexes
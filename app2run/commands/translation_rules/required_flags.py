@@ -14,22 +14,31 @@
 
 """Add required flags to output gcloud run deploy command."""
 
-from typing import List
+from typing import Dict, List
 import pkg_resources
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.registry import TranslationRule
 
-def translate_add_required_flags() -> List[str]:
+def translate_add_required_flags(_context: TranslationContext = None) -> List[CloudRunFlag]:
     """Add required flags to gcloud run deploy command."""
-    labels: str = _get_labels()
+    labels: Dict[str, str] = _get_labels()
     return [
-        '--no-cpu-throttling',
-        '--allow-unauthenticated',
-        f'--labels={labels}'
+        CloudRunFlag('--no-cpu-throttling'),
+        CloudRunFlag('--allow-unauthenticated'),
+        CloudRunFlag('--labels', labels)
     ]
 
-def _get_labels() -> str:
-    labels: List[str] = []
-    labels.append('migrated-from=app-engine')
-    labels.append('migration-tool=app-to-run-py')
+REQUIRED_FLAGS_RULE = TranslationRule(
+    name='required_flags',
+    translate=translate_add_required_flags,
+    output_flags=['--no-cpu-throttling', '--allow-unauthenticated', '--labels'],
+    always=True)
+
+def _get_labels() -> Dict[str, str]:
+    labels: Dict[str, str] = {}
+    labels['migrated-from'] = 'app-engine'
+    labels['migration-tool'] = 'app-to-run-py'
     version = pkg_resources.require('app2run')[0].version.replace('.', '_')
-    labels.append(f'app2run-version={version}')
-    return ",".join(labels)
+    labels['app2run-version'] = version
+    return labels
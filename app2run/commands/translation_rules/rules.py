@@ -0,0 +1,56 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The built-in translation rules, registered in the order of their output, followed by
+the translation rules of the installed plugins."""
+from functools import lru_cache
+import click
+from app2run.commands.translation_rules.registry import RuleRegistry
+from app2run.commands.translation_rules.concurrent_requests import CONCURRENT_REQUESTS_RULE
+from app2run.commands.translation_rules.scaling import SCALING_RULE
+from app2run.commands.translation_rules.timeout import TIMEOUT_RULE
+from app2run.commands.translation_rules.cpu_memory import APP_RESOURCES_RULE
+from app2run.commands.translation_rules.supported_features import \
+    DEFAULT_SERVICE_ACCOUNT_RULE, ENV_VARIABLES_RULE, SUPPORTED_FEATURES_RULE
+from app2run.commands.translation_rules.entrypoint import ENTRYPOINT_RULE
+from app2run.commands.translation_rules.cloud_sql_instances import CLOUD_SQL_INSTANCES_RULE
+from app2run.commands.translation_rules.required_flags import REQUIRED_FLAGS_RULE
+from app2run.commands.translation_rules.plugins import load_plugin_rules
+
+_BUILT_IN_RULES = [
+    CONCURRENT_REQUESTS_RULE,
+    SCALING_RULE,
+    TIMEOUT_RULE,
+    APP_RESOURCES_RULE,
+    SUPPORTED_FEATURES_RULE,
+    ENV_VARIABLES_RULE,
+    DEFAULT_SERVICE_ACCOUNT_RULE,
+    ENTRYPOINT_RULE,
+    CLOUD_SQL_INSTANCES_RULE,
+    REQUIRED_FLAGS_RULE,
+]
+
+@lru_cache(maxsize=None)
+def get_default_rule_registry() -> RuleRegistry:
+    """Get the registry of the built-in rules and of the rules of the installed plugins,
+    built once per process. The plugins are discovered on the first call rather than at
+    import, so that the commands (and the worker processes) which do not translate do not
+    look for them."""
+    registry = RuleRegistry(_BUILT_IN_RULES)
+    for plugin_rule in load_plugin_rules():
+        try:
+            registry.register(plugin_rule)
+        except ValueError as error:
+            click.echo(f'[Warning] {error} The translation rule plugin is skipped.')
+    return registry
@@ -0,0 +1,50 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Typed representation of the translated Cloud Run service, rendered by the emitters
+(gcloud command, Knative service YAML, Terraform) without translating the input again."""
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.registry import RuleRegistry
+
+@dataclass
+class ServiceSpec:
+    """ServiceSpec is the translated Cloud Run service of an input. env_vars are the env
+    vars set by the --env-vars-file flag (if any), read from the file, so that they could
+    be rendered in the other output formats."""
+    name: str
+    flags: List[CloudRunFlag] = field(default_factory=list)
+    env_vars: Optional[Dict[str, str]] = None
+
+    def get_flag(self, name: str) -> Optional[CloudRunFlag]:
+        """Get the flag by name, None if the flag is not translated."""
+        for flag in self.flags:
+            if flag.name == name:
+                return flag
+        return None
+
+    def to_gcloud_flags(self) -> List[str]:
+        """Format the flags as `gcloud run deploy` flags."""
+        return [flag.to_gcloud() for flag in self.flags]
+
+def build_service_spec(service_name: str, registry: RuleRegistry, \
+    rule_flags: Dict[str, List[CloudRunFlag]]) -> ServiceSpec:
+    """Build the ServiceSpec from the output flags of the rules keyed by rule name, the
+    flags are ordered by the rules registration and annotated with the rule name."""
+    spec = ServiceSpec(service_name)
+    for rule in registry.rules:
+        for flag in rule_flags.get(rule.name, []):
+            spec.flags.append(replace(flag, rule=rule.name))
+    return spec
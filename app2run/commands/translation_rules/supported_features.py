@@ -15,51 +15,97 @@
 """Translate supported features found at app.yaml to equivalent Cloud Run flags."""
 
 
-from typing import Dict, List
-from app2run.common.util import ENTRYPOINT_FEATURE_KEYS, generate_output_flags, \
-    get_feature_key_from_input, get_project_id_from_gcloud
+from typing import Dict, List, Optional
+import yaml
+from app2run.common.util import ENTRYPOINT_FEATURE_KEYS, get_project_id_from_gcloud
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag, \
+    format_key_value_pairs, generate_flags
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.registry import TranslationRule
 
 _ALLOW_ENV_VARIABLES_KEY: str = 'env_variables'
 _ALLOW_SERVICE_ACCOUNT_KEY: str = 'service_account'
 _EXCLUDE_FEATURES: List[str] = ENTRYPOINT_FEATURE_KEYS
 _EXCLUDE_FEATURES.append(_ALLOW_ENV_VARIABLES_KEY)
+# Linux limits the size of a single command line argument to 128 KiB (MAX_ARG_STRLEN), and
+# the whole command line to ARG_MAX. Above this size, the env vars are written to a file
+# set by --env-vars-file.
+_MAX_SET_ENV_VARS_SIZE = 32 * 1024
+_ENV_VARS_FILENAME = 'env_vars.yaml'
+_ENV_VARS_FILE_FLAG = '--env-vars-file'
 
-def translate_supported_features(input_data: Dict, supported_features: Dict, \
-    project_cli_flag: str) -> List[str]:
+def translate_supported_features(context: TranslationContext) -> List[CloudRunFlag]:
     """Translate supported features."""
-    output_flags: List[str] = []
+    input_data = context.input_flatten_as_appyaml
+    supported_features = context.supported_features
+    output_flags: List[CloudRunFlag] = []
     for key in supported_features:
         if key in input_data:
             # excluded features are handled in separate translation rules.
             if key in _EXCLUDE_FEATURES:
                 continue
             feature = supported_features[key]
-            input_value = f'"{input_data[key]}"'
-            output_flags += generate_output_flags(feature.flags, input_value)
-
-    output_flags += _get_output_flags_for_env_variables(input_data, \
-        supported_features)
-    output_flags += _get_output_flags_for_default_service_account(input_data, \
-        supported_features, project_cli_flag)
+            output_flags += generate_flags(feature.flags, input_data[key], [key], quoted=True)
     return output_flags
 
-def _get_output_flags_for_env_variables(input_data: Dict, supported_features: Dict):
+def translate_env_variables(context: TranslationContext) -> List[CloudRunFlag]:
+    """Translate env_variables to --set-env-vars, or to --env-vars-file if the env vars
+    would exceed the size of a command line argument."""
     # env_variables values is a dict, therefore, the feature key 'env_variables' won't be
     # contained in the flatten input_key_value_pairs, it would be contain in the unflatten
     # input_data instead.
-    output_flags: List[str] = []
-    env_variables_key_from_input = get_feature_key_from_input(input_data, \
-        [_ALLOW_ENV_VARIABLES_KEY])
-    if env_variables_key_from_input:
-        env_variables_value = _generate_envs_output(input_data[env_variables_key_from_input])
-        feature = supported_features[env_variables_key_from_input]
-        output_flags += generate_output_flags(feature.flags, f'"{env_variables_value}"')
-    return output_flags
+    env_variables_key_from_input = context.get_feature_key([_ALLOW_ENV_VARIABLES_KEY])
+    if not env_variables_key_from_input:
+        return []
+    envs = {str(key): str(value) for key, value \
+        in context.input_flatten_as_appyaml[env_variables_key_from_input].items()}
+    env_variables_flags = generate_flags( \
+        context.supported_features[env_variables_key_from_input].flags, envs, \
+        [env_variables_key_from_input], quoted=True)
+    env_variables_value = format_key_value_pairs(envs)
+    if env_variables_value is not None and len(env_variables_value) <= _MAX_SET_ENV_VARS_SIZE:
+        return env_variables_flags
+    return _get_output_flags_for_env_vars_file(context, envs, env_variables_flags, \
+        env_variables_value is not None)
+
+def read_env_vars_file(context: TranslationContext) -> Optional[Dict[str, str]]:
+    """Read the env vars of the --env-vars-file flag, from the planned or the existing
+    file. Return None if the file does not exist or is not a mapping."""
+    content = context.read_source_file(_ENV_VARS_FILENAME)
+    if content is None:
+        return None
+    try:
+        env_vars = yaml.safe_load(content)
+    except yaml.YAMLError:
+        return None
+    if not isinstance(env_vars, dict):
+        return None
+    return {str(key): str(value) for key, value in env_vars.items()}
+
+def _get_output_flags_for_env_vars_file(context: TranslationContext, envs: Dict[str, str], \
+    env_variables_flags: List[CloudRunFlag], has_delimiter: bool) -> List[CloudRunFlag]:
+    env_vars_file = context.get_source_path(_ENV_VARS_FILENAME)
+    content = yaml.safe_dump(envs, sort_keys=False, allow_unicode=True)
+    existing_content = context.read_source_file(_ENV_VARS_FILENAME)
+    source_keys = env_variables_flags[0].source_keys
+    if existing_content is not None and existing_content != content:
+        if not has_delimiter:
+            context.diagnostics.warning('env-vars-file-exists', f'{env_vars_file} already \
+exists with other env vars, and every delimiter of --set-env-vars appears in the env vars. \
+The env vars are not translated.')
+            return []
+        context.diagnostics.warning('env-vars-file-exists', f'{env_vars_file} already exists \
+with other env vars, the env vars are set by --set-env-vars.')
+        return env_variables_flags
+    if existing_content is None:
+        context.write_source_file(_ENV_VARS_FILENAME, content)
+        context.diagnostics.info('env-vars-file-created', f'{len(envs)} env vars are written \
+to {env_vars_file} and set by {_ENV_VARS_FILE_FLAG}.')
+    return generate_flags([_ENV_VARS_FILE_FLAG], env_vars_file, source_keys)
 
-def _get_output_flags_for_default_service_account(input_data: Dict, \
-    supported_features: Dict, project_cli_flag: str):
-    input_has_service_account_key = get_feature_key_from_input(input_data, \
-        [_ALLOW_SERVICE_ACCOUNT_KEY])
+def translate_default_service_account(context: TranslationContext) -> List[CloudRunFlag]:
+    """Translate to the default service account if none is specified."""
+    input_has_service_account_key = context.get_feature_key([_ALLOW_SERVICE_ACCOUNT_KEY])
     # if service_account is not specified in app.yaml/deployed version, use the default \
     # service account: https://cloud.google.com/appengine/docs/standard/go/service-account
     if not input_has_service_account_key:
@@ -68,28 +114,43 @@ def _get_output_flags_for_default_service_account(input_data: Dict, \
         # - check if a project id is provided via the --project cli flag.
         # or
         # - check if gcloud config has project id .
-        project_id = project_cli_flag if project_cli_flag is not None \
-            else get_project_id_from_gcloud()
+        if context.project is None:
+            context.project = get_project_id_from_gcloud()
+        project_id = context.project
 
-        feature = supported_features['service_account']
-        default_service_account = f'"{project_id}@appspot.gserviceaccount.com"'
-        return generate_output_flags(feature.flags, default_service_account)
+        feature = context.supported_features['service_account']
+        default_service_account = f'{project_id}@appspot.gserviceaccount.com'
+        return generate_flags(feature.flags, default_service_account, quoted=True)
     return []
 
-def _generate_envs_output(envs: Dict) -> str:
-    if len(envs.items()) == 0:
-        return ''
-    output_str = ''
-    # if value contains comma, use a different delimiter
-    # see https://cloud.google.com/run/docs/configuring/environment-variables#escaping
-    value_contains_comma = False
-    for key, value in envs.items():
-        if ',' in value:
-            value_contains_comma = True
-            break
-    delimiter = '@' if value_contains_comma else ','
-    output_str = '' if delimiter == ',' else f'^{delimiter}^'
-    for key, value in envs.items():
-        output_str += f'{key}={value}{delimiter}'
-    # remove the last tailing delimiter
-    return output_str[:-1]
+# The input keys are the parent paths of the `supported` features in features.yaml.
+SUPPORTED_FEATURES_RULE = TranslationRule(
+    name='supported_features',
+    translate=translate_supported_features,
+    input_keys=[_ALLOW_SERVICE_ACCOUNT_KEY, 'vpc_access_connector'],
+    output_flags=['--service-account', '--vpc-connector', '--vpc-egress'])
+
+# Not cacheable, the rule could create the env vars file.
+ENV_VARIABLES_RULE = TranslationRule(
+    name='env_variables',
+    translate=translate_env_variables,
+    input_keys=[_ALLOW_ENV_VARIABLES_KEY],
+    output_flags=['--set-env-vars', _ENV_VARS_FILE_FLAG],
+    cacheable=False)
+
+def needs_default_service_account(input_data: Dict) -> bool:
+    """Check if the default service account is translated for an app.yaml input, which
+    is the only flag depending on the project."""
+    return _ALLOW_SERVICE_ACCOUNT_KEY not in input_data
+
+# Always runs, a default --service-account is set when none is specified. Registered
+# after ENV_VARIABLES_RULE, the default --service-account follows --set-env-vars. Not
+# cacheable, the project is only resolved (from gcloud) when the default service account
+# is needed, so it is not part of the cache key.
+DEFAULT_SERVICE_ACCOUNT_RULE = TranslationRule(
+    name='default_service_account',
+    translate=translate_default_service_account,
+    input_keys=[_ALLOW_SERVICE_ACCOUNT_KEY],
+    output_flags=['--service-account'],
+    always=True,
+    cacheable=False)
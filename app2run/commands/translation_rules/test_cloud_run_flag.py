@@ -0,0 +1,48 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for cloud_run_flag.py."""
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag, \
+    format_key_value_pairs, generate_flags
+
+def test_flag_to_gcloud():
+    """test_flag_to_gcloud"""
+    assert CloudRunFlag('--cpu', '1').to_gcloud() == '--cpu=1'
+    assert CloudRunFlag('--command', 'a=b', True).to_gcloud() == '--command="a=b"'
+    assert CloudRunFlag('--no-cpu-throttling').to_gcloud() == '--no-cpu-throttling'
+    assert CloudRunFlag('--add-cloudsql-instances', ['p:r:a', 'p:r:b']).to_gcloud() == \
+        '--add-cloudsql-instances=p:r:a,p:r:b'
+    assert CloudRunFlag('--labels', {'a': 'b', 'c': 'd'}).to_gcloud() == '--labels=a=b,c=d'
+    assert CloudRunFlag('--set-env-vars', {'A': '1,2', 'B': '3'}, True).to_gcloud() == \
+        '--set-env-vars="^@^A=1,2@B=3"'
+
+def test_format_key_value_pairs():
+    """test_format_key_value_pairs"""
+    assert format_key_value_pairs({}) == ''
+    assert format_key_value_pairs({'A': '1'}) == 'A=1'
+    assert format_key_value_pairs({'A': ',@'}) == '^#^A=,@'
+    assert format_key_value_pairs({'A': ',@#%&|;:~+*'}) is None
+
+def test_generate_flags():
+    """test_generate_flags"""
+    assert generate_flags(['--min-instances', '--max-instances'], 3, \
+        ['manual_scaling.instances']) == [
+            CloudRunFlag('--min-instances', '3', source_keys=['manual_scaling.instances']),
+            CloudRunFlag('--max-instances', '3', source_keys=['manual_scaling.instances'])]
+
+def test_flag_record():
+    """test_flag_record"""
+    flag = CloudRunFlag('--set-env-vars', {'A': '1'}, True, 'env_variables', \
+        ['env_variables'])
+    assert CloudRunFlag.from_record(flag.to_record()) == flag
@@ -0,0 +1,60 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for context.py."""
+from unittest.mock import patch
+from app2run.commands.translation_rules import context as context_module
+from app2run.commands.translation_rules.context import ScalingTypeAppYaml, \
+    TranslationContext
+from app2run.config.feature_config_loader import InputType
+
+def test_context_app_yaml_input():
+    """test_context_app_yaml_input"""
+    context = TranslationContext({
+        'runtime': 'python39',
+        'env': 'flex',
+        'manual_scaling': {'instances': 2}
+    })
+    assert context.input_flatten_as_appyaml is context.input_key_value_pairs
+    assert context.input_flatten_as_appyaml['manual_scaling.instances'] == 2
+    assert context.is_flex is True
+    assert context.runtime == 'python39'
+    assert context.scaling_types == [ScalingTypeAppYaml.MANUAL_SCALING]
+
+def test_context_admin_api_input():
+    """test_context_admin_api_input"""
+    context = TranslationContext({
+        'env': 'flexible',
+        'runtime': 'python',
+        'automaticScaling': {'targetConcurrentRequests': 10}
+    }, InputType.ADMIN_API)
+    assert context.input_key_value_pairs['automaticScaling.targetConcurrentRequests'] == 10
+    assert context.input_flatten_as_appyaml == {
+        'runtime': 'python',
+        'automatic_scaling.target_concurrent_requests': 10,
+        'env': 'flex'
+    }
+    assert context.is_flex is True
+    assert context.scaling_types == [ScalingTypeAppYaml.AUTOMATIC_SCALING]
+
+def test_context_flattens_input_once():
+    """test_context_flattens_input_once"""
+    context = TranslationContext({'resources': {'cpu': 2}})
+    with patch.object(context_module, 'FlattenedView', wraps=context_module.FlattenedView) \
+        as mock_flattened_view:
+        assert context.input_flatten_as_appyaml == {'resources.cpu': 2}
+        assert not context.is_flex
+        assert context.scaling_types == []
+        assert context.runtime is None
+        assert mock_flattened_view.call_count == 1
@@ -0,0 +1,116 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for plugins.py."""
+import os
+import sys
+from importlib import metadata
+from pathlib import Path
+from unittest.mock import patch
+from click.testing import CliRunner
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.plugins import ENTRY_POINT_GROUP, load_plugin_rules
+from app2run.commands.translation_rules.registry import RuleRegistry
+from app2run.commands.translation_rules.rules import get_default_rule_registry
+
+runner = CliRunner()
+
+_PLUGIN_MODULE = 'app2run_test_plugin_rules'
+_PLUGIN_SOURCE = """
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.registry import TranslationRule
+
+def translate_internal_runtime(context):
+    return [CloudRunFlag('--set-build-env-vars', {'RUNTIME': context.runtime})]
+
+INTERNAL_RUNTIME_RULE = TranslationRule(
+    name='internal_runtime',
+    translate=translate_internal_runtime,
+    input_keys=['runtime'],
+    output_flags=['--set-build-env-vars'])
+"""
+
+def _get_entry_points(entry_point_values):
+    # The entry points of an installed distribution, read from its dist-info directory.
+    os.makedirs('internal_rules-1.0.dist-info')
+    with open('internal_rules-1.0.dist-info/METADATA', 'w', encoding='utf8') as file:
+        file.write('Metadata-Version: 2.1\nName: internal-rules\nVersion: 1.0\n')
+    with open('internal_rules-1.0.dist-info/entry_points.txt', 'w', encoding='utf8') as file:
+        file.write(f'[{ENTRY_POINT_GROUP}]\n' + '\n'.join(entry_point_values) + '\n')
+    return list(metadata.PathDistribution(Path('internal_rules-1.0.dist-info')).entry_points)
+
+def _write_plugin_module():
+    with open(f'{_PLUGIN_MODULE}.py', 'w', encoding='utf8') as file:
+        file.write(_PLUGIN_SOURCE)
+    sys.modules.pop(_PLUGIN_MODULE, None)
+
+def test_plugin_rules_are_loaded_lazily():
+    """test_plugin_rules_are_loaded_lazily"""
+    with runner.isolated_filesystem() as temp_dir, \
+        patch.object(sys, 'path', [temp_dir] + sys.path), \
+        patch.object(metadata, 'entry_points', return_value=_get_entry_points( \
+            [f'internal = {_PLUGIN_MODULE}:INTERNAL_RUNTIME_RULE'])) as mock_entry_points:
+        _write_plugin_module()
+        # The first run imports the plugins to read their declarations.
+        rules = load_plugin_rules('plugin_rules.json')
+        mock_entry_points.assert_called_once_with(group=ENTRY_POINT_GROUP)
+        assert [rule.name for rule in rules] == ['internal_runtime']
+        assert _PLUGIN_MODULE in sys.modules
+
+        # The next runs read the declarations from the metadata cache.
+        sys.modules.pop(_PLUGIN_MODULE)
+        rules = load_plugin_rules('plugin_rules.json')
+        assert rules[0].input_keys == ['runtime']
+        assert rules[0].version == '1.0'
+        assert _PLUGIN_MODULE not in sys.modules
+        registry = RuleRegistry(rules)
+        assert registry.run(TranslationContext({'service': 'api'})) == {}
+        assert _PLUGIN_MODULE not in sys.modules
+        assert registry.run(TranslationContext({'runtime': 'internal1'})) == \
+            {'internal_runtime': [CloudRunFlag('--set-build-env-vars', {'RUNTIME': 'internal1'})]}
+        assert _PLUGIN_MODULE in sys.modules
+        sys.modules.pop(_PLUGIN_MODULE)
+
+def test_plugin_rule_failing_to_load(capsys):
+    """test_plugin_rule_failing_to_load"""
+    with runner.isolated_filesystem() as temp_dir, \
+        patch.object(sys, 'path', [temp_dir] + sys.path), \
+        patch.object(metadata, 'entry_points', return_value=_get_entry_points( \
+            [f'internal = {_PLUGIN_MODULE}:INTERNAL_RUNTIME_RULE', \
+                f'missing = {_PLUGIN_MODULE}:MISSING_RULE'])):
+        _write_plugin_module()
+        rules = load_plugin_rules('plugin_rules.json')
+        sys.modules.pop(_PLUGIN_MODULE)
+        assert [rule.name for rule in rules] == ['internal_runtime']
+        assert '[Warning] Failed to load the translation rule plugin missing = ' \
+            in capsys.readouterr().out
+        # The declarations are not cached, so that the failing plugin is retried.
+        load_plugin_rules('plugin_rules.json')
+        assert _PLUGIN_MODULE in sys.modules
+        sys.modules.pop(_PLUGIN_MODULE)
+
+def test_plugin_rules_are_discovered_on_first_use():
+    """test_plugin_rules_are_discovered_on_first_use"""
+    get_default_rule_registry.cache_clear()
+    with patch.object(metadata, 'entry_points', return_value=[]) as mock_entry_points:
+        registry = get_default_rule_registry()
+        assert registry is get_default_rule_registry()
+        mock_entry_points.assert_called_once_with(group=ENTRY_POINT_GROUP)
+    assert [rule.name for rule in registry.rules][-1] == 'required_flags'
+
+def test_no_plugin_rules():
+    """test_no_plugin_rules"""
+    with patch.object(metadata, 'entry_points', return_value=[]):
+        assert not load_plugin_rules('plugin_rules.json')
@@ -0,0 +1,82 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for registry.py."""
+from unittest.mock import MagicMock
+import pytest
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.registry import RuleRegistry, TranslationRule
+from app2run.commands.translation_rules.rules import get_default_rule_registry
+
+def _rule(name, input_keys, always=False, conflict_groups=None):
+    return TranslationRule(name=name, translate=MagicMock(return_value=[f'--{name}']), \
+        input_keys=input_keys, conflict_groups=conflict_groups or [], always=always)
+
+def test_only_rules_of_the_input_keys_are_run():
+    """test_only_rules_of_the_input_keys_are_run"""
+    scaling = _rule('scaling', ['automatic_scaling'])
+    cloud_sql = _rule('cloud_sql', ['beta_settings.cloud_sql_instances'])
+    required = _rule('required', [], always=True)
+    registry = RuleRegistry([scaling, cloud_sql, required])
+    context = TranslationContext({'automatic_scaling': {'max_instances': 3}})
+    assert registry.run(context) == {'scaling': ['--scaling'], 'required': ['--required']}
+    scaling.translate.assert_called_once_with(context)
+    cloud_sql.translate.assert_not_called()
+
+def test_rules_are_returned_in_registration_order():
+    """test_rules_are_returned_in_registration_order"""
+    first = _rule('first', ['b'])
+    second = _rule('second', ['a.b'])
+    registry = RuleRegistry([first, second])
+    assert registry.get_rules_for_keys(['a.b.c', 'b']) == [first, second]
+    assert registry.get_rules_for_keys(['a.c']) == []
+    assert registry.get_rules_for_keys(['a']) == []
+
+def test_register_duplicate_rule_name():
+    """test_register_duplicate_rule_name"""
+    registry = RuleRegistry([_rule('scaling', [])])
+    with pytest.raises(ValueError):
+        registry.register(_rule('scaling', []))
+
+def test_conflict_group_reported_once():
+    """test_conflict_group_reported_once"""
+    keys = ['automatic_scaling.max_concurrent_requests', \
+        'automatic_scaling.target_concurrent_requests']
+    registry = RuleRegistry([_rule('first', keys, conflict_groups=[keys]), \
+        _rule('second', keys, conflict_groups=[keys])])
+    context = TranslationContext({'automatic_scaling': {'max_concurrent_requests': 10, \
+        'target_concurrent_requests': 10}})
+    registry.run(context)
+    assert [diagnostic.code for diagnostic in context.diagnostics.records] == \
+        ['conflicting-configurations']
+    assert context.get_feature_key(keys) is None
+
+def test_on_rule_done_hook():
+    """test_on_rule_done_hook"""
+    rule = _rule('required', [], always=True)
+    timings = []
+    RuleRegistry([rule]).run(TranslationContext({}), \
+        on_rule_done=lambda rule, seconds: timings.append((rule.name, seconds)))
+    assert [name for name, _ in timings] == ['required']
+    assert timings[0][1] >= 0
+
+def test_default_rules_by_key():
+    """test_default_rules_by_key"""
+    rule_names = [rule.name for rule in \
+        get_default_rule_registry().get_rules_for_keys(['automatic_scaling.max_instances'])]
+    assert rule_names == ['scaling', 'timeout', 'app_resources']
+    rule_names = [rule.name for rule in get_default_rule_registry().get_rules_for_keys( \
+        ['beta_settings.cloud_sql_instances'], include_always=True)]
+    assert rule_names == ['concurrent_requests', 'default_service_account', 'entrypoint', \
+        'cloud_sql_instances', 'required_flags']
@@ -0,0 +1,47 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for service_spec.py."""
+from app2run.commands.translate import get_service_spec
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.context import TranslationContext
+from app2run.commands.translation_rules.rules import get_default_rule_registry
+from app2run.commands.translation_rules.service_spec import build_service_spec
+
+def test_build_service_spec():
+    """test_build_service_spec"""
+    rule_flags = {
+        'required_flags': [CloudRunFlag('--allow-unauthenticated')],
+        'scaling': [CloudRunFlag('--max-instances', '5', \
+            source_keys=['automatic_scaling.max_instances'])],
+    }
+    spec = build_service_spec('api', get_default_rule_registry(), rule_flags)
+    assert spec.name == 'api'
+    assert spec.to_gcloud_flags() == ['--max-instances=5', '--allow-unauthenticated']
+    flag = spec.get_flag('--max-instances')
+    assert flag.rule == 'scaling'
+    assert flag.source_keys == ['automatic_scaling.max_instances']
+    assert spec.get_flag('--allow-unauthenticated').rule == 'required_flags'
+    assert spec.get_flag('--cpu') is None
+    # The flags of the rules are not modified, e.g. the cached ones.
+    assert rule_flags['scaling'][0].rule is None
+
+def test_translated_source_keys():
+    """test_translated_source_keys"""
+    spec = get_service_spec('default', TranslationContext({'runtime': 'nodejs16', \
+        'instance_class': 'F2', 'env_variables': {'A': '1'}}, project='test-project'))
+    assert spec.get_flag('--memory').source_keys == ['instance_class']
+    assert spec.get_flag('--set-env-vars').source_keys == ['env_variables']
+    assert spec.get_flag('--set-env-vars').value == {'A': '1'}
+    assert spec.get_flag('--concurrency').source_keys == []
@@ -14,10 +14,10 @@
 
 """Translation rule for timeout feature."""
 
-from typing import Dict, List
-from app2run.common.util import is_flex_env
-from app2run.commands.translation_rules.scaling import \
-    ScalingTypeAppYaml, get_scaling_features_used
+from typing import List
+from app2run.commands.translation_rules.cloud_run_flag import CloudRunFlag
+from app2run.commands.translation_rules.context import ScalingTypeAppYaml, TranslationContext
+from app2run.commands.translation_rules.registry import TranslationRule
 
 _SCALING_METHOD_W_10_MIN_TIMEOUT = {
     ScalingTypeAppYaml.AUTOMATIC_SCALING
@@ -27,19 +27,23 @@ _SCALING_METHOD_W_60_MIN_TIMEOUT = {
     ScalingTypeAppYaml.BASIC_SCALING
 }
 
-def translate_timeout_features(input_data: Dict) -> List[str]:
+def translate_timeout_features(context: TranslationContext) -> List[CloudRunFlag]:
     """Tranlsate default timeout values for setting the --timeout flag to Cloud Run."""
-    is_flex = is_flex_env(input_data)
+    if context.is_flex:
+        return [CloudRunFlag('--timeout', '60m', source_keys=['env'])]
 
-    if is_flex:
-        return ['--timeout=60m']
-
-    scaling_features_used = get_scaling_features_used(input_data)
+    scaling_features_used = context.scaling_types
 
     if len(scaling_features_used) == 1:
         scaling_feature = scaling_features_used[0]
         if scaling_feature in _SCALING_METHOD_W_10_MIN_TIMEOUT:
-            return ['--timeout=10m']
+            return [CloudRunFlag('--timeout', '10m', source_keys=[scaling_feature.value])]
         if scaling_feature in _SCALING_METHOD_W_60_MIN_TIMEOUT:
-            return ['--timeout=60m']
+            return [CloudRunFlag('--timeout', '60m', source_keys=[scaling_feature.value])]
     return []
+
+TIMEOUT_RULE = TranslationRule(
+    name='timeout',
+    translate=translate_timeout_features,
+    input_keys=['env'] + [scaling_type.value for scaling_type in ScalingTypeAppYaml],
+    output_flags=['--timeout'])
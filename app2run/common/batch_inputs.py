@@ -0,0 +1,43 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""batch_inputs module provides the app.yaml inputs of the cli commands running
+on many app.yaml files at once."""
+import os
+from typing import Dict, Iterator, List, Tuple
+from app2run.common.input_stream import STDIN_INPUT, iter_stdin_inputs
+from app2run.common.git_changes import iter_changed_inputs
+from app2run.common.discovery import iter_discovered_inputs
+
+def is_batch_input(appyaml: str, changed_since: str, discover: str) -> bool:
+    """Check if the cli flags select many app.yaml inputs."""
+    return appyaml == STDIN_INPUT or changed_since is not None or discover is not None
+
+def iter_batch_inputs(appyaml: str, changed_since: str, discover: str, max_depth: int = None, \
+    excludes: List[str] = None, cache_dir: str = None) -> Iterator[Tuple[str, Dict]]:
+    """Yield (input_name, input_data) of the app.yaml inputs selected by the cli flags. With
+    a cache directory, the app.yaml files unchanged since --changed-since are included, their
+    results are read from the result cache."""
+    if appyaml == STDIN_INPUT:
+        return iter_stdin_inputs()
+    if changed_since is not None:
+        return iter_changed_inputs(changed_since, cache_dir is not None)
+    return iter_discovered_inputs(discover, max_depth, excludes)
+
+def get_input_source_dir(input_name: str) -> str:
+    """Get the source directory of a batch input, i.e. the directory of its app.yaml. None
+    (the current directory) for a document read from stdin."""
+    if not os.path.isfile(input_name):
+        return None
+    return os.path.dirname(input_name)
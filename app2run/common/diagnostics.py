@@ -0,0 +1,87 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""diagnostics module collects the messages (errors, warnings, info) of the analysis of
+an input, so that they are output once per input rather than while the input is
+analyzed, either as text or as structured (JSON) records."""
+import json
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List
+import click
+
+class Severity(Enum):
+    """Enum of diagnostic severities."""
+    ERROR = 'error'
+    WARNING = 'warning'
+    INFO = 'info'
+
+# Formats of the diagnostics output, `none` skips formatting the diagnostics entirely.
+DIAGNOSTICS_FORMATS = ['text', 'json', 'none']
+
+@dataclass(frozen=True)
+class Diagnostic:
+    """Diagnostic is a message of the analysis, code identifies the kind of message
+    (e.g. `invalid-value`) independently of its text."""
+    code: str
+    severity: Severity
+    message: str
+
+    def render(self) -> str:
+        """Format the diagnostic as text, e.g. `[Warning] ...`."""
+        return f'[{self.severity.value.capitalize()}] {self.message}'
+
+    def to_record(self) -> Dict[str, str]:
+        """Convert the diagnostic to a JSON serializable record."""
+        return {'code': self.code, 'severity': self.severity.value, 'message': self.message}
+
+    @staticmethod
+    def from_record(record: Dict[str, str]) -> 'Diagnostic':
+        """Create a diagnostic from a record created by to_record."""
+        return Diagnostic(record['code'], Severity(record['severity']), record['message'])
+
+class Diagnostics:
+    """Diagnostics collects the diagnostics of an input in the order they are reported."""
+    def __init__(self):
+        self.records: List[Diagnostic] = []
+
+    def report(self, code: str, severity: Severity, message: str) -> None:
+        """Report a diagnostic."""
+        self.records.append(Diagnostic(code, severity, message))
+
+    def error(self, code: str, message: str) -> None:
+        """Report an error."""
+        self.report(code, Severity.ERROR, message)
+
+    def warning(self, code: str, message: str) -> None:
+        """Report a warning."""
+        self.report(code, Severity.WARNING, message)
+
+    def info(self, code: str, message: str) -> None:
+        """Report an info message."""
+        self.report(code, Severity.INFO, message)
+
+    def echo(self, output_format: str = 'text', input_name: str = None) -> None:
+        """Output the diagnostics, as text lines or as JSON lines (NDJSON) identified by
+        input_name. JSON lines are written to stderr, so that they could be consumed
+        separately from the output of the command. Nothing is formatted with the `none`
+        format."""
+        if output_format == 'none':
+            return
+        for diagnostic in self.records:
+            if output_format == 'json':
+                record = {'input': input_name, **diagnostic.to_record()}
+                click.echo(json.dumps(record), err=True)
+            else:
+                click.echo(diagnostic.render())
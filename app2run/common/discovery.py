@@ -0,0 +1,236 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""discovery module walks a directory tree (e.g. a monorepo) to discover the
+App Engine app.yaml files in it."""
+import os
+import queue
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Pattern, Tuple
+from app2run.common.util import get_input_data_by_input_type
+from app2run.config.feature_config_loader import InputType
+
+_YAML_EXTENSIONS = ('.yaml', '.yml')
+_GITIGNORE_FILENAME = '.gitignore'
+_ALWAYS_EXCLUDED_DIRS = ['.git']
+# app.yaml requires the top level `runtime` element, other App Engine config
+# files (dispatch.yaml, cron.yaml, etc.) and unrelated YAML files do not have it.
+_APP_YAML_SIGNATURE = re.compile(r'^runtime[ \t]*:', re.MULTILINE)
+_SIGNATURE_READ_SIZE = 64 * 1024
+# Number of discovered files buffered ahead of the analysis.
+_DISCOVERY_QUEUE_SIZE = 256
+
+@dataclass
+class IgnoreRule:
+    """IgnoreRule represents a .gitignore-style pattern, relative to base_dir. As in git,
+    `*` and `?` do not match a `/`, `**/` matches any number of directories and a
+    trailing `/**` everything inside a directory, see https://git-scm.com/docs/gitignore."""
+    base_dir: str
+    pattern: str
+    negate: bool = False
+    dir_only: bool = False
+    anchored: bool = False
+    _regex: Pattern = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._regex = re.compile(_translate_pattern(self.pattern))
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        """Check if the path (relative to the root of the walk) matches the pattern."""
+        if self.dir_only and not is_dir:
+            return False
+        if self.base_dir:
+            if not rel_path.startswith(self.base_dir + '/'):
+                return False
+            rel_path = rel_path[len(self.base_dir) + 1:]
+        if self.anchored:
+            return self._regex.fullmatch(rel_path) is not None
+        return self._regex.fullmatch(rel_path.rsplit('/', 1)[-1]) is not None
+
+def parse_ignore_patterns(patterns: List[str], base_dir: str = '') -> List[IgnoreRule]:
+    """Parse .gitignore-style patterns into IgnoreRules, comments and blank lines are
+    skipped."""
+    rules: List[IgnoreRule] = []
+    for line in patterns:
+        pattern = _strip_trailing_spaces(line.rstrip('\n'))
+        if not pattern or pattern.startswith('#'):
+            continue
+        negate = pattern.startswith('!')
+        pattern = pattern[1:] if negate else pattern
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # A pattern with a slash (other than a trailing one) is relative to base_dir,
+        # otherwise it matches the name at any level.
+        anchored = '/' in pattern
+        rules.append(IgnoreRule(base_dir, pattern.lstrip('/'), negate, dir_only, anchored))
+    return rules
+
+def is_app_yaml_file(path: str) -> bool:
+    """Check if the file is an App Engine app.yaml by its content signature rather
+    than its name, e.g. services commonly name it `<service>.yaml`."""
+    if not path.endswith(_YAML_EXTENSIONS):
+        return False
+    try:
+        with open(path, 'r', encoding='utf8', errors='replace') as file:
+            return _APP_YAML_SIGNATURE.search(file.read(_SIGNATURE_READ_SIZE)) is not None
+    except OSError:
+        return False
+
+def discover_app_yamls(root: str, max_depth: int = None, excludes: List[str] = None) \
+    -> Iterator[str]:
+    """Walk the directory tree under root with os.scandir and yield the paths of the
+    app.yaml files as they are found, in a stable (sorted) order. The .gitignore files
+    found during the walk and the excludes patterns are honored, directories deeper
+    than max_depth (root is at depth 0) are not walked."""
+    stack: List[Tuple[str, str, int, List[IgnoreRule]]] = \
+        [(root, '', 0, parse_ignore_patterns(excludes or []))]
+    while stack:
+        dir_path, rel_dir, depth, rules = stack.pop()
+        rules = rules + _read_gitignore(dir_path, rel_dir)
+        try:
+            with os.scandir(dir_path) as scanned_entries:
+                entries = sorted(scanned_entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        sub_dirs = []
+        for entry in entries:
+            rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if _is_ignored(rules, rel_path, is_dir):
+                continue
+            if is_dir:
+                if entry.name not in _ALWAYS_EXCLUDED_DIRS and \
+                    (max_depth is None or depth < max_depth):
+                    sub_dirs.append((entry.path, rel_path, depth + 1, rules))
+            elif entry.is_file() and is_app_yaml_file(entry.path):
+                yield os.path.normpath(entry.path)
+        stack.extend(reversed(sub_dirs))
+
+def iter_discovered_inputs(root: str, max_depth: int = None, excludes: List[str] = None) \
+    -> Iterator[Tuple[str, Dict]]:
+    """Yield (path, input_data) for every app.yaml discovered under root. The walk runs in
+    a background thread, so walking the tree overlaps with the analysis of the inputs
+    already found."""
+    for path in _iter_in_background(discover_app_yamls(root, max_depth, excludes)):
+        input_data = get_input_data_by_input_type(InputType.APP_YAML, path)
+        if input_data:
+            yield path, input_data
+
+def _iter_in_background(items: Iterator[str]) -> Iterator[str]:
+    buffer: queue.Queue = queue.Queue(maxsize=_DISCOVERY_QUEUE_SIZE)
+    done = object()
+    stopped = threading.Event()
+    errors: List[BaseException] = []
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except Exception as error: # pylint: disable=broad-except
+            errors.append(error)
+        put(done)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        stopped.set()
+    if errors:
+        raise errors[0]
+
+def _read_gitignore(dir_path: str, rel_dir: str) -> List[IgnoreRule]:
+    try:
+        with open(os.path.join(dir_path, _GITIGNORE_FILENAME), 'r', encoding='utf8') as file:
+            return parse_ignore_patterns(file.readlines(), rel_dir)
+    except OSError:
+        return []
+
+def _strip_trailing_spaces(pattern: str) -> str:
+    # Trailing spaces are ignored unless they are escaped with a backslash.
+    stripped = pattern.rstrip()
+    if stripped.endswith('\\') and len(stripped) < len(pattern):
+        stripped += ' '
+    return stripped
+
+def _translate_pattern(pattern: str) -> str:
+    """Translate a .gitignore pattern (without its leading and trailing slashes) to a
+    regular expression matching a whole relative path."""
+    regex: List[str] = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '*':
+            end = index
+            while end < len(pattern) and pattern[end] == '*':
+                end += 1
+            is_component = (index == 0 or pattern[index - 1] == '/') and \
+                (end == len(pattern) or pattern[end] == '/')
+            if end - index >= 2 and is_component and end == len(pattern):
+                regex.append('.*')
+            elif end - index >= 2 and is_component:
+                regex.append('(?:.*/)?')
+                end += 1
+            else:
+                regex.append('[^/]*')
+            index = end
+            continue
+        if char == '?':
+            regex.append('[^/]')
+        elif char == '[':
+            bracket_regex, index = _translate_bracket(pattern, index)
+            regex.append(bracket_regex)
+        elif char == '\\' and index + 1 < len(pattern):
+            index += 1
+            regex.append(re.escape(pattern[index]))
+        else:
+            regex.append(re.escape(char))
+        index += 1
+    return ''.join(regex)
+
+def _translate_bracket(pattern: str, index: int) -> Tuple[str, int]:
+    # Return the regex of the bracket expression at index and the index of its `]`.
+    start = index + 1
+    negate = pattern.startswith(('!', '^'), start)
+    if negate:
+        start += 1
+    # A `]` right after the opening bracket is part of the class.
+    end = pattern.find(']', start + 1)
+    if end < 0:
+        return re.escape('['), index
+    content = re.sub(r'([\\\[\]^])', r'\\\1', pattern[start:end])
+    return f'(?!/)[{"^" if negate else ""}{content}]', end
+
+def _is_ignored(rules: List[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    ignored = False
+    for rule in rules:
+        if rule.matches(rel_path, is_dir):
+            ignored = not rule.negate
+    return ignored
@@ -0,0 +1,195 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""fleet_index module persists the results of the inputs of a fleet (many app.yaml files)
+into a local SQLite database: the flattened feature values and the incompatible features
+of every input. Questions about the fleet, e.g. which services use `inbound_services`, are
+answered by an indexed query rather than by a new run."""
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from numbers import Real
+from typing import Any, Dict, Iterable, List, Mapping, Set, Tuple
+from app2run.config.feature_config_loader import InputType, UnsupportedFeature
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS inputs (
+    input_name TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    input_type TEXT NOT NULL,
+    service TEXT,
+    runtime TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS feature_values (
+    input_name TEXT NOT NULL REFERENCES inputs (input_name) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    value TEXT NOT NULL,
+    number REAL,
+    PRIMARY KEY (input_name, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS feature_values_by_path ON feature_values (path, number);
+CREATE TABLE IF NOT EXISTS incompatible_features (
+    input_name TEXT NOT NULL REFERENCES inputs (input_name) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    reason TEXT,
+    PRIMARY KEY (input_name, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS incompatible_features_by_path ON incompatible_features \
+(path, severity);
+"""
+# A path matches itself and its children, e.g. `resources` matches `resources.cpu`. The
+# children are selected by the range ('path.', 'path/'), '/' follows '.', so that the
+# (path, ...) indexes are used.
+_PATH_CONDITION = '({column} = ? OR ({column} > ? AND {column} < ?))'
+
+@dataclass
+class IndexStats:
+    """IndexStats counts the inputs written to the index by a run."""
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+    def __str__(self) -> str:
+        return f'{self.updated} updated, {self.unchanged} unchanged, {self.removed} removed'
+
+@dataclass
+class QueryResult:
+    """QueryResult holds the column names and the rows of a query."""
+    columns: List[str]
+    rows: List[Tuple]
+
+class FleetIndex:
+    """FleetIndex is a SQLite database of the results of the inputs of a fleet, keyed by
+    input name. An input is only written again if its content hash changed. The writes of
+    a run are committed at once when the index is closed, or rolled back if the run failed.
+    Raises sqlite3.Error if db_path is not a SQLite database."""
+    def __init__(self, db_path: str, read_only: bool = False):
+        self.db_path = db_path
+        if read_only:
+            self._connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        else:
+            self._connection = sqlite3.connect(db_path)
+        try:
+            self._open(read_only)
+        except (sqlite3.Error, ValueError):
+            self._connection.close()
+            raise
+
+    def _open(self, read_only: bool) -> None:
+        if not read_only:
+            self._connection.execute('PRAGMA journal_mode = WAL')
+            self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        schema_version = self._connection.execute('PRAGMA user_version').fetchone()[0]
+        if schema_version not in (0, _SCHEMA_VERSION):
+            raise ValueError(f'{self.db_path} has an unsupported schema version \
+{schema_version}.')
+        if not read_only and schema_version == 0:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+
+    def __enter__(self) -> 'FleetIndex':
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        self.close(commit=exc_type is None)
+
+    def close(self, commit: bool = True) -> None:
+        """Commit the writes (or roll them back if commit is False) and close the
+        database."""
+        if commit:
+            self._connection.commit()
+        else:
+            self._connection.rollback()
+        self._connection.close()
+
+    def get_content_hashes(self) -> Dict[str, str]:
+        """Get the content hash of every indexed input, keyed by input name."""
+        return dict(self._connection.execute('SELECT input_name, content_hash FROM inputs'))
+
+    def upsert(self, input_name: str, content_hash: str, input_data: Dict, \
+        input_key_value_pairs: Mapping[str, Any], # pylint: disable=too-many-arguments
+        incompatible_features: List[UnsupportedFeature], \
+        input_type: InputType = InputType.APP_YAML) -> None:
+        """Insert or replace the feature values (the flattened input) and the incompatible
+        features of an input."""
+        self._connection.execute('DELETE FROM inputs WHERE input_name = ?', (input_name,))
+        self._connection.execute('INSERT INTO inputs VALUES (?, ?, ?, ?, ?, ?)', \
+            (input_name, content_hash, input_type.value, input_data.get('service', 'default'), \
+                input_data.get('runtime'), time.time()))
+        self._connection.executemany('INSERT INTO feature_values VALUES (?, ?, ?, ?)', \
+            ((input_name, str(path), json.dumps(value, default=str), _get_number(value)) \
+                for path, value in input_key_value_pairs.items()))
+        self._connection.executemany('INSERT INTO incompatible_features VALUES (?, ?, ?, ?)', \
+            ((input_name, feature.path[input_type.value], feature.severity, feature.reason) \
+                for feature in incompatible_features))
+
+    def remove_other_inputs(self, input_names: Set[str]) -> int:
+        """Remove the inputs not in input_names, e.g. the app.yaml files deleted since the
+        last run. Return the number of removed inputs."""
+        removed = [(input_name,) for input_name in self.get_content_hashes() \
+            if input_name not in input_names]
+        self._connection.executemany('DELETE FROM inputs WHERE input_name = ?', removed)
+        return len(removed)
+
+    def query_values(self, path: str, greater_than: float = None, less_than: float = None, \
+        equals: Any = None) -> QueryResult:
+        """Query the inputs with a value at path (or at a child path), optionally filtered
+        by a numeric range or by an exact value."""
+        conditions, parameters = _get_path_condition('value.path', path)
+        if greater_than is not None:
+            conditions.append('value.number > ?')
+            parameters.append(greater_than)
+        if less_than is not None:
+            conditions.append('value.number < ?')
+            parameters.append(less_than)
+        if equals is not None:
+            conditions.append('value.value = ?')
+            parameters.append(json.dumps(equals, default=str))
+        return self.execute('SELECT input.input_name, input.service, input.runtime, \
+value.path, value.value FROM feature_values AS value JOIN inputs AS input USING (input_name) \
+WHERE ' + ' AND '.join(conditions) + ' ORDER BY input.input_name, value.path', parameters)
+
+    def query_incompatible_features(self, path: str = None, severity: str = None) \
+        -> QueryResult:
+        """Query the incompatible features of the inputs, optionally filtered by path (or
+        parent path) and severity."""
+        conditions, parameters = _get_path_condition('feature.path', path) \
+            if path is not None else ([], [])
+        if severity is not None:
+            conditions.append('feature.severity = ?')
+            parameters.append(severity)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return self.execute('SELECT input.input_name, input.service, input.runtime, \
+feature.path, feature.severity, feature.reason FROM incompatible_features AS feature JOIN \
+inputs AS input USING (input_name)' + where + ' ORDER BY input.input_name, feature.path', \
+            parameters)
+
+    def execute(self, sql: str, parameters: Iterable = ()) -> QueryResult:
+        """Run a SQL query, e.g. an ad-hoc query of a read-only index."""
+        cursor = self._connection.execute(sql, list(parameters))
+        columns = [column[0] for column in cursor.description or []]
+        return QueryResult(columns, cursor.fetchall())
+
+def _get_path_condition(column: str, path: str) -> Tuple[List[str], List]:
+    return [_PATH_CONDITION.format(column=column)], [path, f'{path}.', f'{path}/']
+
+def _get_number(value: Any) -> float:
+    if isinstance(value, Real) and not isinstance(value, bool):
+        return float(value)
+    return None
@@ -0,0 +1,113 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""git_changes module detects the app.yaml files of the local git repository
+which changed since a base git ref."""
+import os
+import subprocess
+from typing import Dict, Iterator, List, Set, Tuple
+import click
+import yaml
+from app2run.common.includes import resolve_includes
+from app2run.common.util import get_input_data_by_input_type
+from app2run.config.feature_config_loader import InputType
+
+_APP_YAML_FILENAMES = ['app.yaml', 'app.yml']
+# Same content signature as discovery.is_app_yaml_file, matched by `git grep`.
+_APP_YAML_GREP_PATTERN = '^runtime[[:blank:]]*:'
+_YAML_PATHSPECS = ['*.yaml', '*.yml']
+
+def iter_changed_inputs(base_ref: str, include_unchanged: bool = False) \
+    -> Iterator[Tuple[str, Dict]]:
+    """Yield (path, input_data) for every app.yaml changed since base_ref. With
+    include_unchanged (i.e. with a result cache directory), the unchanged app.yaml files
+    are yielded after the changed ones, so that the report covers all of them while their
+    results are served by the result cache. Otherwise they are reported as skipped and the
+    report only covers the changed app.yaml files."""
+    changed, unchanged = get_changed_app_yamls(base_ref)
+    if changed is None:
+        return
+    click.echo(f'{len(changed)} app.yaml file(s) changed since {base_ref}, \
+{len(unchanged)} unchanged.')
+    for path in changed + (unchanged if include_unchanged else []):
+        input_data = get_input_data_by_input_type(InputType.APP_YAML, path)
+        if input_data:
+            yield path, input_data
+    if include_unchanged or not unchanged:
+        return
+    for path in unchanged:
+        click.echo(f'{path}: unchanged since {base_ref}, skipped.')
+    click.echo(f'[Info] The report only covers the app.yaml files changed since {base_ref}, \
+use --cache-dir to include the results of the unchanged ones from the result cache.')
+
+def get_changed_app_yamls(base_ref: str) -> Tuple[List[str], List[str]]:
+    """Split the app.yaml files of the git repository of the current directory into the ones
+    changed since base_ref (either the app.yaml itself or any of its included files changed)
+    and the unchanged ones. Returns (None, None) if the changes could not be computed."""
+    repo_root = _run_git(['rev-parse', '--show-toplevel'])
+    if repo_root is None:
+        return (None, None)
+    repo_root = repo_root.strip()
+    changed_output = _run_git(['diff', '--name-only', base_ref, '--'], repo_root)
+    untracked_output = _run_git(['ls-files', '--others', '--exclude-standard'], repo_root)
+    tracked_output = _run_git(['ls-files'], repo_root)
+    # The content signature of the YAML files is matched by a single `git grep` rather
+    # than by reading every tracked file, exit code 1 means no file matched.
+    signed_output = _run_git(['grep', '-l', '-I', '--untracked', '-E', \
+        _APP_YAML_GREP_PATTERN, '--'] + _YAML_PATHSPECS, repo_root, [0, 1])
+    if changed_output is None or untracked_output is None or tracked_output is None \
+        or signed_output is None:
+        return (None, None)
+    changed_files = _to_abs_paths(repo_root, changed_output + untracked_output)
+    candidates = {path for path in _to_abs_paths(repo_root, tracked_output + untracked_output) \
+        if os.path.basename(path) in _APP_YAML_FILENAMES and os.path.isfile(path)}
+    candidates |= _to_abs_paths(repo_root, signed_output)
+
+    changed: List[str] = []
+    unchanged: List[str] = []
+    for path in sorted(candidates):
+        relative_path = os.path.relpath(path)
+        if path in changed_files or _get_included_files(path) & changed_files:
+            changed.append(relative_path)
+        else:
+            unchanged.append(relative_path)
+    return (changed, unchanged)
+
+def _get_included_files(appyaml: str) -> Set[str]:
+    """Return the files included (recursively) by the app.yaml, shared fragments are only
+    parsed once thanks to the fragment cache of the includes module."""
+    included_files: Set[str] = set()
+    try:
+        with open(appyaml, 'r', encoding='utf8') as file:
+            appyaml_data = yaml.safe_load(file.read())
+    except (IOError, yaml.YAMLError, UnicodeDecodeError):
+        # The app.yaml is reported when it is read as an input.
+        return included_files
+    resolve_includes(appyaml_data, os.path.dirname(appyaml), included_files)
+    return included_files
+
+def _to_abs_paths(repo_root: str, git_output: str) -> Set[str]:
+    return {os.path.join(repo_root, line) for line in git_output.splitlines() if line}
+
+def _run_git(args: List[str], cwd: str = None, returncodes: List[int] = None) -> str:
+    try:
+        result = subprocess.run(['git'] + args, cwd=cwd, capture_output=True, text=True, \
+            check=False)
+    except OSError:
+        click.echo('[Error] Failed to run git, please make sure git is installed.')
+        return None
+    if result.returncode not in (returncodes or [0]):
+        click.echo(f'[Error] `git {" ".join(args)}` failed: {result.stderr.strip()}')
+        return None
+    return result.stdout
@@ -0,0 +1,129 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""includes module resolves the `includes:` directive of app.yaml files,
+see https://cloud.google.com/appengine/docs/standard/reference/app-yaml#includes."""
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Set, Tuple
+import click
+import yaml
+from app2run.common.diagnostics import Diagnostics, Severity
+
+INCLUDES_KEY = 'includes'
+# An included directory must contain an include.yaml file.
+_INCLUDE_DIR_FILENAME = 'include.yaml'
+
+# Parsed fragments keyed by absolute path, the value is the (mtime_ns, size)
+# of the file when it was parsed and the parsed data. Fragments shared by many
+# app.yaml files are parsed once per process as long as they are unchanged. The
+# least recently used fragments are dropped beyond _MAX_CACHED_FRAGMENTS, so that a
+# long-running process (e.g. using the API) does not grow without bound.
+_FRAGMENT_CACHE: 'OrderedDict[str, Tuple[Tuple[int, int], Any]]' = OrderedDict()
+_FRAGMENT_CACHE_LOCK = threading.Lock()
+_MAX_CACHED_FRAGMENTS = 1024
+
+def resolve_includes(input_data: Dict, base_dir: str, resolved_files: Set[str] = None, \
+    diagnostics: Diagnostics = None) -> Dict:
+    """Merge the fragments listed at the `includes:` directive of input_data (recursively)
+    into a new dictionary, input_data itself is not modified. Values of the including
+    file take precedence, nested dictionaries are merged and lists are concatenated.
+    Paths of the included files are added to resolved_files if it is provided. Invalid
+    includes are reported to diagnostics if it is provided, printed otherwise."""
+    if not isinstance(input_data, dict) or INCLUDES_KEY not in input_data:
+        return input_data
+    resolved_files = resolved_files if resolved_files is not None else set()
+    return _resolve(input_data, base_dir, [], resolved_files, diagnostics)
+
+def _resolve(input_data: Dict, base_dir: str, include_chain: List[str], \
+    resolved_files: Set[str], diagnostics: Diagnostics) -> Dict:
+    merged = {key: value for key, value in input_data.items() if key != INCLUDES_KEY}
+    for include_path in input_data.get(INCLUDES_KEY) or []:
+        fragment_path = _get_fragment_path(base_dir, str(include_path))
+        if fragment_path in include_chain:
+            cycle = ' -> '.join(include_chain + [fragment_path])
+            _report(diagnostics, 'circular-includes', Severity.WARNING, \
+                f'Circular includes detected: {cycle}, skipping {include_path}.')
+            continue
+        if fragment_path in resolved_files:
+            # The fragment is already merged via another include path.
+            continue
+        try:
+            fragment = _load_fragment(fragment_path)
+        except (yaml.YAMLError, UnicodeDecodeError) as error:
+            _report(diagnostics, 'invalid-include', Severity.ERROR, \
+                f'{fragment_path}: {error}, skipping {include_path}.')
+            # The file is still included, e.g. a fix of the file is a change of the input.
+            resolved_files.add(fragment_path)
+            continue
+        if fragment is None:
+            _report(diagnostics, 'missing-include', Severity.WARNING, f'Included file \
+{fragment_path} does not exist or is empty, skipping {include_path}.')
+            continue
+        resolved_files.add(fragment_path)
+        if not isinstance(fragment, dict):
+            _report(diagnostics, 'invalid-include', Severity.WARNING, f'Included file \
+{fragment_path} is not a mapping, skipping {include_path}.')
+            continue
+        fragment = _resolve(fragment, os.path.dirname(fragment_path), \
+            include_chain + [fragment_path], resolved_files, diagnostics)
+        merged = _merge(merged, fragment)
+    return merged
+
+def _report(diagnostics: Diagnostics, code: str, severity: Severity, message: str) -> None:
+    if diagnostics is None:
+        click.echo(f'[{severity.value.capitalize()}] {message}')
+    else:
+        diagnostics.report(code, severity, message)
+
+def _get_fragment_path(base_dir: str, include_path: str) -> str:
+    fragment_path = os.path.abspath(os.path.join(base_dir, include_path))
+    if os.path.isdir(fragment_path):
+        fragment_path = os.path.join(fragment_path, _INCLUDE_DIR_FILENAME)
+    return fragment_path
+
+def _load_fragment(fragment_path: str) -> Any:
+    try:
+        stat = os.stat(fragment_path)
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _FRAGMENT_CACHE_LOCK:
+        cached = _FRAGMENT_CACHE.get(fragment_path)
+        if cached is not None and cached[0] == signature:
+            _FRAGMENT_CACHE.move_to_end(fragment_path)
+            return copy.deepcopy(cached[1])
+    with open(fragment_path, 'r', encoding='utf8') as file:
+        fragment = yaml.safe_load(file.read())
+    with _FRAGMENT_CACHE_LOCK:
+        _FRAGMENT_CACHE[fragment_path] = (signature, fragment)
+        _FRAGMENT_CACHE.move_to_end(fragment_path)
+        while len(_FRAGMENT_CACHE) > _MAX_CACHED_FRAGMENTS:
+            _FRAGMENT_CACHE.popitem(last=False)
+    # The cached fragment is shared by the includers, each one merges its own copy.
+    return copy.deepcopy(fragment)
+
+def _merge(including: Dict, included: Dict) -> Dict:
+    """Merge two dictionaries into a new one without modifying either of them."""
+    merged = dict(including)
+    for key, value in included.items():
+        if key not in merged:
+            merged[key] = value
+        elif isinstance(merged[key], dict) and isinstance(value, dict):
+            merged[key] = _merge(merged[key], value)
+        elif isinstance(merged[key], list) and isinstance(value, list):
+            merged[key] = merged[key] + value
+    return merged
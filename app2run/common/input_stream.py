@@ -0,0 +1,113 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""input_stream module reads a stream of input documents, e.g. many app.yaml
+documents piped to stdin, one document at a time."""
+import json
+import os
+from typing import Dict, IO, Iterator, Tuple
+import click
+import yaml
+from app2run.common.includes import resolve_includes
+
+# Passing `--appyaml -` reads the input documents from stdin.
+STDIN_INPUT = '-'
+_STDIN_NAME = '<stdin>'
+
+class _PrefixedStream:
+    """_PrefixedStream replays the already consumed prefix before reading
+    the rest of the wrapped stream, so that the stream format could be sniffed
+    without buffering the whole stream."""
+    def __init__(self, prefix: str, stream: IO[str]):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size: int = -1) -> str:
+        """Read from the prefix first, then from the wrapped stream."""
+        if not self._prefix:
+            return self._stream.read(size)
+        if size is None or size < 0:
+            data, self._prefix = self._prefix + self._stream.read(), ''
+            return data
+        data, self._prefix = self._prefix[:size], self._prefix[size:]
+        return data
+
+def iter_input_documents(stream: IO[str], stream_name: str = _STDIN_NAME) \
+    -> Iterator[Tuple[str, Dict]]:
+    """Yield (document_id, input_data) for every document of the stream, the stream is
+    either a `---` separated multi-document YAML stream or NDJSON (one JSON object per
+    line). Documents are parsed lazily, so memory stays flat regardless of the
+    stream length. The document id is `<stream_name>#<index>`, documents which are not
+    a mapping (e.g. a list) are reported and skipped."""
+    prefix = ''
+    line = stream.readline()
+    while line and not line.strip():
+        prefix += line
+        line = stream.readline()
+    if not line:
+        return
+    if _is_json_line(line):
+        yield from _iter_ndjson_documents(line, stream, stream_name)
+        return
+    yield from _iter_yaml_documents(_PrefixedStream(prefix + line, stream), stream_name)
+
+def iter_stdin_inputs() -> Iterator[Tuple[str, Dict]]:
+    """Yield (document_id, input_data) for every app.yaml document read from stdin, the
+    `includes:` of the documents are resolved relative to the current directory."""
+    for document_id, input_data in iter_input_documents(click.get_text_stream('stdin')):
+        yield document_id, resolve_includes(input_data, os.getcwd())
+
+def _is_json_line(line: str) -> bool:
+    if not line.lstrip().startswith('{'):
+        return False
+    try:
+        json.loads(line)
+    except ValueError:
+        return False
+    return True
+
+def _iter_ndjson_documents(first_line: str, stream: IO[str], stream_name: str) \
+    -> Iterator[Tuple[str, Dict]]:
+    index = 0
+    line = first_line
+    while line:
+        if line.strip():
+            document_id = f'{stream_name}#{index}'
+            try:
+                document = json.loads(line)
+            except ValueError as error:
+                click.echo(f'[Error] {document_id} is not a valid JSON document: {error}')
+            else:
+                if _is_mapping(document_id, document):
+                    yield document_id, document
+            index += 1
+        line = stream.readline()
+
+def _iter_yaml_documents(stream, stream_name: str) -> Iterator[Tuple[str, Dict]]:
+    index = 0
+    try:
+        for document in yaml.safe_load_all(stream):
+            document_id = f'{stream_name}#{index}'
+            # An empty document is yielded as is, it is reported as empty by the commands.
+            if document is None or _is_mapping(document_id, document):
+                yield document_id, document
+            index += 1
+    except yaml.YAMLError as error:
+        click.echo(f'[Error] Failed to parse {stream_name}#{index}: {error}')
+
+def _is_mapping(document_id: str, document) -> bool:
+    if isinstance(document, dict):
+        return True
+    click.echo(f'[Error] {document_id} is not a mapping, it is skipped.')
+    return False
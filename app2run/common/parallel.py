@@ -0,0 +1,75 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""parallel module maps a function over a stream of items in a pool of worker processes,
+with a bounded number of items in flight."""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Deque, Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Number of items sent to a worker at once, it amortizes the inter-process overhead of
+# small items.
+DEFAULT_CHUNK_SIZE = 8
+# Number of chunks in flight per worker, it bounds the memory held by the pending
+# items and results while keeping every worker busy.
+_CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+def iter_parallel(func: Callable[[T], R], items: Iterable[T], jobs: int, \
+    ordered: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE, # pylint: disable=too-many-arguments
+    initializer: Callable = None, initargs: Tuple = ()) -> Iterator[R]:
+    """Yield func(item) for every item, computed by `jobs` worker processes. Results are
+    yielded in the order of the items, or as they complete if ordered is False. Items are
+    consumed lazily, at most `jobs * 2` chunks of chunk_size items are in flight. func,
+    the items and the results must be picklable, initializer(*initargs) is called once
+    in every worker process."""
+    chunks = _iter_chunks(items, chunk_size)
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=initializer, \
+        initargs=initargs)
+    pending: Deque[Future] = deque()
+
+    def submit_next_chunk() -> None:
+        chunk = next(chunks, None)
+        if chunk is not None:
+            pending.append(executor.submit(_run_chunk, func, chunk))
+
+    try:
+        for _ in range(jobs * _CHUNKS_IN_FLIGHT_PER_WORKER):
+            submit_next_chunk()
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+            results = future.result()
+            submit_next_chunk()
+            yield from results
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _iter_chunks(items: Iterable[T], chunk_size: int) -> Iterator[List[T]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def _run_chunk(func: Callable[[T], R], chunk: List[T]) -> List[R]:
+    return [func(item) for item in chunk]
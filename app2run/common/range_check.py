@@ -0,0 +1,88 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""range_check module validates the values of the range_limited features of many inputs
+at once. The values of each feature are gathered into a column and compared to the
+bounds of the feature with vectorized NumPy comparisons, the results are scattered back
+to the inputs. A pure Python comparison is used if NumPy is not installed."""
+from numbers import Real
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+from app2run.config.feature_config_loader import RangeLimitFeature
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_MISSING = object()
+# Types of most of the values, checked before the slower isinstance(value, Real).
+_NUMBER_TYPES = (int, float)
+
+def find_in_range(values: Sequence[Real], minimum: Real, maximum: Real) -> List[bool]:
+    """Check if each value is within [minimum, maximum]."""
+    if numpy is not None:
+        column = numpy.asarray(values)
+        return ((column >= minimum) & (column <= maximum)).tolist()
+    return [minimum <= value <= maximum for value in values]
+
+def check_ranges(inputs: Sequence[Mapping[str, Any]], \
+    features: Dict[str, RangeLimitFeature]) -> List[Dict[str, bool]]:
+    """Check the values of the range_limited features (keyed by path) of the inputs, and
+    return for each input whether each of its range_limited values is within the range of
+    the feature, keyed by path. The values are gathered in one pass over the inputs, only
+    the keys of the features are looked up. Values which are not numbers (e.g. strings or
+    booleans) are out of range. Values under keys containing dots are not gathered, they
+    are left to RangeLimitFeature.validate."""
+    feature_tree = _get_feature_tree(features)
+    range_checks: List[Dict[str, bool]] = [{} for _ in inputs]
+    columns: Dict[str, Tuple[List[int], List[Real]]] = {}
+    for input_index, input_data in enumerate(inputs):
+        pending = [(input_data, feature_tree)]
+        while pending:
+            node, tree = pending.pop()
+            for key, subtree in tree.items():
+                value = node.get(key, _MISSING)
+                if value is _MISSING:
+                    continue
+                if isinstance(subtree, dict):
+                    if isinstance(value, dict):
+                        pending.append((value, subtree))
+                elif value.__class__ in _NUMBER_TYPES or _is_number(value):
+                    input_indexes, values = columns.setdefault(subtree, ([], []))
+                    input_indexes.append(input_index)
+                    values.append(value)
+                elif not isinstance(value, dict):
+                    range_checks[input_index][subtree] = False
+    for path, (input_indexes, values) in columns.items():
+        feature = features[path]
+        in_range = find_in_range(values, feature.range['min'], feature.range['max'])
+        for input_index, value_in_range in zip(input_indexes, in_range):
+            range_checks[input_index][path] = value_in_range
+    return range_checks
+
+def _get_feature_tree(features: Dict[str, RangeLimitFeature]) -> Dict[str, Any]:
+    """Nest the paths of the features by their keys, the leaves are the paths, e.g.
+    {'resources': {'cpu': 'resources.cpu'}}."""
+    feature_tree: Dict[str, Any] = {}
+    for path in features:
+        *parents, leaf = path.split('.')
+        tree = feature_tree
+        for parent in parents:
+            tree = tree.setdefault(parent, {})
+        tree[leaf] = path
+    return feature_tree
+
+def _is_number(value: Any) -> bool:
+    # bool is a subclass of int, but booleans are not numbers of a range.
+    return isinstance(value, Real) and not isinstance(value, bool)
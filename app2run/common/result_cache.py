@@ -0,0 +1,181 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""result_cache module stores analysis results in memory for the current run and on
+local disk, keyed by the hash of everything the results depend on, with a size-capped
+LRU eviction."""
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+import pkg_resources
+
+DEFAULT_MAX_CACHE_SIZE = 100 * 1024 * 1024
+DEFAULT_MAX_MEMORY_ENTRIES = 10000
+_ENTRY_SUFFIX = '.json'
+# Once over max_size, entries are evicted down to this ratio of max_size, so that the
+# following writes do not evict again.
+_EVICTION_LOW_WATER_RATIO = 0.9
+
+@dataclass
+class CacheStats:
+    """CacheStats counts the cache lookups and evictions of a run."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def merge(self, other: 'CacheStats') -> None:
+        """Add the counts of other, e.g. the stats of a worker process."""
+        self.hits += other.hits
+        self.misses += other.misses
+        self.evictions += other.evictions
+
+    def __str__(self) -> str:
+        return f'{self.hits} hit(s), {self.misses} miss(es), {self.evictions} eviction(s)'
+
+def compute_cache_key(*parts: Any) -> str:
+    """Compute a content-addressed key from the parts, the parts are hashed in their
+    canonical JSON form so that equal inputs produce equal keys regardless of the key
+    order of the dictionaries. The app2run version is always part of the key."""
+    canonical = json.dumps([_get_app2run_version(), *parts], sort_keys=True, \
+        separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf8')).hexdigest()
+
+class ResultCache:
+    """ResultCache stores JSON results as files under cache_dir, one file per key. When
+    the total size exceeds max_size, the least recently used entries are evicted (down to
+    a low-water mark), an entry is used when it is written or read. The sizes of the
+    entries are indexed in memory in least recently used order, the index is built from
+    the cache directory once per run. The most recently used entries are also
+    kept in memory, without cache_dir the results are only kept in memory, e.g. to
+    analyze identical inputs of a batch run once."""
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_MAX_CACHE_SIZE, \
+        max_memory_entries: int = DEFAULT_MAX_MEMORY_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_memory_entries = max_memory_entries
+        self.stats = CacheStats()
+        self._memory: OrderedDict = OrderedDict()
+        # Sizes of the entries keyed by path, in least recently used order.
+        self._entry_sizes: Optional[OrderedDict] = None
+        self._total_size = 0
+
+    def get(self, key: str) -> Any:
+        """Get the result of the key, None on a miss. Every call returns a new copy of
+        the result."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.stats.hits += 1
+            if self.cache_dir is not None:
+                self._use_entry(self._get_entry_path(key))
+            return json.loads(self._memory[key])
+        if self.cache_dir is None:
+            self.stats.misses += 1
+            return None
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path, 'r', encoding='utf8') as file:
+                data = file.read()
+            result = json.loads(data)
+        except (OSError, ValueError):
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self._put_memory(key, data)
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        self._use_entry(entry_path)
+        return result
+
+    def put(self, key: str, result: Any) -> None:
+        """Store the result of the key, the file is replaced atomically so that concurrent
+        runs never read a partial entry."""
+        data = json.dumps(result, separators=(',', ':'), default=str)
+        self._put_memory(key, data)
+        if self.cache_dir is None:
+            return
+        entry_path = self._get_entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), \
+                suffix='.tmp')
+            with os.fdopen(file_descriptor, 'w', encoding='utf8') as file:
+                file.write(data)
+            os.replace(temp_path, entry_path)
+        except OSError:
+            return
+        entry_sizes = self._get_entry_sizes()
+        self._total_size -= entry_sizes.pop(entry_path, 0)
+        entry_sizes[entry_path] = len(data.encode('utf8'))
+        self._total_size += entry_sizes[entry_path]
+        if self._total_size > self.max_size:
+            self._evict(entry_sizes)
+
+    def _put_memory(self, key: str, data: str) -> None:
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _use_entry(self, entry_path: str) -> None:
+        if self._entry_sizes is not None and entry_path in self._entry_sizes:
+            self._entry_sizes.move_to_end(entry_path)
+
+    def _get_entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + _ENTRY_SUFFIX)
+
+    def _get_entry_sizes(self) -> OrderedDict:
+        # The cache directory is scanned (and sorted by mtime) once per run, the index is
+        # then kept up to date on every read and write.
+        if self._entry_sizes is None:
+            entries: Dict[str, Tuple[int, int]] = {}
+            for dir_path, _, file_names in os.walk(self.cache_dir):
+                for file_name in file_names:
+                    if file_name.endswith(_ENTRY_SUFFIX):
+                        entry_path = os.path.join(dir_path, file_name)
+                        try:
+                            stat = os.stat(entry_path)
+                        except OSError:
+                            continue
+                        entries[entry_path] = (stat.st_mtime_ns, stat.st_size)
+            self._entry_sizes = OrderedDict((entry_path, entries[entry_path][1]) \
+                for entry_path in sorted(entries, key=lambda path: entries[path][0]))
+            self._total_size = sum(self._entry_sizes.values())
+        return self._entry_sizes
+
+    def _evict(self, entry_sizes: OrderedDict) -> None:
+        low_water_size = self.max_size * _EVICTION_LOW_WATER_RATIO
+        while entry_sizes and self._total_size > low_water_size:
+            entry_path, entry_size = entry_sizes.popitem(last=False)
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            self._total_size -= entry_size
+            self._memory.pop(os.path.basename(entry_path)[:-len(_ENTRY_SUFFIX)], None)
+            self.stats.evictions += 1
+
+def get_result_cache(cache_dir: str) -> Optional[ResultCache]:
+    """Get the ResultCache of the cache directory, None if no directory is given."""
+    return ResultCache(cache_dir) if cache_dir else None
+
+@lru_cache(maxsize=None)
+def _get_app2run_version() -> str:
+    return pkg_resources.require('app2run')[0].version
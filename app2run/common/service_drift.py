@@ -0,0 +1,158 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""service_drift module reads the Cloud Run services exported with
+`gcloud run services describe --format=export` and compares their performance settings
+(concurrency, CPU, memory, instances, timeout) with the translated services."""
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+import click
+import yaml
+
+_EXPORT_EXTENSIONS = ('.yaml', '.yml', '.json')
+# The exported services are parsed by the main process, with the C parser if available.
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader) # pylint: disable=invalid-name
+_MEMORY_PATTERN = re.compile(r'^([0-9.]+)([KMGTPE]i?|k)?$')
+# Decimal (e.g. `G`) and binary (e.g. `Gi`) units of memory limits, in bytes.
+_MEMORY_UNITS: Dict[str, int] = {'': 1, 'k': 1000, \
+    **{unit: 1000 ** exponent for exponent, unit in enumerate('KMGTPE', start=1)}, \
+    **{f'{unit}i': 1024 ** exponent for exponent, unit in enumerate('KMGTPE', start=1)}}
+_TEMPLATE = ('spec', 'template')
+_ANNOTATIONS = _TEMPLATE + ('metadata', 'annotations')
+_LIMITS = _TEMPLATE + ('spec', 'containers', 0, 'resources', 'limits')
+
+class ExportedService(NamedTuple):
+    """ExportedService is a Cloud Run service read from the export file at path."""
+    path: str
+    service: Dict
+
+class Drift(NamedTuple):
+    """Drift is a field whose value in the exported service differs from its value in the
+    translated service."""
+    field: str
+    translated: Any
+    exported: Any
+
+def parse_cpu(value: Any) -> float:
+    """Parse a CPU limit (e.g. `1`, `0.5` or `500m`) in number of CPUs."""
+    value = str(value)
+    if value.endswith('m'):
+        return float(value[:-1]) / 1000
+    return float(value)
+
+def parse_memory(value: Any) -> float:
+    """Parse a memory limit (e.g. `512Mi`, `2Gi` or `1G`) in bytes."""
+    match = _MEMORY_PATTERN.match(str(value))
+    if match is None:
+        raise ValueError(f'Invalid memory limit: {value}')
+    return float(match.group(1)) * _MEMORY_UNITS[match.group(2) or '']
+
+@dataclass(frozen=True)
+class DriftField:
+    """DriftField is a performance setting of a Cloud Run service: its path in the service,
+    how its values are parsed to be compared, and its value if the service does not set
+    it."""
+    name: str
+    path: Tuple
+    parse: Callable[[Any], Any]
+    default: Any = None
+
+DRIFT_FIELDS: List[DriftField] = [
+    DriftField('concurrency', _TEMPLATE + ('spec', 'containerConcurrency'), int),
+    DriftField('cpu', _LIMITS + ('cpu',), parse_cpu),
+    DriftField('memory', _LIMITS + ('memory',), parse_memory),
+    DriftField('min_instances', _ANNOTATIONS + ('autoscaling.knative.dev/minScale',), int),
+    DriftField('max_instances', _ANNOTATIONS + ('autoscaling.knative.dev/maxScale',), int),
+    DriftField('timeout', _TEMPLATE + ('spec', 'timeoutSeconds'), int),
+    DriftField('cpu_throttling', _ANNOTATIONS + ('run.googleapis.com/cpu-throttling',), \
+        lambda value: str(value).lower(), 'true'),
+]
+
+def get_field_value(service: Dict, path: Tuple) -> Any:
+    """Get the value at path (keys of mappings and indexes of lists) of the service, None
+    if it is not set."""
+    value = service
+    for key in path:
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list) and isinstance(key, int) and key < len(value):
+            value = value[key]
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+def compare_services(translated: Dict, exported: Dict) -> List[Drift]:
+    """Compare the performance settings set by the translated service with the exported
+    service. Fields not set by the translation are left to the exported service, e.g. the
+    default maxScale added by Cloud Run is not a drift."""
+    drifts: List[Drift] = []
+    for drift_field in DRIFT_FIELDS:
+        translated_value = get_field_value(translated, drift_field.path)
+        if translated_value is None:
+            continue
+        exported_value = get_field_value(exported, drift_field.path)
+        if exported_value is None:
+            exported_value = drift_field.default
+        if not _is_equal(drift_field.parse, translated_value, exported_value):
+            drifts.append(Drift(drift_field.name, translated_value, exported_value))
+    return drifts
+
+def index_exported_services(services_dir: str) -> Dict[str, ExportedService]:
+    """Read the Cloud Run services exported (as YAML or JSON, one or more services per
+    file) to the files under services_dir, keyed by service name. A service exported
+    more than once is read from the first file in path order."""
+    services: Dict[str, ExportedService] = {}
+    for path in _iter_export_files(services_dir):
+        for service in _load_services(path):
+            name = get_field_value(service, ('metadata', 'name'))
+            if name in services:
+                click.echo(f'[Warning] Cloud Run service {name} of {path} is already \
+exported to {services[name].path}, it is skipped.')
+                continue
+            services[name] = ExportedService(path, service)
+    return services
+
+def _iter_export_files(services_dir: str) -> Iterator[str]:
+    for dir_path, dir_names, filenames in os.walk(services_dir):
+        dir_names.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(_EXPORT_EXTENSIONS):
+                yield os.path.join(dir_path, filename)
+
+def _load_services(path: str) -> List[Dict]:
+    try:
+        with open(path, 'r', encoding='utf8') as file:
+            if path.endswith('.json'):
+                documents = json.load(file)
+                documents = documents if isinstance(documents, list) else [documents]
+            else:
+                documents = list(yaml.load_all(file, Loader=_YAML_LOADER))
+    except (OSError, ValueError, yaml.YAMLError) as error:
+        click.echo(f'[Warning] Failed to read the exported services of {path}: {error}')
+        return []
+    return [document for document in documents if isinstance(document, dict) and \
+        document.get('kind') == 'Service' and get_field_value(document, ('metadata', 'name'))]
+
+def _is_equal(parse: Callable[[Any], Any], translated: Any, exported: Any) -> bool:
+    if exported is None:
+        return False
+    try:
+        return parse(translated) == parse(exported)
+    except (TypeError, ValueError):
+        return str(translated) == str(exported)
@@ -0,0 +1,84 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""service_versions module reads the versions of a deployed App Engine service which
+serve traffic, with the traffic split of the service, and converts the split to the
+traffic assignment of the matching Cloud Run revisions."""
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, TypeVar
+import yaml
+from app2run.common.util import get_input_data_by_input_type
+from app2run.config.feature_config_loader import InputType
+
+T = TypeVar('T')
+
+# Number of versions fetched (by `gcloud app versions describe`) at once.
+_MAX_CONCURRENT_FETCHES = 8
+
+@dataclass
+class ServiceVersion:
+    """ServiceVersion is a version of a service serving traffic, percent is its share of
+    the traffic of the service (the shares of the versions add up to 100)."""
+    version_id: str
+    allocation: float
+    percent: int = 0
+
+def get_traffic_split(service: str, project: str = None) -> List[ServiceVersion]:
+    """Get the versions of the service serving traffic from the traffic split of the
+    service (`gcloud app services describe`), by decreasing share of the traffic. Return
+    an empty list if the service could not be described."""
+    gcloud_command = f'gcloud app services describe {service}'
+    if project is not None:
+        gcloud_command += f' --project={project}'
+    service_data = yaml.safe_load(os.popen(gcloud_command)) or {}
+    allocations: Dict = (service_data.get('split') or {}).get('allocations') or {}
+    versions = [ServiceVersion(str(version_id), float(allocation)) \
+        for version_id, allocation in allocations.items() if float(allocation) > 0]
+    versions.sort(key=lambda version: (-version.allocation, version.version_id))
+    for version, percent in zip(versions, \
+        get_traffic_percents([version.allocation for version in versions])):
+        version.percent = percent
+    return versions
+
+def get_traffic_percents(allocations: List[float]) -> List[int]:
+    """Convert traffic allocations (fractions of the traffic) to integer percents adding up
+    to 100, the remaining percents go to the largest fractional parts."""
+    total = sum(allocations)
+    if total <= 0:
+        return [0 for _ in allocations]
+    shares = [allocation * 100 / total for allocation in allocations]
+    percents = [math.floor(share) for share in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda index: percents[index] - shares[index])
+    for index in by_remainder[:100 - sum(percents)]:
+        percents[index] += 1
+    return percents
+
+def map_service_versions(func: Callable[[ServiceVersion, Dict], T], service: str, \
+    versions: List[ServiceVersion], project: str = None) -> List[T]:
+    """Fetch the deployed versions (`gcloud app versions describe`) concurrently, and call
+    func(version, version_data) for every version as soon as its data is fetched. Return the
+    results in the order of the versions."""
+    def fetch_and_call(version: ServiceVersion) -> T:
+        version_data = get_input_data_by_input_type(InputType.ADMIN_API, None, service, \
+            version.version_id, project)
+        return func(version, version_data)
+
+    if not versions:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(versions), _MAX_CONCURRENT_FETCHES)) \
+        as executor:
+        return list(executor.map(fetch_and_call, versions))
@@ -0,0 +1,186 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""table_export module streams the results of many inputs as a table, one row per input
+and feature, to a CSV file or, if pyarrow is installed, to an Arrow IPC or a Parquet file.
+Rows are written in batches, so memory stays flat regardless of the number of rows."""
+import csv
+import json
+from abc import ABC, abstractmethod
+from numbers import Real
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+TABLE_FORMATS = ['csv', 'arrow', 'parquet']
+# Number of rows of an Arrow record batch (or a Parquet row group).
+_BATCH_ROWS = 64 * 1024
+
+class TableRow(NamedTuple):
+    """TableRow is a feature of an input: the value of the feature in the input (also as a
+    number or a boolean if it is one), the severity if the feature is incompatible, and the
+    Cloud Run flag (if any) with the value it is translated to."""
+    input_name: str
+    path: str
+    severity: Optional[str]
+    value: str
+    number_value: Optional[Real]
+    boolean_value: Optional[bool]
+    flag: Optional[str]
+    target_value: Optional[str]
+
+TABLE_COLUMNS = list(TableRow._fields)
+# Columns with few distinct values (bounded by the feature config), they are
+# dictionary-encoded in Arrow and Parquet. input_name is not, it is unique per input.
+_DICTIONARY_COLUMNS = ['path', 'severity', 'flag']
+
+class TableWriter(ABC):
+    """TableWriter writes rows to a table file, the file is complete once the writer is
+    closed."""
+    @abstractmethod
+    def write_rows(self, rows: Iterable[TableRow]) -> int:
+        """Write the rows, return the number of rows written."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Flush the pending rows and close the file."""
+
+    def __enter__(self) -> 'TableWriter':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+class _CsvTableWriter(TableWriter):
+    def __init__(self, path: str):
+        self._file = open(path, 'w', encoding='utf8', newline='') # pylint: disable=consider-using-with
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(TABLE_COLUMNS)
+
+    def write_rows(self, rows: Iterable[TableRow]) -> int:
+        row_count = 0
+        for row in rows:
+            self._writer.writerow(row)
+            row_count += 1
+        return row_count
+
+    def close(self) -> None:
+        self._file.close()
+
+class _ArrowTableWriter(TableWriter):
+    """_ArrowTableWriter buffers the rows into columns and writes a record batch every
+    _BATCH_ROWS rows. The dictionaries of the dictionary-encoded columns grow over the
+    batches, so that a batch only adds the new values (a dictionary delta)."""
+    def __init__(self, path: str, table_format: str):
+        self._schema = pyarrow.schema([pyarrow.field(column, _get_column_type(column)) \
+            for column in TABLE_COLUMNS])
+        if table_format == 'parquet':
+            self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        else:
+            self._writer = pyarrow.ipc.new_file(path, self._schema, \
+                options=pyarrow.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        self._columns: List[List] = [[] for _ in TABLE_COLUMNS]
+        self._dictionaries: Dict[str, Dict[str, int]] = \
+            {column: {} for column in _DICTIONARY_COLUMNS}
+        self._dictionary_arrays: Dict[str, Any] = \
+            {column: pyarrow.array([], pyarrow.string()) for column in _DICTIONARY_COLUMNS}
+
+    def write_rows(self, rows: Iterable[TableRow]) -> int:
+        row_count = 0
+        for row in rows:
+            for column, value in zip(self._columns, row):
+                column.append(value)
+            row_count += 1
+            if len(self._columns[0]) >= _BATCH_ROWS:
+                self._write_batch()
+        return row_count
+
+    def close(self) -> None:
+        if self._columns[0]:
+            self._write_batch()
+        self._writer.close()
+
+    def _write_batch(self) -> None:
+        arrays = []
+        for field, values in zip(self._schema, self._columns):
+            if field.name in _DICTIONARY_COLUMNS:
+                arrays.append(self._encode_with_delta(field.name, values))
+            else:
+                arrays.append(pyarrow.array(values, field.type))
+        self._writer.write_batch(pyarrow.record_batch(arrays, schema=self._schema))
+        self._columns = [[] for _ in TABLE_COLUMNS]
+
+    def _encode_with_delta(self, column_name: str, values: List[Optional[str]]) -> Any:
+        """Encode the values with the dictionary of the column, only the values new to the
+        dictionary are converted and appended to it."""
+        dictionary = self._dictionaries[column_name]
+        indices: List[Optional[int]] = []
+        new_values: List[str] = []
+        for value in values:
+            index = None if value is None else dictionary.get(value)
+            if index is None and value is not None:
+                index = dictionary[value] = len(dictionary)
+                new_values.append(value)
+            indices.append(index)
+        if new_values:
+            self._dictionary_arrays[column_name] = pyarrow.concat_arrays( \
+                [self._dictionary_arrays[column_name], pyarrow.array(new_values, \
+                    pyarrow.string())])
+        return pyarrow.DictionaryArray.from_arrays(pyarrow.array(indices, pyarrow.int32()), \
+            self._dictionary_arrays[column_name])
+
+def get_row_values(value: Any) -> Tuple[str, Optional[Real], Optional[bool]]:
+    """Get the value, number_value and boolean_value of a row for the value of a feature,
+    the value is formatted as JSON if it is not a string."""
+    if isinstance(value, bool):
+        return json.dumps(value), None, value
+    if isinstance(value, Real):
+        return json.dumps(value), value, None
+    return value if isinstance(value, str) else json.dumps(value, default=str), None, None
+
+def _get_column_type(column: str) -> Any:
+    if column in _DICTIONARY_COLUMNS:
+        return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    if column == 'number_value':
+        return pyarrow.float64()
+    if column == 'boolean_value':
+        return pyarrow.bool_()
+    return pyarrow.string()
+
+def get_table_format(path: str, table_format: str = None) -> str:
+    """Get the format of a table file, by default from the extension of the path (csv if
+    it is not known)."""
+    if table_format is not None:
+        return table_format
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension in ('arrow', 'feather'):
+        return 'arrow'
+    return extension if extension in TABLE_FORMATS else 'csv'
+
+def open_table_writer(path: str, table_format: str = 'csv') -> TableWriter:
+    """Open a writer of a table file of the given format, see TABLE_FORMATS. Raises
+    ValueError if the format requires pyarrow and it is not installed."""
+    if table_format == 'csv':
+        return _CsvTableWriter(path)
+    if table_format not in TABLE_FORMATS:
+        raise ValueError(f'Unknown table format {table_format}.')
+    if pyarrow is None:
+        raise ValueError(f'The {table_format} format requires pyarrow, install it with \
+`pip install app2run[arrow]`.')
+    return _ArrowTableWriter(path, table_format)
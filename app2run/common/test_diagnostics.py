@@ -0,0 +1,59 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for diagnostics.py."""
+import json
+from app2run.common.diagnostics import Diagnostic, Diagnostics, Severity
+
+def _get_diagnostics() -> Diagnostics:
+    diagnostics = Diagnostics()
+    diagnostics.warning('invalid-value', 'max_instances has invalid value of -1')
+    diagnostics.info('procfile-created', 'A Procfile is created')
+    return diagnostics
+
+def test_records_in_reported_order():
+    """test_records_in_reported_order"""
+    diagnostics = _get_diagnostics()
+    assert diagnostics.records == [
+        Diagnostic('invalid-value', Severity.WARNING, 'max_instances has invalid value of -1'),
+        Diagnostic('procfile-created', Severity.INFO, 'A Procfile is created'),
+    ]
+    assert [Diagnostic.from_record(diagnostic.to_record()) \
+        for diagnostic in diagnostics.records] == diagnostics.records
+
+def test_echo_text(capsys):
+    """test_echo_text"""
+    _get_diagnostics().echo('text')
+    assert capsys.readouterr().out == """[Warning] max_instances has invalid value of -1
+[Info] A Procfile is created
+"""
+
+def test_echo_json(capsys):
+    """test_echo_json"""
+    _get_diagnostics().echo('json', 'app.yaml')
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert [json.loads(line) for line in captured.err.splitlines()] == [
+        {'input': 'app.yaml', 'code': 'invalid-value', 'severity': 'warning', \
+            'message': 'max_instances has invalid value of -1'},
+        {'input': 'app.yaml', 'code': 'procfile-created', 'severity': 'info', \
+            'message': 'A Procfile is created'},
+    ]
+
+def test_echo_none(capsys):
+    """test_echo_none"""
+    _get_diagnostics().echo('none')
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert captured.err == ''
@@ -0,0 +1,136 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for discovery.py."""
+import os
+from click.testing import CliRunner
+from app2run.common.discovery import discover_app_yamls, iter_discovered_inputs, \
+    parse_ignore_patterns
+from app2run.main import cli
+
+runner = CliRunner()
+
+def _write(path, content, encoding='utf8'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding=encoding) as file:
+        file.write(content)
+
+def _create_monorepo():
+    _write('repo/.gitignore', 'build/\n*.tmp.yaml\n')
+    _write('repo/services/a/app.yaml', 'runtime: python\n')
+    _write('repo/services/b/b-service.yaml', 'service: b\nruntime: go\n')
+    _write('repo/services/b/dispatch.yaml', 'dispatch:\n- url: "*/b"\n')
+    _write('repo/services/c/deep/app.yaml', 'runtime: python\n')
+    _write('repo/services/c/.gitignore', '/deep\n')
+    _write('repo/build/app.yaml', 'runtime: python\n')
+    _write('repo/services/a/app.tmp.yaml', 'runtime: python\n')
+    _write('repo/.github/workflow.yaml', 'env:\n  runtime: python\n')
+
+def test_discover_app_yamls_content_signature_and_gitignore():
+    """test_discover_app_yamls_content_signature_and_gitignore"""
+    with runner.isolated_filesystem():
+        _create_monorepo()
+        output = list(discover_app_yamls('repo'))
+        assert output == [os.path.join('repo', 'services', 'a', 'app.yaml'), \
+            os.path.join('repo', 'services', 'b', 'b-service.yaml')]
+
+def test_discover_app_yamls_max_depth_and_excludes():
+    """test_discover_app_yamls_max_depth_and_excludes"""
+    with runner.isolated_filesystem():
+        _write('repo/app.yaml', 'runtime: python\n')
+        _write('repo/a/app.yaml', 'runtime: python\n')
+        _write('repo/a/b/app.yaml', 'runtime: python\n')
+        _write('repo/legacy/app.yaml', 'runtime: python\n')
+        output = list(discover_app_yamls('repo', max_depth=1, excludes=['legacy/']))
+        assert output == [os.path.join('repo', 'app.yaml'), \
+            os.path.join('repo', 'a', 'app.yaml')]
+
+def test_parse_ignore_patterns_negation():
+    """test_parse_ignore_patterns_negation"""
+    rules = parse_ignore_patterns(['# comment', '', '*.yaml', '!app.yaml'])
+    assert len(rules) == 2
+    assert rules[0].matches('a/cron.yaml', False)
+    assert rules[1].negate and rules[1].matches('a/app.yaml', False)
+
+def test_parse_ignore_patterns_gitignore_semantics():
+    """test_parse_ignore_patterns_gitignore_semantics"""
+    rules = parse_ignore_patterns( \
+        ['services/*.yaml', '**/deep', 'legacy/**', 'a/**/app.yaml', '/app.yaml'])
+    star, leading_stars, trailing_stars, middle_stars, root_only = \
+        rules[0], rules[1], rules[2], rules[3], rules[4]
+    assert star.matches('services/cron.yaml', False)
+    assert not star.matches('services/a/app.yaml', False)
+    assert leading_stars.matches('deep', True) and leading_stars.matches('x/y/deep', True)
+    assert not leading_stars.matches('x/deeper', True)
+    assert trailing_stars.matches('legacy/a/app.yaml', False)
+    assert not trailing_stars.matches('legacy', True)
+    assert middle_stars.matches('a/app.yaml', False)
+    assert middle_stars.matches('a/b/c/app.yaml', False)
+    assert not middle_stars.matches('b/a/app.yaml', False)
+    assert root_only.matches('app.yaml', False) and not root_only.matches('a/app.yaml', False)
+
+def test_discover_app_yamls_gitignore_negation_and_anchoring():
+    """test_discover_app_yamls_gitignore_negation_and_anchoring"""
+    with runner.isolated_filesystem():
+        _write('repo/.gitignore', '/app.yaml\nservices/*/*.yaml\n!services/*/app.yaml\n')
+        _write('repo/app.yaml', 'runtime: python\n')
+        _write('repo/services/app.yaml', 'runtime: python\n')
+        _write('repo/services/a/app.yaml', 'runtime: python\n')
+        _write('repo/services/a/old.yaml', 'runtime: python\n')
+        _write('repo/services/a/v1/old.yaml', 'runtime: python\n')
+        output = list(discover_app_yamls('repo'))
+        assert output == [os.path.join('repo', 'services', 'app.yaml'), \
+            os.path.join('repo', 'services', 'a', 'app.yaml'), \
+            os.path.join('repo', 'services', 'a', 'v1', 'old.yaml')]
+
+def test_iter_discovered_inputs():
+    """test_iter_discovered_inputs"""
+    with runner.isolated_filesystem():
+        _create_monorepo()
+        output = list(iter_discovered_inputs('repo'))
+        assert [input_data for _, input_data in output] == \
+            [{'runtime': 'python'}, {'service': 'b', 'runtime': 'go'}]
+
+def test_iter_discovered_inputs_malformed_file():
+    """test_iter_discovered_inputs_malformed_file"""
+    with runner.isolated_filesystem():
+        _write('a/app.yaml', 'runtime: python\n')
+        _write('c/broken.yaml', 'runtime: [bad\n')
+        _write('d/app.yaml', 'runtime: python\nincludes:\n- shared.yaml\n')
+        _write('d/shared.yaml', 'env_variables: [bad\n')
+        _write('e/latin1.yaml', 'runtime: python\nservice: caf\xe9\n', 'latin-1')
+        result = runner.invoke(cli, ['list-incompatible-features', '--discover', '.'])
+        assert result.exit_code == 0
+        assert 'list-incompatible-features output for a/app.yaml:' in result.output
+        assert '[Error] c/broken.yaml: while parsing a flow sequence' in result.output
+        assert f'[Error] {os.path.abspath("d/shared.yaml")}: ' in result.output
+        assert 'list-incompatible-features output for d/app.yaml:' in result.output
+        assert '[Error] e/latin1.yaml: ' in result.output
+
+def test_list_incompatible_features_discover():
+    """test_list_incompatible_features_discover"""
+    with runner.isolated_filesystem():
+        _create_monorepo()
+        result = runner.invoke(cli, ['list-incompatible-features', '--discover', 'repo'])
+        assert result.exit_code == 0
+        assert 'list-incompatible-features output for repo/services/a/app.yaml:' \
+            in result.output
+        assert 'list-incompatible-features output for repo/services/b/b-service.yaml:' \
+            in result.output
+
+def test_discover_with_changed_since():
+    """test_discover_with_changed_since"""
+    result = runner.invoke(cli, ['translate', '--discover', '.', '--changed-since', 'HEAD'])
+    assert '[Error] Invalid input, --changed-since and --discover could not be used together.' \
+        in result.output
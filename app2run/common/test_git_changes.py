@@ -0,0 +1,115 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for git_changes.py."""
+import os
+import subprocess
+from click.testing import CliRunner
+from app2run.common.git_changes import get_changed_app_yamls
+from app2run.main import cli
+
+runner = CliRunner()
+
+def _git(*args):
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] \
+        + list(args), check=True, capture_output=True)
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf8') as file:
+        file.write(content)
+
+def _init_repo():
+    _git('init', '-q')
+    _write('shared/env.yaml', 'env_variables:\n  foo: bar\n')
+    _write('a/app.yaml', 'runtime: python\nincludes:\n- ../shared/env.yaml\n')
+    _write('b/app.yaml', 'runtime: python\n')
+    _write('c/app.yaml', 'runtime: python\n')
+    _git('add', '-A')
+    _git('commit', '-q', '-m', 'base')
+
+def test_get_changed_app_yamls_include_changed():
+    """test_get_changed_app_yamls_include_changed"""
+    with runner.isolated_filesystem():
+        _init_repo()
+        _write('shared/env.yaml', 'env_variables:\n  foo: baz\n')
+        _write('c/app.yaml', 'runtime: python\ninbound_services:\n- warmup\n')
+        changed, unchanged = get_changed_app_yamls('HEAD')
+        assert changed == ['a/app.yaml', 'c/app.yaml']
+        assert unchanged == ['b/app.yaml']
+
+def test_get_changed_app_yamls_untracked():
+    """test_get_changed_app_yamls_untracked"""
+    with runner.isolated_filesystem():
+        _init_repo()
+        _write('d/app.yaml', 'runtime: python\n')
+        changed, unchanged = get_changed_app_yamls('HEAD')
+        assert changed == ['d/app.yaml']
+        assert unchanged == ['a/app.yaml', 'b/app.yaml', 'c/app.yaml']
+
+def test_get_changed_app_yamls_invalid_ref():
+    """test_get_changed_app_yamls_invalid_ref"""
+    with runner.isolated_filesystem():
+        _init_repo()
+        assert get_changed_app_yamls('no-such-ref') == (None, None)
+
+def test_list_incompatible_features_changed_since():
+    """test_list_incompatible_features_changed_since"""
+    with runner.isolated_filesystem():
+        _init_repo()
+        _write('c/app.yaml', 'runtime: python\ninbound_services:\n- warmup\n')
+        result = runner.invoke(cli, ['list-incompatible-features', '--changed-since', 'HEAD'])
+        assert result.exit_code == 0
+        assert '1 app.yaml file(s) changed since HEAD, 2 unchanged.' in result.output
+        assert 'list-incompatible-features output for c/app.yaml:' in result.output
+        assert 'path: inbound_services' in result.output
+        assert 'a/app.yaml: unchanged since HEAD, skipped.' in result.output
+
+def test_get_changed_app_yamls_by_content():
+    """test_get_changed_app_yamls_by_content"""
+    with runner.isolated_filesystem():
+        _init_repo()
+        _write('d/d-service.yaml', 'service: d\nruntime: go\n')
+        _write('d/dispatch.yaml', 'dispatch:\n- url: "*/d"\n')
+        changed, unchanged = get_changed_app_yamls('HEAD')
+        assert changed == ['d/d-service.yaml']
+        assert unchanged == ['a/app.yaml', 'b/app.yaml', 'c/app.yaml']
+
+def test_changed_since_malformed_files():
+    """test_changed_since_malformed_files"""
+    with runner.isolated_filesystem():
+        _init_repo()
+        _write('shared/env.yaml', 'env_variables: [bad\n')
+        _write('b/app.yaml', 'runtime: [bad\n')
+        result = runner.invoke(cli, ['list-incompatible-features', '--changed-since', 'HEAD'])
+        assert result.exit_code == 0
+        assert '2 app.yaml file(s) changed since HEAD, 1 unchanged.' in result.output
+        assert f'[Error] {os.path.abspath("shared/env.yaml")}: ' in result.output
+        assert 'list-incompatible-features output for a/app.yaml:' in result.output
+        assert '[Error] b/app.yaml: ' in result.output
+
+def test_changed_since_unchanged_from_result_cache():
+    """test_changed_since_unchanged_from_result_cache"""
+    with runner.isolated_filesystem():
+        _init_repo()
+        _write('.gitignore', 'cache/\n')
+        args = ['list-incompatible-features', '--changed-since', 'HEAD', '--cache-dir', 'cache']
+        runner.invoke(cli, args)
+        _write('c/app.yaml', 'runtime: python\ninbound_services:\n- warmup\n')
+        result = runner.invoke(cli, args)
+        assert result.exit_code == 0
+        assert 'unchanged since HEAD' not in result.output
+        for path in ['a/app.yaml', 'b/app.yaml', 'c/app.yaml']:
+            assert f'list-incompatible-features output for {path}:' in result.output
+        assert '[Info] Result cache: 2 hit(s), 1 miss(es)' in result.output
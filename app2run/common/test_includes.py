@@ -0,0 +1,126 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for includes.py."""
+import os
+from unittest.mock import patch
+from click.testing import CliRunner
+import yaml
+from app2run.common import includes
+from app2run.common.diagnostics import Diagnostics
+from app2run.common.includes import resolve_includes
+
+runner = CliRunner()
+
+def test_resolve_includes_no_includes():
+    """test_resolve_includes_no_includes"""
+    input_data = {'runtime': 'python'}
+    assert resolve_includes(input_data, '.') is input_data
+
+def test_resolve_includes_merges_fragments():
+    """test_resolve_includes_merges_fragments"""
+    with runner.isolated_filesystem():
+        os.mkdir('shared')
+        with open('shared/include.yaml', 'w', encoding='utf8') as fragment:
+            fragment.write("""
+runtime: python38
+env_variables:
+  foo: shared
+  bar: shared
+handlers:
+- url: /shared
+""")
+        input_data = {
+            'runtime': 'python',
+            'includes': ['shared'],
+            'env_variables': {'foo': 'main'},
+            'handlers': [{'url': '/main'}]
+        }
+        resolved_files = set()
+        output = resolve_includes(input_data, os.getcwd(), resolved_files)
+        assert output == {
+            'runtime': 'python',
+            'env_variables': {'foo': 'main', 'bar': 'shared'},
+            'handlers': [{'url': '/main'}, {'url': '/shared'}]
+        }
+        assert resolved_files == {os.path.abspath('shared/include.yaml')}
+        assert 'includes' in input_data
+
+def test_resolve_includes_circular(capsys):
+    """test_resolve_includes_circular"""
+    with runner.isolated_filesystem():
+        with open('a.yaml', 'w', encoding='utf8') as fragment:
+            fragment.write('includes:\n- b.yaml\ninbound_services:\n- warmup\n')
+        with open('b.yaml', 'w', encoding='utf8') as fragment:
+            fragment.write('includes:\n- a.yaml\nservice_account: foo\n')
+        output = resolve_includes({'runtime': 'python', 'includes': ['a.yaml']}, os.getcwd())
+        assert output == \
+            {'runtime': 'python', 'inbound_services': ['warmup'], 'service_account': 'foo'}
+        assert '[Warning] Circular includes detected' in capsys.readouterr().out
+
+def test_resolve_includes_parses_shared_fragment_once():
+    """test_resolve_includes_parses_shared_fragment_once"""
+    with runner.isolated_filesystem():
+        with open('shared.yaml', 'w', encoding='utf8') as fragment:
+            fragment.write('service_account: foo\n')
+        with patch.object(yaml, 'safe_load', wraps=yaml.safe_load) as mock_safe_load:
+            for _ in range(3):
+                output = resolve_includes({'includes': ['shared.yaml']}, os.getcwd())
+                assert output == {'service_account': 'foo'}
+            assert mock_safe_load.call_count == 1
+
+def test_resolve_includes_reports_to_diagnostics(capsys):
+    """test_resolve_includes_reports_to_diagnostics"""
+    with runner.isolated_filesystem():
+        diagnostics = Diagnostics()
+        output = resolve_includes({'includes': ['missing.yaml']}, os.getcwd(), \
+            diagnostics=diagnostics)
+        assert output == {}
+        assert [diagnostic.code for diagnostic in diagnostics.records] == ['missing-include']
+        assert capsys.readouterr().out == ''
+
+def test_fragment_cache_is_bounded():
+    """test_fragment_cache_is_bounded"""
+    with runner.isolated_filesystem():
+        for index in range(3):
+            with open(f'{index}.yaml', 'w', encoding='utf8') as fragment:
+                fragment.write(f'service_account: sa{index}\n')
+        with patch.object(includes, '_MAX_CACHED_FRAGMENTS', 2):
+            for index in [0, 1, 0, 2]:
+                resolve_includes({'includes': [f'{index}.yaml']}, os.getcwd())
+            assert [os.path.basename(path) for path in includes._FRAGMENT_CACHE][-2:] == \
+                ['0.yaml', '2.yaml']
+            assert os.path.abspath('1.yaml') not in includes._FRAGMENT_CACHE
+
+def test_resolve_includes_does_not_share_fragments():
+    """test_resolve_includes_does_not_share_fragments"""
+    with runner.isolated_filesystem():
+        with open('shared.yaml', 'w', encoding='utf8') as fragment:
+            fragment.write('env_variables:\n  FOO: bar\ninbound_services:\n- warmup\n')
+        output = resolve_includes({'includes': ['shared.yaml']}, os.getcwd())
+        output['env_variables']['FOO'] = 'changed'
+        output['inbound_services'].append('mail')
+        assert resolve_includes({'includes': ['shared.yaml']}, os.getcwd()) == \
+            {'env_variables': {'FOO': 'bar'}, 'inbound_services': ['warmup']}
+
+def test_resolve_includes_non_mapping_fragment(capsys):
+    """test_resolve_includes_non_mapping_fragment"""
+    with runner.isolated_filesystem():
+        with open('list.yaml', 'w', encoding='utf8') as fragment:
+            fragment.write('- warmup\n')
+        output = resolve_includes({'runtime': 'python39', 'includes': ['list.yaml']}, \
+            os.getcwd())
+        assert output == {'runtime': 'python39'}
+        assert f'[Warning] Included file {os.path.abspath("list.yaml")} is not a mapping, \
+skipping list.yaml.' in capsys.readouterr().out
@@ -0,0 +1,67 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for input_stream.py."""
+import io
+from unittest.mock import patch
+from app2run.common.input_stream import iter_input_documents
+
+def test_iter_input_documents_yaml_stream():
+    """test_iter_input_documents_yaml_stream"""
+    stream = io.StringIO("\n\nruntime: python\n---\nenv: flex\n")
+    output = list(iter_input_documents(stream))
+    assert output == [('<stdin>#0', {'runtime': 'python'}), ('<stdin>#1', {'env': 'flex'})]
+
+def test_iter_input_documents_ndjson_stream():
+    """test_iter_input_documents_ndjson_stream"""
+    stream = io.StringIO('{"runtime": "python"}\n{"env": "flex"}\n')
+    output = list(iter_input_documents(stream, 'fleet'))
+    assert output == [('fleet#0', {'runtime': 'python'}), ('fleet#1', {'env': 'flex'})]
+
+def test_iter_input_documents_yaml_flow_mapping():
+    """test_iter_input_documents_yaml_flow_mapping"""
+    stream = io.StringIO('{runtime: python,\n env: flex}\n')
+    output = list(iter_input_documents(stream))
+    assert output == [('<stdin>#0', {'runtime': 'python', 'env': 'flex'})]
+
+def test_iter_input_documents_is_lazy():
+    """test_iter_input_documents_is_lazy"""
+    stream = io.StringIO('{"runtime": "python"}\n{"env": "flex"}\n')
+    documents = iter_input_documents(stream)
+    next(documents)
+    assert stream.readline() == '{"env": "flex"}\n'
+
+def test_iter_input_documents_empty_stream():
+    """test_iter_input_documents_empty_stream"""
+    assert not list(iter_input_documents(io.StringIO('\n  \n')))
+
+def test_iter_input_documents_yaml_not_mapping():
+    """test_iter_input_documents_yaml_not_mapping"""
+    stream = io.StringIO('runtime: python39\n---\n- a\n---\nfoo\n---\nenv: flex\n')
+    with patch('click.echo') as mock_echo:
+        output = list(iter_input_documents(stream))
+    assert output == [('<stdin>#0', {'runtime': 'python39'}), ('<stdin>#3', {'env': 'flex'})]
+    assert [call.args[0] for call in mock_echo.call_args_list] == [ \
+        '[Error] <stdin>#1 is not a mapping, it is skipped.', \
+        '[Error] <stdin>#2 is not a mapping, it is skipped.']
+
+def test_iter_input_documents_ndjson_not_mapping():
+    """test_iter_input_documents_ndjson_not_mapping"""
+    stream = io.StringIO('{"runtime": "python"}\n[1,2]\n"foo"\n{"env": "flex"}\n')
+    with patch('click.echo') as mock_echo:
+        output = list(iter_input_documents(stream))
+    assert output == [('<stdin>#0', {'runtime': 'python'}), ('<stdin>#3', {'env': 'flex'})]
+    assert [call.args[0] for call in mock_echo.call_args_list] == [ \
+        '[Error] <stdin>#1 is not a mapping, it is skipped.', \
+        '[Error] <stdin>#2 is not a mapping, it is skipped.']
@@ -0,0 +1,61 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for parallel.py."""
+import os
+import time
+from app2run.common.parallel import iter_parallel
+
+def _square(value: int) -> int:
+    return value * value
+
+def _sleep_inversely(value: int) -> int:
+    # Earlier items complete later.
+    time.sleep(0.05 * (4 - value))
+    return value
+
+def _get_pid(_value: int) -> int:
+    return os.getpid()
+
+def test_results_in_input_order():
+    """test_results_in_input_order"""
+    assert list(iter_parallel(_square, range(100), jobs=4, chunk_size=3)) == \
+        [value * value for value in range(100)]
+
+def test_results_in_completion_order():
+    """test_results_in_completion_order"""
+    results = list(iter_parallel(_sleep_inversely, range(4), jobs=4, ordered=False, \
+        chunk_size=1))
+    assert sorted(results) == [0, 1, 2, 3]
+    assert results[0] == 3
+
+def test_items_consumed_lazily():
+    """test_items_consumed_lazily"""
+    consumed = []
+
+    def items():
+        for value in range(1000):
+            consumed.append(value)
+            yield value
+
+    results = iter_parallel(_square, items(), jobs=2, chunk_size=4)
+    assert next(results) == 0
+    # 2 chunks in flight per worker, plus the chunk submitted once the first one is done.
+    assert len(consumed) <= 2 * 2 * 4 + 4
+    results.close()
+
+def test_work_spread_over_workers():
+    """test_work_spread_over_workers"""
+    pids = set(iter_parallel(_get_pid, range(64), jobs=2, chunk_size=1))
+    assert os.getpid() not in pids
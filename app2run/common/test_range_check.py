@@ -0,0 +1,63 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for range_check.py."""
+from unittest.mock import patch
+from app2run.common import range_check
+from app2run.common.range_check import check_ranges, find_in_range
+from app2run.config.feature_config_loader import InputType
+from app2run.commands.translation_rules.context import get_features_by_input_type
+
+def test_find_in_range():
+    """test_find_in_range"""
+    assert find_in_range([-1, 0, 4.5, 8, 9], 0, 8) == [False, True, True, True, False]
+    with patch.object(range_check, 'numpy', None):
+        assert find_in_range([-1, 0, 4.5, 8, 9], 0, 8) == [False, True, True, True, False]
+
+def test_check_ranges():
+    """test_check_ranges"""
+    inputs = [
+        {'resources': {'cpu': 10, 'memory_gb': 4}},
+        {'automatic_scaling': {'max_instances': 1001}, 'resources': {'cpu': 'two'}},
+        {},
+        {'resources': {'cpu': 2}, 'automatic_scaling': {'min_instances': -1}},
+        {'resources': {'cpu': True}},
+        # Left to RangeLimitFeature.validate.
+        {'resources.cpu': 10},
+    ]
+    features = get_features_by_input_type(InputType.APP_YAML, 'range_limited')
+    expected = [
+        {'resources.cpu': False, 'resources.memory_gb': True},
+        {'automatic_scaling.max_instances': False, 'resources.cpu': False},
+        {},
+        {'resources.cpu': True, 'automatic_scaling.min_instances': False},
+        {'resources.cpu': False},
+        {},
+    ]
+    assert check_ranges(inputs, features) == expected
+    with patch.object(range_check, 'numpy', None):
+        assert check_ranges(inputs, features) == expected
+
+def test_check_ranges_compares_columns():
+    """test_check_ranges_compares_columns"""
+    inputs = [{'resources': {'cpu': cpu}, 'env_variables': {'CPU': str(cpu)}} \
+        for cpu in range(10)]
+    features = get_features_by_input_type(InputType.APP_YAML, 'range_limited')
+    with patch.object(range_check, 'find_in_range', wraps=range_check.find_in_range) \
+        as mock_find_in_range:
+        range_checks = check_ranges(inputs, features)
+    assert [checks for checks in range_checks] == \
+        [{'resources.cpu': True}] * 9 + [{'resources.cpu': False}]
+    # One vectorized comparison per feature for all the inputs.
+    assert mock_find_in_range.call_count == 1
@@ -0,0 +1,94 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for result_cache.py."""
+import os
+from click.testing import CliRunner
+from app2run.common.result_cache import ResultCache, compute_cache_key, get_result_cache
+
+runner = CliRunner()
+
+def test_compute_cache_key_is_canonical():
+    """test_compute_cache_key_is_canonical"""
+    key = compute_cache_key('rule_flags', {'a': 1, 'b': {'c': [1, 2]}})
+    assert key == compute_cache_key('rule_flags', {'b': {'c': [1, 2]}, 'a': 1})
+    assert key != compute_cache_key('rule_flags', {'a': 1, 'b': {'c': [2, 1]}})
+    assert key != compute_cache_key('incompatible_features', {'a': 1, 'b': {'c': [1, 2]}})
+
+def test_cache_get_put():
+    """test_cache_get_put"""
+    with runner.isolated_filesystem():
+        cache = ResultCache('cache')
+        key = compute_cache_key('input')
+        assert cache.get(key) is None
+        cache.put(key, {'rule_flags': {'timeout': ['--timeout=10m']}})
+        assert cache.get(key) == {'rule_flags': {'timeout': ['--timeout=10m']}}
+        assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+        # A new cache instance (i.e. a new run) reads the entries from disk.
+        assert ResultCache('cache').get(key) is not None
+
+def test_cache_evicts_least_recently_used():
+    """test_cache_evicts_least_recently_used"""
+    with runner.isolated_filesystem():
+        cache = ResultCache('cache', max_size=20)
+        keys = [compute_cache_key(index) for index in range(3)]
+        cache.put(keys[0], 'first')
+        cache.put(keys[1], 'second')
+        os.utime(cache._get_entry_path(keys[0]), ns=(1, 1)) # pylint: disable=protected-access
+        os.utime(cache._get_entry_path(keys[1]), ns=(2, 2)) # pylint: disable=protected-access
+        cache.put(keys[2], 'third')
+        assert cache.stats.evictions == 1
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[1]) == 'second'
+        assert cache.get(keys[2]) == 'third'
+
+def test_cache_evicts_down_to_low_water_mark():
+    """test_cache_evicts_down_to_low_water_mark"""
+    with runner.isolated_filesystem():
+        cache = ResultCache('cache', max_size=100)
+        keys = [compute_cache_key(index) for index in range(12)]
+        # Each entry is 10 bytes (`"entry-NN"`).
+        for index, key in enumerate(keys[:10]):
+            cache.put(key, f'entry-{index:02}')
+        assert cache.get(keys[0]) == 'entry-00'
+        cache.put(keys[10], 'entry-10')
+        # 110 bytes are evicted down to 90 bytes: the least recently used entries 1 and 2.
+        assert cache.stats.evictions == 2
+        assert cache.get(keys[0]) == 'entry-00'
+        assert not os.path.exists(cache._get_entry_path(keys[1])) # pylint: disable=protected-access
+        assert not os.path.exists(cache._get_entry_path(keys[2])) # pylint: disable=protected-access
+        # The next write fits under max_size, nothing is evicted.
+        cache.put(keys[11], 'entry-11')
+        assert cache.stats.evictions == 2
+
+def test_cache_index_ordered_by_mtime():
+    """test_cache_index_ordered_by_mtime"""
+    with runner.isolated_filesystem():
+        keys = [compute_cache_key(index) for index in range(3)]
+        cache = ResultCache('cache')
+        cache.put(keys[0], 'first')
+        cache.put(keys[1], 'second')
+        os.utime(cache._get_entry_path(keys[0]), ns=(2, 2)) # pylint: disable=protected-access
+        os.utime(cache._get_entry_path(keys[1]), ns=(1, 1)) # pylint: disable=protected-access
+        # A new run evicts by the mtime of the entries, entry 1 was used least recently.
+        cache = ResultCache('cache', max_size=20)
+        cache.put(keys[2], 'third')
+        assert cache.stats.evictions == 1
+        assert cache.get(keys[0]) == 'first'
+        assert cache.get(keys[1]) is None
+
+def test_get_result_cache():
+    """test_get_result_cache"""
+    assert get_result_cache(None) is None
+    assert get_result_cache('cache').cache_dir == 'cache'
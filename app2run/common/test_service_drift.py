@@ -0,0 +1,73 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit test for service_drift module."""
+import os
+import pytest
+from click.testing import CliRunner
+from app2run.common.service_drift import Drift, compare_services, index_exported_services, \
+    parse_cpu, parse_memory
+
+runner = CliRunner()
+
+def _service(name: str, annotations=None, **template_spec):
+    return {'kind': 'Service', 'metadata': {'name': name}, 'spec': {'template': { \
+        'metadata': {'annotations': annotations or {}}, 'spec': template_spec}}}
+
+@pytest.mark.parametrize('value, expected', [('1', 1), (2, 2), ('0.5', 0.5), \
+    ('500m', 0.5), ('1000m', 1)])
+def test_parse_cpu(value, expected):
+    """test_parse_cpu"""
+    assert parse_cpu(value) == expected
+
+@pytest.mark.parametrize('value, expected', [('512Mi', 512 * 1024 ** 2), \
+    ('0.5Gi', 512 * 1024 ** 2), ('1G', 1000 ** 3), ('128k', 128000), ('1024', 1024)])
+def test_parse_memory(value, expected):
+    """test_parse_memory"""
+    assert parse_memory(value) == expected
+
+def test_parse_memory_invalid():
+    """test_parse_memory_invalid"""
+    with pytest.raises(ValueError):
+        parse_memory('1 gigabyte')
+
+def test_compare_services():
+    """test_compare_services"""
+    translated = _service('a', {'autoscaling.knative.dev/minScale': '1'}, \
+        containerConcurrency=80, timeoutSeconds=600)
+    exported = _service('a', {'autoscaling.knative.dev/minScale': '1', \
+        'autoscaling.knative.dev/maxScale': '100'}, containerConcurrency=80, \
+        timeoutSeconds=300)
+    # maxScale is not set by the translation, it is not compared.
+    assert compare_services(translated, exported) == [Drift('timeout', 600, 300)]
+    assert compare_services(translated, _service('a')) == [ \
+        Drift('concurrency', 80, None), Drift('min_instances', '1', None), \
+        Drift('timeout', 600, None)]
+
+def test_index_exported_services():
+    """test_index_exported_services"""
+    with runner.isolated_filesystem():
+        os.makedirs('services/us')
+        with open('services/us/all.yaml', 'w', encoding='utf8') as file:
+            file.write('kind: Service\nmetadata:\n  name: a\n---\nkind: Service\nmetadata:\n'
+                '  name: b\n---\nkind: Route\nmetadata:\n  name: a\n')
+        with open('services/a.json', 'w', encoding='utf8') as file:
+            file.write('[{"kind": "Service", "metadata": {"name": "a"}}]')
+        with open('services/invalid.yaml', 'w', encoding='utf8') as file:
+            file.write('kind: [Service\n')
+        with open('services/README.md', 'w', encoding='utf8') as file:
+            file.write('kind: Service\n')
+        services = index_exported_services('services')
+        assert {name: service.path for name, service in services.items()} == \
+            {'a': 'services/a.json', 'b': 'services/us/all.yaml'}
@@ -0,0 +1,25 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for service_versions.py."""
+from app2run.common.service_versions import get_traffic_percents
+
+def test_get_traffic_percents():
+    """test_get_traffic_percents"""
+    assert get_traffic_percents([1.0]) == [100]
+    assert get_traffic_percents([0.5, 0.5]) == [50, 50]
+    assert get_traffic_percents([1 / 3, 1 / 3, 1 / 3]) == [34, 33, 33]
+    assert get_traffic_percents([0.667, 0.333]) == [67, 33]
+    assert sum(get_traffic_percents([0.1234, 0.4567, 0.4199])) == 100
+    assert get_traffic_percents([0, 0]) == [0, 0]
@@ -14,7 +14,11 @@
 
 """Unit tests for util.py."""
 
-from app2run.common.util import generate_output_flags, is_flex_env, get_feature_key_from_input
+import sys
+from unittest.mock import patch
+import pytest
+from app2run.common.util import generate_output_flags, is_flex_env, get_feature_key_from_input, \
+    flatten_keys, get_features_by_prefix, FlattenedView
 
 def test_flex_env_app_yaml():
     """test_flex_env_app_yaml"""
@@ -81,3 +85,82 @@ def test_get_feature_key_from_input_multiple_keys_detected():
     allow_keys = ['key1', 'key2']
     output = get_feature_key_from_input(input_data, allow_keys)
     assert output is None
+
+def test_flattened_view():
+    """test_flattened_view"""
+    input_data = {
+        'runtime': 'python',
+        'resources': {'cpu': 5, 'memory_gb': 10},
+        'env_variables': {'foo': 'bar'},
+        'automatic_scaling': {}
+    }
+    view = FlattenedView(input_data)
+    assert list(view) == ['runtime', 'resources.cpu', 'resources.memory_gb', 'env_variables']
+    assert view['resources.cpu'] == 5
+    assert view['env_variables'] == {'foo': 'bar'}
+    assert 'env_variables.foo' not in view
+    assert 'resources' not in view
+    assert 'automatic_scaling' not in view
+    assert len(view) == 4
+    assert dict(view.items()) == flatten_keys(input_data, '')
+
+def test_flattened_view_dotted_and_non_string_keys():
+    """test_flattened_view_dotted_and_non_string_keys"""
+    view = FlattenedView({'a.b': {'c': 1}, 'd': {2: 'two'}})
+    assert view['a.b.c'] == 1
+    assert view['d.2'] == 'two'
+    assert dict(view.items()) == {'a.b.c': 1, 'd.2': 'two'}
+
+def test_flattened_view_items_and_values_views():
+    """test_flattened_view_items_and_values_views"""
+    view = FlattenedView({'runtime': 'python', 'resources': {'cpu': 5, 'memory_gb': 10}})
+    items = view.items()
+    assert len(items) == 3
+    assert list(items) == list(items) == [('runtime', 'python'), ('resources.cpu', 5), \
+        ('resources.memory_gb', 10)]
+    assert ('resources.cpu', 5) in items
+    assert ('resources.cpu', 4) not in items
+    values = view.values()
+    assert len(values) == 3
+    assert list(values) == ['python', 5, 10]
+    assert 10 in values
+
+def test_flattened_view_wide_node_scanned_once():
+    """test_flattened_view_wide_node_scanned_once"""
+    wide = {f'key{index}': index for index in range(1000)}
+    wide['a.b'] = {'c': 1}
+    wide[7] = 'seven'
+    view = FlattenedView({'wide': wide})
+    with patch('app2run.common.util.any', create=True, wraps=any) as mock_any:
+        for index in range(1000):
+            assert view[f'wide.key{index}'] == index
+        assert view['wide.a.b.c'] == 1
+        assert view['wide.7'] == 'seven'
+    # The keys of each node (the root, `wide` and `wide.a.b`) are scanned once.
+    assert mock_any.call_count == 3
+
+def test_flattened_view_deeply_nested():
+    """test_flattened_view_deeply_nested"""
+    depth = sys.getrecursionlimit() * 2
+    input_data = value = {}
+    for _ in range(depth):
+        value['a'] = {}
+        value = value['a']
+    value['b'] = 1
+    path = '.'.join(['a'] * depth + ['b'])
+    view = FlattenedView(input_data)
+    assert view[path] == 1
+    assert list(view) == [path]
+    with pytest.raises(KeyError):
+        _ = view['a.b']
+
+def test_get_features_by_prefix_flattened_view():
+    """test_get_features_by_prefix_flattened_view"""
+    view = FlattenedView({
+        'automatic_scaling': {'min_instances': 1},
+        'automatic_scaling_foo': 2,
+        'resources': {'cpu': 1}
+    })
+    assert get_features_by_prefix(view, 'automatic_scaling') == \
+        {'automatic_scaling.min_instances': 1, 'automatic_scaling_foo': 2}
+    assert get_features_by_prefix(view, 'resources.c') == {'resources.cpu': 1}
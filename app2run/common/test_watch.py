@@ -0,0 +1,40 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for watch.py."""
+import os
+from click.testing import CliRunner
+from app2run.common.watch import watch_files
+
+runner = CliRunner()
+
+def test_watch_files_detects_changes():
+    """test_watch_files_detects_changes"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write('runtime: python')
+        polls = []
+        changes = []
+
+        def get_paths():
+            polls.append(1)
+            if len(polls) == 2:
+                with open('app.yaml', 'w', encoding='utf8') as appyaml:
+                    appyaml.write('runtime: python38')
+            if len(polls) == 4:
+                os.remove('app.yaml')
+            return ['app.yaml']
+
+        watch_files(get_paths, lambda: changes.append(len(polls)), interval=0, max_polls=4)
+        assert changes == [2, 4]
@@ -0,0 +1,130 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for write_plan.py."""
+import errno
+import os
+import subprocess
+from unittest.mock import patch
+from click.testing import CliRunner
+from app2run.common.write_plan import PlannedWrite, WritePlan
+
+runner = CliRunner()
+
+def test_add_existing_or_planned_file():
+    """test_add_existing_or_planned_file"""
+    with runner.isolated_filesystem():
+        os.makedirs('app1')
+        os.makedirs('app2')
+        with open('app2/Procfile', 'w', encoding='utf8') as procfile:
+            procfile.write('web: ruby app.rb')
+        write_plan = WritePlan()
+        assert write_plan.add(PlannedWrite('app1/Procfile', 'web: gunicorn main:app'))
+        assert not write_plan.add(PlannedWrite('app1/Procfile', 'web: ruby app.rb'))
+        assert not write_plan.add(PlannedWrite('app2/Procfile', 'web: gunicorn main:app'))
+        assert write_plan.read_file('app1/Procfile') == 'web: gunicorn main:app'
+        assert write_plan.read_file('app2/Procfile') == 'web: ruby app.rb'
+        assert write_plan.read_file('app2/requirements.txt') is None
+        assert write_plan.writes == [PlannedWrite('app1/Procfile', 'web: gunicorn main:app')]
+
+def test_apply():
+    """test_apply"""
+    with runner.isolated_filesystem():
+        os.makedirs('app1')
+        write_plan = WritePlan()
+        write_plan.add(PlannedWrite('app1/Procfile', 'web: gunicorn main:app'))
+        write_plan.add(PlannedWrite('app1/requirements.txt', 'gunicorn'))
+        write_plan.add(PlannedWrite('Procfile', 'web: ruby app.rb'))
+        # Created after it was planned, it is not overwritten.
+        with open('Procfile', 'w', encoding='utf8') as procfile:
+            procfile.write('web: node app.js')
+        written, skipped = write_plan.apply()
+        assert [write.path for write in written] == ['app1/Procfile', 'app1/requirements.txt']
+        assert [write.path for write in skipped] == ['Procfile']
+        with open('app1/Procfile', 'r', encoding='utf8') as procfile:
+            assert procfile.read() == 'web: gunicorn main:app'
+        with open('Procfile', 'r', encoding='utf8') as procfile:
+            assert procfile.read() == 'web: node app.js'
+        assert sorted(os.listdir('app1')) == ['Procfile', 'requirements.txt']
+
+def test_apply_fails_before_writing():
+    """test_apply_fails_before_writing"""
+    with runner.isolated_filesystem():
+        os.makedirs('app1')
+        write_plan = WritePlan()
+        write_plan.add(PlannedWrite('app1/Procfile', 'web: gunicorn main:app'))
+        write_plan.add(PlannedWrite('missing/Procfile', 'web: ruby app.rb'))
+        try:
+            write_plan.apply()
+            assert False, 'apply should fail'
+        except OSError:
+            pass
+        assert not os.listdir('app1')
+
+def test_apply_removes_linked_files_on_failure():
+    """test_apply_removes_linked_files_on_failure"""
+    with runner.isolated_filesystem():
+        write_plan = WritePlan()
+        write_plan.add(PlannedWrite('Procfile', 'web: gunicorn main:app'))
+        write_plan.add(PlannedWrite('requirements.txt', 'gunicorn'))
+        link = os.link
+        def _link(source, destination):
+            if destination == 'requirements.txt':
+                raise OSError(errno.ENOSPC, 'No space left on device')
+            link(source, destination)
+        with patch.object(os, 'link', side_effect=_link):
+            try:
+                write_plan.apply()
+                assert False, 'apply should fail'
+            except OSError as error:
+                assert error.errno == errno.ENOSPC
+        assert not os.listdir('.')
+
+def test_apply_without_hard_links():
+    """test_apply_without_hard_links"""
+    with runner.isolated_filesystem():
+        write_plan = WritePlan()
+        write_plan.add(PlannedWrite('requirements.txt', 'gunicorn'))
+        write_plan.add(PlannedWrite('Procfile', 'web: ruby app.rb'))
+        # Created after it was planned, it is not overwritten.
+        with open('Procfile', 'w', encoding='utf8') as procfile:
+            procfile.write('web: node app.js')
+        with patch.object(os, 'link', side_effect=OSError(errno.EPERM, 'Not permitted')):
+            written, skipped = write_plan.apply()
+        assert [write.path for write in written] == ['requirements.txt']
+        assert [write.path for write in skipped] == ['Procfile']
+        with open('requirements.txt', 'r', encoding='utf8') as requirements:
+            assert requirements.read() == 'gunicorn'
+        with open('Procfile', 'r', encoding='utf8') as procfile:
+            assert procfile.read() == 'web: node app.js'
+        assert sorted(os.listdir('.')) == ['Procfile', 'requirements.txt']
+
+def test_to_patch():
+    """test_to_patch"""
+    with runner.isolated_filesystem():
+        os.makedirs('app1')
+        write_plan = WritePlan()
+        write_plan.add(PlannedWrite('app1/Procfile', 'web: gunicorn main:app'))
+        patch = write_plan.to_patch()
+        assert patch == """diff --git a/app1/Procfile b/app1/Procfile
+new file mode 100644
+--- /dev/null
++++ b/app1/Procfile
+@@ -0,0 +1 @@
++web: gunicorn main:app
+\\ No newline at end of file
+"""
+        subprocess.run(['git', 'apply', '-'], input=patch, text=True, check=True)
+        with open('app1/Procfile', 'r', encoding='utf8') as procfile:
+            assert procfile.read() == 'web: gunicorn main:app'
@@ -15,10 +15,13 @@
 """This module contains common utility functions."""
 import os
 import re
-from typing import Dict, List, Any, Tuple
+from collections.abc import ItemsView, Mapping, ValuesView
+from typing import Dict, List, Any, Optional, Set, Tuple
 import click
 import yaml
 from app2run.config.feature_config_loader import InputType
+from app2run.common.diagnostics import Diagnostics
+from app2run.common.includes import resolve_includes
 
 ENTRYPOINT_FEATURE_KEYS: List[str] = ['entrypoint', 'entrypoint.shell']
 # Entrypoint for these runtimes must be specified in a Procfile
@@ -48,13 +51,148 @@ def generate_output_flags(flags: List[str], value: str) -> List[str]:
 def get_features_by_prefix(features: Dict, prefix: str) -> Dict:
     """Return a list of features matched with the prefix."""
     matched_features: Dict = {}
-    for feature_key in features:
+    feature_items = features.items_with_prefix(prefix) if isinstance(features, FlattenedView) \
+        else ((key, features[key]) for key in features)
+    for feature_key, feature_value in feature_items:
         if feature_key.startswith(prefix):
-            matched_features[feature_key] = features[feature_key]
+            matched_features[feature_key] = feature_value
     return matched_features
 
+class FlattenedView(Mapping):
+    """FlattenedView is a read-only mapping of the nested paths (root to leaf) of a
+    dictionary to the leaf values, without copying the dictionary. For example:
+    Input: {
+        "resources": {
+            "cpu": 5,
+            "memory_gb": 10
+        }
+    }
+    view: {
+        "resources.cpu": 5,
+        "resources.memory_gb": 10
+    }
+    Dotted keys are resolved on demand and leaf paths are iterated lazily, both
+    without recursion, so deeply nested or very wide inputs are never fully
+    materialized. The keys of a node are scanned once (for dotted and non-string keys),
+    so a lookup is a dict lookup per level. Values of the keys in _FLATTEN_EXCLUDE_KEYS
+    are leaves. The input must not be modified while the view is used."""
+    def __init__(self, input_data: Dict, parent_path: str = ''):
+        self._input_data = input_data
+        self._parent_path = parent_path
+        # (node, has dotted keys, non-string keys by their string) keyed by id(node).
+        self._node_keys: Dict[int, Tuple[Dict, bool, Dict[str, Any]]] = {}
+        self._len: int = None
+
+    def __getitem__(self, path):
+        relative_path = self._get_relative_path(path)
+        if relative_path is None:
+            raise KeyError(path)
+        if not isinstance(relative_path, str):
+            if relative_path in self._input_data:
+                return self._input_data[relative_path]
+            raise KeyError(path)
+        parts = relative_path.split('.')
+        # Keys could contain dots themselves, e.g. {'a.b': {'c': 1}} and
+        # {'a': {'b': {'c': 1}}} both have the path 'a.b.c', so every way of
+        # grouping the remaining parts into a key is tried.
+        pending = [(self._input_data, 0)]
+        while pending:
+            node, start = pending.pop()
+            has_dotted_keys, non_string_keys = self._get_node_keys(node)
+            ends = range(len(parts), start, -1) if has_dotted_keys else [start + 1]
+            for end in ends:
+                key = '.'.join(parts[start:end])
+                if key not in node:
+                    # Keys are not necessarily strings in YAML (e.g. `1: foo`).
+                    key = non_string_keys.get(key, _MISSING)
+                    if key is _MISSING:
+                        continue
+                value = node[key]
+                is_leaf = not isinstance(value, dict) or key in _FLATTEN_EXCLUDE_KEYS
+                if end == len(parts) and is_leaf:
+                    return value
+                if end < len(parts) and not is_leaf:
+                    pending.append((value, end))
+        raise KeyError(path)
+
+    def __iter__(self):
+        for path, _ in self.iter_leaves():
+            yield path
+
+    def __len__(self):
+        if self._len is None:
+            self._len = sum(1 for _ in self.iter_leaves())
+        return self._len
+
+    def items(self):
+        """View of the (path, value) of the leaves, iterated lazily in the order of the
+        input."""
+        return _FlattenedItemsView(self)
+
+    def values(self):
+        """View of the leaf values, iterated lazily in the order of the input."""
+        return _FlattenedValuesView(self)
+
+    def iter_leaves(self):
+        """Iterate (path, value) of the leaves lazily, in the order of the input."""
+        yield from _iter_leaves(self._input_data, self._parent_path)
+
+    def items_with_prefix(self, prefix: str):
+        """Iterate (path, value) of the leaves whose path might start with the prefix,
+        only the top level subtrees that could contain such paths are walked."""
+        for key, value in self._input_data.items():
+            path = f'{self._parent_path}.{key}' if self._parent_path else key
+            path_str = str(path)
+            if path_str.startswith(prefix) or prefix.startswith(path_str + '.'):
+                yield from _iter_leaves({key: value}, self._parent_path)
+
+    def _get_node_keys(self, node: Dict) -> Tuple[bool, Dict[str, Any]]:
+        cached = self._node_keys.get(id(node))
+        if cached is None or cached[0] is not node:
+            has_dotted_keys = any(isinstance(key, str) and '.' in key for key in node)
+            non_string_keys = {str(key): key for key in node if not isinstance(key, str)}
+            cached = (node, has_dotted_keys, non_string_keys)
+            self._node_keys[id(node)] = cached
+        return cached[1], cached[2]
+
+    def _get_relative_path(self, path):
+        if not self._parent_path:
+            return path
+        if not isinstance(path, str) or not path.startswith(self._parent_path + '.'):
+            return None
+        return path[len(self._parent_path) + 1:]
+
+class _FlattenedItemsView(ItemsView):
+    """Items of a FlattenedView, iterated without looking up each path."""
+    def __iter__(self):
+        yield from self._mapping.iter_leaves()
+
+class _FlattenedValuesView(ValuesView):
+    """Values of a FlattenedView, iterated without looking up each path."""
+    def __iter__(self):
+        for _, value in self._mapping.iter_leaves():
+            yield value
+
+_MISSING = object()
+
+def _iter_leaves(input_data: Dict, parent_path: str):
+    stack = [(iter(input_data.items()), parent_path)]
+    while stack:
+        items, path = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        key, value = item
+        curr_path = f'{path}.{key}' if path else key
+        if not isinstance(value, dict) or key in _FLATTEN_EXCLUDE_KEYS:
+            yield curr_path, value
+        else:
+            stack.append((iter(value.items()), curr_path))
+
 def flatten_keys(input_data: Dict, parent_path: str) -> Dict[str, Any]:
-    """Flattern nested paths (root to leaf) of a dictionary. For example:
+    """Flattern nested paths (root to leaf) of a dictionary into a new dictionary,
+    see FlattenedView for a view that does not copy the input. For example:
     Input: {
         "resources": {
             "cpu": 5,
@@ -66,19 +204,14 @@ def flatten_keys(input_data: Dict, parent_path: str) -> Dict[str, Any]:
         "resources.memory_gb": 10
     }
     """
-    paths: Dict[str, str] = {}
-    for key in input_data:
-        curr_path = f'{parent_path}.{key}' if parent_path else key
-        if not isinstance(input_data[key], dict) or key in _FLATTEN_EXCLUDE_KEYS:
-            paths[curr_path] = input_data[key]
-        else:
-            paths.update(flatten_keys(input_data[key], curr_path))
-    return paths
+    return dict(FlattenedView(input_data, parent_path).iter_leaves())
 
-def validate_input(appyaml, service, version, project) -> Tuple[InputType, Dict]:
+def validate_input(appyaml, service, version, project, diagnostics: Diagnostics = None) \
+    -> Tuple[InputType, Dict]:
     """Validate the input for cli commands. Either app.yaml or deployed version \
         could be used as an input at any given time. Return the input type and \
-        input data (as python objects) if validation passes."""
+        input data (as python objects) if validation passes. Invalid includes of the \
+        app.yaml are reported to diagnostics if it is provided, printed otherwise."""
     # `app2run translate --appyaml=XXX --service=XXX --version=XXX` is invalid, because
     # both appyaml and deployed version are specified.
     appyaml_param_specified = appyaml is not None
@@ -93,13 +226,32 @@ to specify the deployed version.")
     if not deployed_version_specified and not appyaml_param_specified:
         appyaml = 'app.yaml'
     input_type = InputType.ADMIN_API if deployed_version_specified else InputType.APP_YAML
-    input_data = get_input_data_by_input_type(input_type, appyaml, service, version, project)
+    input_data = get_input_data_by_input_type(input_type, appyaml, service, version, project, \
+        diagnostics)
     if input_data is None:
         click.echo('[Error] Failed to read input data.')
     return (input_type, input_data)
 
+def validate_batch_input(appyaml, service, version, changed_since, discover) -> bool:
+    """Validate the input for cli commands analyzing many app.yaml inputs at once, i.e. \
+        a stream of app.yaml documents from stdin, the app.yaml files changed since \
+        a git ref or the app.yaml files discovered in a directory. A deployed version \
+        could not be used together with these inputs."""
+    if service is not None and version is not None:
+        click.echo("[Error] Invalid input, only one of app.yaml or deployed version could be \
+used as an input. Use --appyaml flag to specify the app.yaml, or use --service and --version \
+to specify the deployed version.")
+        return False
+    input_flags = [flag for flag, value in [('--appyaml', appyaml), \
+        ('--changed-since', changed_since), ('--discover', discover)] if value is not None]
+    if len(input_flags) > 1:
+        click.echo(f'[Error] Invalid input, {" and ".join(input_flags)} could not be used \
+together.')
+        return False
+    return True
+
 def get_input_data_by_input_type(input_type: InputType, appyaml, service=None, \
-    version=None, project=None) -> Dict:
+    version=None, project=None, diagnostics: Diagnostics = None) -> Dict:
     """Retrieve the input_data (from yaml to python objects) by a given input_type."""
     # deployed version is input type
     if input_type == InputType.ADMIN_API:
@@ -110,36 +262,58 @@ def get_input_data_by_input_type(input_type: InputType, appyaml, service=None, \
         return yaml.safe_load(gcloud_output)
 
     # appyaml is input type
+    return read_app_yaml(appyaml, diagnostics)[0]
+
+def read_app_yaml(appyaml: str, diagnostics: Diagnostics = None) -> Tuple[Dict, Set[str]]:
+    """Read an app.yaml and resolve its `includes:`, return the input data (None if it could
+    not be read) and the paths of the included files. Invalid includes are reported to
+    diagnostics if it is provided, printed otherwise."""
+    included_files: Set[str] = set()
     try:
         with open(appyaml, 'r', encoding='utf8') as file:
             appyaml_data = yaml.safe_load(file.read())
             if appyaml_data is None:
                 click.echo(f'{file.name} is empty.')
-            return appyaml_data
+            return resolve_includes(appyaml_data, os.path.dirname(os.path.abspath(appyaml)), \
+                included_files, diagnostics), included_files
     except IOError:
         click.echo('app.yaml does not exist in current directory, please use --appyaml flag \
 to specify the app.yaml location.')
-    return None
+    except (yaml.YAMLError, UnicodeDecodeError) as error:
+        # A malformed file is reported, so that a batch continues with its next input.
+        click.echo(f'[Error] {appyaml}: {error}')
+    return None, included_files
 
-def get_feature_key_from_input(input_key_value_pairs: Dict, allow_keys: List[str]) -> str:
-    """Get feature key from input based on list of allowed keys."""
-    allow_keys_from_input = [key for key in input_key_value_pairs if key in allow_keys]
+def get_feature_key_from_input(input_key_value_pairs: Dict, allow_keys: List[str], \
+    diagnostics: Diagnostics = None) -> str:
+    """Get feature key from input based on list of allowed keys. Conflicts are reported to
+    diagnostics if it is provided, printed otherwise."""
+    allow_keys_from_input = [key for key in allow_keys if key in input_key_value_pairs]
     if len(allow_keys_from_input) == 0:
         return None
     if len(allow_keys_from_input) > 1:
-        click.echo(f'[Error] Conflicting configurations found: {allow_keys_from_input}. \
-Please ensure only one is specified".')
+        message = f'Conflicting configurations found: {allow_keys_from_input}. \
+Please ensure only one is specified".'
+        if diagnostics is None:
+            click.echo(f'[Error] {message}')
+        else:
+            diagnostics.error('conflicting-configurations', message)
         return None
     return allow_keys_from_input[0]
 
 def get_project_id_from_gcloud():
     """Get project_id from `gcloud config list`."""
     click.echo('Running `gcloud config list`:')
-    output = os.popen('gcloud config list').read()
-    project_id = re.search(r'(?<=project = )([\w-]+)', output)
+    project_id = read_project_id_from_gcloud()
     if project_id is None:
         click.echo('Unable to determine project id from `gcloud config list`,  \
 use the --project flag to specify the project id of the deployed \
 App Engine version.')
         raise click.Abort()
-    return project_id.group()
+    return project_id
+
+def read_project_id_from_gcloud() -> Optional[str]:
+    """Read project_id from `gcloud config list` without printing, None if it is not set."""
+    output = os.popen('gcloud config list').read()
+    project_id = re.search(r'(?<=project = )([\w-]+)', output)
+    return project_id.group() if project_id is not None else None
@@ -0,0 +1,46 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""watch module polls files for changes."""
+import os
+import time
+from typing import Callable, Dict, Iterable, Tuple
+
+DEFAULT_POLL_INTERVAL_SECONDS = 0.2
+
+def watch_files(get_paths: Callable[[], Iterable[str]], on_change: Callable[[], None], \
+    interval: float = DEFAULT_POLL_INTERVAL_SECONDS, max_polls: int = None) -> None:
+    """Poll the (mtime, size) of the files returned by get_paths every interval seconds
+    and call on_change when any of them is modified, created or deleted. get_paths is
+    called on every poll, so the set of watched files could change over time (e.g.
+    when an `includes:` entry is added). Polls forever unless max_polls is set."""
+    signatures = _get_signatures(get_paths())
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        time.sleep(interval)
+        polls += 1
+        new_signatures = _get_signatures(get_paths())
+        if new_signatures != signatures:
+            signatures = new_signatures
+            on_change()
+
+def _get_signatures(paths: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+    signatures: Dict[str, Tuple[int, int]] = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signatures[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signatures[path] = None
+    return signatures
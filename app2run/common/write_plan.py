@@ -0,0 +1,141 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""write_plan module collects the files created by the translation (e.g. Procfile,
+requirements.txt), so that they are written in one step once all the inputs are
+translated, or printed as a patch in dry-run mode."""
+import difflib
+import errno
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Errors of os.link when the file system does not support hard links, the files are then
+# created exclusively (without overwriting) instead of being linked.
+_LINK_UNSUPPORTED_ERRNOS = {errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS, \
+    errno.EXDEV}
+
+@dataclass(frozen=True)
+class PlannedWrite:
+    """PlannedWrite is a file created by a translation rule, e.g. a Procfile."""
+    path: str
+    content: str
+
+class WritePlan:
+    """WritePlan holds the planned writes keyed by the source directory of the inputs.
+    Files are only created, never overwritten: a file which exists, or is already planned
+    by another input of the same source directory, is not planned again."""
+    def __init__(self):
+        self._writes_by_source_dir: Dict[str, Dict[str, PlannedWrite]] = {}
+        self._file_contents: Dict[str, Optional[str]] = {}
+
+    @property
+    def writes(self) -> List[PlannedWrite]:
+        """The planned writes, grouped by source directory."""
+        return [write for writes in self._writes_by_source_dir.values() \
+            for write in writes.values()]
+
+    def read_file(self, path: str) -> Optional[str]:
+        """Read a file as it would be once the plan is applied, None if it does not exist.
+        Existing files are read once for all the inputs."""
+        planned_write = self._get_planned_write(path)
+        if planned_write is not None:
+            return planned_write.content
+        if path not in self._file_contents:
+            try:
+                with open(path, 'r', encoding='utf8') as file:
+                    self._file_contents[path] = file.read()
+            except OSError:
+                self._file_contents[path] = None
+        return self._file_contents[path]
+
+    def add(self, write: PlannedWrite) -> bool:
+        """Plan a write, return False if the file exists or is already planned."""
+        if self.read_file(write.path) is not None:
+            return False
+        source_dir = os.path.dirname(write.path)
+        self._writes_by_source_dir.setdefault(source_dir, {})[write.path] = write
+        return True
+
+    def apply(self) -> Tuple[List[PlannedWrite], List[PlannedWrite]]:
+        """Write the planned files and return (written, skipped). The content of all the
+        files is staged to temporary files first, nothing is written if staging fails.
+        Staged files are then linked to their paths, a file created since it was
+        planned is skipped rather than overwritten. If a file could not be created, the
+        files already created by this call are removed before the error is raised."""
+        staged: List[Tuple[PlannedWrite, str]] = []
+        try:
+            for write in self.writes:
+                file_descriptor, temp_path = tempfile.mkstemp(prefix='.app2run-', \
+                    dir=os.path.dirname(write.path) or '.')
+                staged.append((write, temp_path))
+                with os.fdopen(file_descriptor, 'w', encoding='utf8') as file:
+                    file.write(write.content)
+            written: List[PlannedWrite] = []
+            skipped: List[PlannedWrite] = []
+            try:
+                for write, temp_path in staged:
+                    try:
+                        _create_file(write, temp_path)
+                        written.append(write)
+                    except FileExistsError:
+                        skipped.append(write)
+            except OSError:
+                for write in written:
+                    _remove_file(write.path)
+                raise
+            return written, skipped
+        finally:
+            for _, temp_path in staged:
+                os.unlink(temp_path)
+
+    def to_patch(self) -> str:
+        """Format the planned writes as a unified diff creating the files, which could be
+        applied with `git apply` or `patch -p1`."""
+        patch: List[str] = []
+        for write in self.writes:
+            path = os.path.relpath(write.path).replace(os.sep, '/')
+            lines = write.content.splitlines(keepends=True)
+            diff = list(difflib.unified_diff([], lines, '/dev/null', f'b/{path}'))
+            if diff and not diff[-1].endswith('\n'):
+                diff[-1] += '\n\\ No newline at end of file\n'
+            patch.append(f'diff --git a/{path} b/{path}\nnew file mode 100644\n')
+            patch.extend(diff)
+        return ''.join(patch)
+
+    def _get_planned_write(self, path: str) -> Optional[PlannedWrite]:
+        return self._writes_by_source_dir.get(os.path.dirname(path), {}).get(path)
+
+def _create_file(write: PlannedWrite, temp_path: str) -> None:
+    """Link the staged file to the path of write, or create it exclusively if the file
+    system does not support hard links. FileExistsError is raised if the path exists."""
+    try:
+        os.link(temp_path, write.path)
+        return
+    except OSError as error:
+        if error.errno not in _LINK_UNSUPPORTED_ERRNOS:
+            raise
+    with open(write.path, 'x', encoding='utf8') as file:
+        try:
+            file.write(write.content)
+        except OSError:
+            _remove_file(write.path)
+            raise
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -15,9 +15,12 @@
 """features_helper module contains the functions to access data in the
 incompatible_features.yaml file as dataclass types.
 """
+import hashlib
 import re
 from enum import Enum
+from functools import lru_cache
 from dataclasses import dataclass
+from numbers import Real
 from os import path as os_path
 from typing import Any, Dict, List
 import yaml
@@ -71,7 +74,10 @@ class RangeLimitFeature(UnsupportedFeature):
     flags: List[str] = None
 
     def validate(self, val) -> bool:
-        """Check if the given value is within range limit."""
+        """Check if the given value is within range limit, values which are not numbers
+        (e.g. strings or booleans) are not."""
+        if isinstance(val, bool) or not isinstance(val, Real):
+            return False
         return self.range['min'] <= val <= self.range['max']
 
 @dataclass
@@ -89,11 +95,16 @@ class ValueLimitFeature(UnsupportedFeature):
             # validate by regex only when valid_format is present.
             return re.search(self.valid_format, val) is not None
         if self.known_values is not None and val not in self.known_values:
-            reason : str = f'{val} is not a known value.'
-            self.reason = reason
             return False
         return self.allowed_values is not None and val in self.allowed_values
 
+    def get_reason(self, val) -> str:
+        """Get the reason why the given value is incompatible."""
+        if self.valid_format is None and self.known_values is not None \
+            and val not in self.known_values:
+            return f'{val} is not a known value.'
+        return self.reason
+
 @dataclass()
 class FeatureConfig:
     """FeatureConfig represents the incompatible features configuration."""
@@ -112,13 +123,22 @@ class FeatureConfig:
         supported_data = [SupportedFeature(**f) for f in self.supported]
         self.supported = supported_data
 
+@lru_cache(maxsize=None)
 def get_feature_config() -> FeatureConfig:
-    """Read config data from features yaml and convert data into dataclass types."""
+    """Read config data from features yaml and convert data into dataclass types. The
+    config is read once per process, callers must not modify the returned config."""
     read_yaml = _read_yaml_file()
     parsed_yaml_dict = _parse_yaml_file(read_yaml)
     return _dict_to_features(parsed_yaml_dict)
 
 
+@lru_cache(maxsize=None)
+def get_feature_config_hash() -> str:
+    """Get the sha256 hash of the features yaml, which identifies the effective feature
+    config, e.g. in cache keys."""
+    with open(_CONFIG_PATH, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
 def get_feature_list_by_input_type(input_type: InputType, features: List[UnsupportedFeature]) -> \
     Dict[str, UnsupportedFeature]:
     """Construct a dictionary with the path as the key, the Feature as the value based on
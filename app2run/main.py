@@ -15,7 +15,13 @@
 """Main module of app2run CLI."""
 import click
 
+from app2run.commands.analyze import analyze
+from app2run.commands.drift import drift
+from app2run.commands.export import export
+from app2run.commands.index import index
 from app2run.commands.list_incompatible_features import list_incompatible_features
+from app2run.commands.merge import merge
+from app2run.commands.query import query
 from app2run.commands.translate import translate
 
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
@@ -25,5 +31,11 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 def cli():
     """app2run CLI."""
 
+cli.add_command(analyze)
+cli.add_command(drift)
+cli.add_command(export)
+cli.add_command(index)
 cli.add_command(list_incompatible_features)
+cli.add_command(merge)
+cli.add_command(query)
 cli.add_command(translate)
@@ -0,0 +1,107 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit test for the app2run Python API."""
+import io
+import os
+from unittest.mock import patch
+from click.testing import CliRunner
+from app2run import api
+from app2run.common.diagnostics import Severity
+
+runner = CliRunner()
+
+def test_translate_returns_flags(capsys):
+    """test_translate_returns_flags"""
+    result = api.translate({'service': 'api', 'instance_class': 'F1', \
+        'inbound_services': ['warmup']}, project='test-project')
+    assert result.spec.name == 'api'
+    assert '--cpu=1' in result.flags
+    assert '--memory=0.25Gi' in result.flags
+    assert '--service-account="test-project@appspot.gserviceaccount.com"' in result.flags
+    assert [feature.path['app_yaml'] for feature in result.incompatible_features] == \
+        ['inbound_services']
+    assert capsys.readouterr().out == ''
+
+def test_translate_plans_writes():
+    """test_translate_plans_writes"""
+    with runner.isolated_filesystem():
+        result = api.translate({'runtime': 'python39'}, project='test-project')
+        assert [(write.path, write.content) for write in result.planned_writes] == \
+            [('requirements.txt', 'gunicorn'), ('Procfile', 'web: gunicorn -b :$PORT main:app')]
+        assert not os.path.exists('Procfile')
+        assert not os.path.exists('requirements.txt')
+        assert [(diagnostic.code, diagnostic.severity) for diagnostic in result.diagnostics] == \
+            [('requirements-created', Severity.INFO), ('procfile-created', Severity.INFO)]
+        assert result.diagnostics[1].render() == '[Info] A Procfile is created with entrypoint \
+"gunicorn -b :$PORT main:app", this is needed to deploy Apps from source with python39 runtime \
+to Cloud Run using Buildpacks.'
+
+def test_translate_writes_files_to_source_dir():
+    """test_translate_writes_files_to_source_dir"""
+    with runner.isolated_filesystem():
+        os.mkdir('src')
+        with open('src/Procfile', 'w', encoding='utf8') as procfile:
+            procfile.write('web: ruby main.rb')
+        result = api.translate({'runtime': 'ruby30', 'entrypoint': 'ruby app.rb'}, \
+            project='test-project', source_dir='src', write_files=True)
+        assert not result.planned_writes
+        assert [diagnostic.render() for diagnostic in result.diagnostics] == ['[Warning] \
+Entrypoint "ruby app.rb" is not found at existing Procfile, please add "web: ruby app.rb" to \
+the existing Procfile.']
+
+def test_translate_appyaml_path():
+    """test_translate_appyaml_path"""
+    with runner.isolated_filesystem():
+        os.mkdir('src')
+        with open('src/app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write("""
+runtime: python39
+service: api
+            """)
+        result = api.translate('src/app.yaml', project='test-project', write_files=True)
+        assert result.spec.name == 'api'
+        assert os.path.exists('src/Procfile')
+        assert os.path.exists('src/requirements.txt')
+        assert not os.path.exists('Procfile')
+
+def test_translate_reports_includes_to_diagnostics(capsys):
+    """test_translate_reports_includes_to_diagnostics"""
+    with runner.isolated_filesystem():
+        with open('app.yaml', 'w', encoding='utf8') as appyaml:
+            appyaml.write('runtime: python39\nincludes:\n- missing.yaml\n')
+        result = api.translate('app.yaml', project='test-project')
+        assert result.diagnostics[0].code == 'missing-include'
+        assert result.diagnostics[0].severity == Severity.WARNING
+        assert capsys.readouterr().out == ''
+
+def test_translate_resolves_default_project_once(capsys):
+    """test_translate_resolves_default_project_once"""
+    api.get_default_project.cache_clear()
+    with patch.object(os, 'popen', return_value=io.StringIO('[core]\nproject = my-app\n')) \
+        as mock_popen:
+        for _ in range(3):
+            result = api.translate({'runtime': 'python39'})
+            assert '--service-account="my-app@appspot.gserviceaccount.com"' in result.flags
+    api.get_default_project.cache_clear()
+    assert mock_popen.call_count == 1
+    assert capsys.readouterr().out == ''
+
+def test_check():
+    """test_check"""
+    result = api.check({'inbound_services': ['warmup'], 'runtime': 'python39'})
+    assert result.spec is None
+    assert not result.flags
+    assert [feature.path['app_yaml'] for feature in result.incompatible_features] == \
+        ['inbound_services']
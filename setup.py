@@ -25,6 +25,10 @@ setup(
         'Jinja2',
         'click-option-group'
     ],
+    extras_require={
+        'numpy': ['numpy'],
+        'arrow': ['pyarrow'],
+    },
     url = 'https://github.com/GoogleCloudPlatform/app2run',
     entry_points={
         'console_scripts': [